@@ -1,16 +1,18 @@
 from scipy.stats import norm
 import random
 import os
+import hashlib
 import numpy as np
 import sys
 sys.path.append('../timeseries')
 from timeseries import TimeSeries
 from arraytimeseries import ArrayTimeSeries
+from lightcurveio import load_folded
 from sizedcontainertimeseriesinterface import SizedContainerTimeSeriesInterface
 sys.path.append('../cs207rbtree')
 import redblackDB
 sys.path.append('../SimSearch')
-from _corr import kernel_dist
+from _corr import stand, kernel_dist, sketch, self_kernel, kernel_dist_lower_bound
 import pprint
 
 # py.test --doctest-modules  --cov --cov-report term-missing Distance_from_known_ts.py
@@ -36,17 +38,8 @@ def load_ts_file(filepath):
 #Only considers the first two columns of the text file (other columns are discarded)
 #Only evaluates time values between 0 and 1
 #First column is presumed to be times and second column is presumed to be light curve values.
-    data = np.loadtxt(filepath, delimiter=' ',dtype = str)
-    clean_input = []
-    for i in range(len(data)):
-        row = data[i].split("\\t")
-        clean_input.append([float(row[0][2:]),float(row[1])])
-    data = np.array(clean_input)
-
-    _ , indices = np.unique(data[:, 0], return_index=True)
-
-    data = data[indices, :]
-    times, values = data.T
+#Rows with duplicate times are dropped and the rest sorted by time (see lightcurveio.load_folded)
+    times, values = load_folded(filepath)
     full_ts = TimeSeries(times=list(times),values=list(values))
     interpolated_ts = full_ts.interpolate(list(np.arange(0.0, 1.0, (1.0 /100))))
     full_ts_interpolated = TimeSeries(times=list(np.arange(0.0, 1.0, (1.0 /100))),values=list(interpolated_ts))
@@ -55,7 +48,8 @@ def load_ts_file(filepath):
 if len(sys.argv)<2:
 	raise ValueError("No input file containing time series passed")
 else:
-	test_ts=load_ts_file(sys.argv[1])
+	#standardized once here; the distance functions reuse it (and its spectrum) as is
+	test_ts=stand(load_ts_file(sys.argv[1]))
 
 num_vantage_points = 20
 num_of_timeseries = 1000
@@ -242,6 +236,22 @@ def write_ts(ts,i):
     np.savetxt(datafile_id, data, fmt=['%.3f','%8f'])
     datafile_id.close()
 
+def series_fingerprint():
+	'''
+	Fingerprint of the stored time series files, from their names, sizes and
+	modification times (a stat per file, so the files are not read)
+
+	Returns
+	-------
+	hex digest of the name, size and mtime of ts-0.txt ... ts-(num_of_timeseries-1).txt
+	'''
+	digest = hashlib.sha1()
+	for i in range(num_of_timeseries):
+		filename = 'ts-{}.txt'.format(i)
+		stat = os.stat(filename)
+		digest.update('{} {} {}\n'.format(filename, stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+	return digest.hexdigest()
+
  # Get distance from vantage points from DB, and if its not there then proceed
 
 db = redblackDB.connect("distanceFromVantagePoints.dbdb")
@@ -279,41 +289,51 @@ except FileNotFoundError:
 	# Calculate and cache on disk
 	print('Not stored in disk, calculate distances')
 
-	#generate 20 random indices as vantage point id's
-	vantage_point_ids=random.sample(range(num_of_timeseries), num_vantage_points)
-	filename='vantagepointids.txt'
-	fileh=open(filename,'w')
-	fileh.write(str(vantage_point_ids))
-	#print(len(vantage_point_ids))
-	vpcounter=1
+	#the sketches of earlier time series no longer hold
+	for cache in ['sketches.npy', 'kernels.npy', 'sketches_fingerprint.txt']:
+		if os.path.isfile(cache):
+			os.remove(cache)
+
 	#generation of 1000 time series
 	for i in range(num_of_timeseries):
 		ts=tsmaker(4,2,8)
 		write_ts(ts,i)
-		x.append(ts)
+		x.append(stand(ts))
 		#db_data.set('x' + str(i), encodeTimeSeries(ts))
 		#db_data.commit()
-		#if vantage point then retain in v
-		if i in vantage_point_ids:
-			v.append(ts)
 
-	
+	#Vantage points are picked by farthest-first traversal instead of at random: each new vantage point
+	#is the time series farthest from all vantage points so far, so no two of them are near-duplicates.
+	#It only needs the distances that go into the vantage point trees anyway.
+	vantage_point_ids=[]
+	vp_distances=np.zeros((num_vantage_points, num_of_timeseries))
+	nearest_vp=np.full(num_of_timeseries, np.inf)
+	next_vp=0
 	for i in range(num_vantage_points):
 		print('Working on vantage point: ', i)
+		vantage_point_ids.append(next_vp)
+		v.append(x[next_vp])
 		db_file_name='db_vantagepoints'+str(i)
 		vantagedb=redblackDB.connect(db_file_name+'.dbdb')
-		dict_distances = {}
 		for j in range(num_of_timeseries):
-			distance_bw=kernel_dist(v[i],x[j])
-			dict_distances[j]=distance_bw
-		for key in dict_distances.keys():
-			#print("I am at key",key)
-			val=dict_distances[key]
-			#print("val is",val)
-			vantagedb.set(str(val),str(key))
-			#print("I set stuff")
+			vp_distances[i,j]=kernel_dist(v[i],x[j])
+		for j in range(num_of_timeseries):
+			vantagedb.set(str(vp_distances[i,j]),str(j))
 		vantagedb.commit()
-	
+		nearest_vp=np.minimum(nearest_vp, vp_distances[i])
+		next_vp=int(np.argmax(nearest_vp))
+
+	with open('vantagepointids.txt','w') as fileh:
+		fileh.write(str(vantage_point_ids))
+
+	#Expected pruning ratio: every other stored time series acts as a query, which has to check
+	#the time series within twice its distance to the closest vantage point
+	queries=np.setdiff1d(np.arange(num_of_timeseries), vantage_point_ids)
+	closest_vps=np.argmin(vp_distances[:, queries], axis=0)
+	radius=2*vp_distances[closest_vps, queries]
+	candidates=np.sum(vp_distances[closest_vps] <= radius[:, np.newaxis], axis=1)
+	print('Expected pruning ratio of the vantage points: %.3f' % (1 - np.mean(candidates)/num_of_timeseries))
+
 
 corr=sys.maxsize
 closest='dummy'
@@ -332,8 +352,9 @@ for vp in list:
 
 #Find closest vantage point
 for i in range(num_vantage_points):
-	if kernel_dist(test_ts,v[i]) < corr:
-		corr = kernel_dist(test_ts,v[i])
+	dist_to_vp = kernel_dist(test_ts,v[i])
+	if dist_to_vp < corr:
+		corr = dist_to_vp
 		closest = str(i)
 
 
@@ -350,5 +371,36 @@ for i in dist:
 	rboutputs[b]=a;
 
 
-sortedrbouts=sorted(rboutputs, key=rboutputs.get, reverse=False)[:num_top]
+#Sketches of all stored time series (computed once, when the time series are generated). They are
+#stored with a fingerprint of the time series files and recomputed if the files changed since
+fingerprint = series_fingerprint()
+cached_fingerprint = None
+if all(os.path.isfile(f) for f in ['sketches.npy', 'kernels.npy', 'sketches_fingerprint.txt']):
+	with open('sketches_fingerprint.txt') as fileh:
+		cached_fingerprint = fileh.read()
+if cached_fingerprint == fingerprint:
+	sketches = np.load('sketches.npy')
+	kernels = np.load('kernels.npy')
+else:
+	print('Computing time series sketches')
+	stored = x if len(x) == num_of_timeseries else [read_ts(i) for i in range(num_of_timeseries)]
+	sketches = np.array([sketch(ts) for ts in stored])
+	kernels = np.array([self_kernel(ts) for ts in stored])
+	np.save('sketches.npy', sketches)
+	np.save('kernels.npy', kernels)
+	with open('sketches_fingerprint.txt', 'w') as fileh:
+		fileh.write(fingerprint)
+
+#Rank candidates by their true distance to the test time series. Candidates are visited
+#in order of their sketch lower bound, so we stop once no remaining one can make the top results
+candidate_ids = [int(i) for i in rboutputs]
+lower_bounds = kernel_dist_lower_bound(sketch(test_ts), self_kernel(test_ts),
+	sketches[candidate_ids], kernels[candidate_ids], len(test_ts))
+top = []
+for lower_bound, i in sorted(zip(lower_bounds, candidate_ids)):
+	if len(top) == num_top and lower_bound >= top[-1][0]:
+		break
+	top = sorted(top + [(kernel_dist(test_ts, read_ts(i)), i)])[:num_top]
+
+sortedrbouts = [i for dist_to_ts, i in top]
 print('IDs of the top ',num_top,'time series are',','.join(map(str,sortedrbouts)))
@@ -1,11 +1,13 @@
-import numpy.fft as nfft
 import sys   
 import numpy as np
 import random
 from scipy.stats import norm
+from scipy.special import logsumexp
 sys.path.append("../timeseries/")
 from timeseries import TimeSeries
 from arraytimeseries import ArrayTimeSeries
+from standardizedtimeseries import StandardizedTimeSeries
+from fftbackend import get_backend
 
 def tsmaker(m, s, j):
     '''
@@ -30,19 +32,18 @@ def tsmaker(m, s, j):
 
 def stand(ts):
     '''
-    Standardizes timeseries using its mean m and its standard 
+    Standardizes timeseries using its mean m and its standard deviation.
+    Returns a StandardizedTimeSeries, or ts itself if it already is one, so
+    the functions below standardize each series at most once.
 
     >>> ts = tsmaker(0.5, 0.1, 0.01)
     >>> np.abs(np.round(stand(ts).mean()))
     0.0
+    >>> s = stand(ts)
+    >>> stand(s) is s
+    True
     '''
-    # stand = (ts._values() - ts.mean())/ts.std()
-    arrayvalues = np.asarray(ts._values)
-    stand =  (arrayvalues - ts.mean()) / ts.std()
-    # print("ts values were ",ts._values)
-    # print("I standardized them to",stand)
-    # print("using ",ts.mean(),ts.std())
-    return TimeSeries(times=ts._times, values=stand)
+    return StandardizedTimeSeries.from_series(ts)
 
 
 def ccor(ts1, ts2):
@@ -66,10 +67,11 @@ def ccor(ts1, ts2):
     array([ 0.31, -0.22, -0.31, -0.01,  0.23])
     '''
     # calculate fast fourier transform of the two time series
-    stand1=stand(ts1)
-    stand2=stand(ts2)
-    fft_ts1 = nfft.fft(stand1._values)
-    fft_ts2 = nfft.fft(stand2._values)
+    # (cached on the standardized series; they are real, so the real-input
+    # transforms hold the whole spectrum)
+    fft = get_backend()
+    fft_ts1 = stand(ts1).spectrum()
+    fft_ts2 = stand(ts2).spectrum()
 
     # print(len(ts1))
     # print(len(ts2))
@@ -78,7 +80,7 @@ def ccor(ts1, ts2):
     # return cross-correlation, i.e. the convolution of the first fft
     # and the conjugate of the second
     return ((1 / (1. * len(ts1))) *
-            nfft.ifft(fft_ts1 * np.conjugate(fft_ts2)).real)
+            fft.irfft(fft_ts1 * np.conjugate(fft_ts2), len(ts1)))
 
 
 def max_corr_at_phase(ts1, ts2):
@@ -119,6 +121,43 @@ def max_corr_at_phase(ts1, ts2):
     return idx, maxcorr
 
 
+def max_corr_at_phase_batch(ts, tss):
+    '''
+    Given a time series and a list of time series of the same length,
+    determines for each of them the lag at which its cross-correlation with
+    ts is maximized, and the cross-correlation at that lag, in one pass.
+    The query is transformed once and multiplied row-wise with the
+    conjugate spectra of all the others.
+    Parameters
+    ----------
+    ts : TimeSeries
+        A time series (standardized internally)
+    tss : list of TimeSeries
+        Time series to align with ts (standardized internally)
+    Returns
+    -------
+    idx, maxcorr : numpy arrays
+        The lag and the peak cross-correlation for each time series in tss,
+        equal to max_corr_at_phase(stand(ts), stand(t)) for each t.
+
+    >>> ts1 = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> ts2 = TimeSeries(values=[4, 9.8, 7, 2, -0.5], times=[1, 1.5, 2, 2.5, 10])
+    >>> ts3 = TimeSeries(values=[-1, 0.5, 0, 0, 2], times=[1, 1.5, 2, 2.5, 10])
+    >>> idx, maxcorr = max_corr_at_phase_batch(ts1, [ts2, ts3])
+    >>> idx.tolist()
+    [0, 2]
+    >>> np.round(maxcorr, 2).tolist()
+    [0.31, 0.8]
+    '''
+    values = np.array([stand(t)._values for t in tss])
+    fft = get_backend()
+    spectra = fft.rfft(values, axis=-1)
+    fft_ts = stand(ts).spectrum()
+    ccors = fft.irfft(fft_ts * np.conjugate(spectra), values.shape[-1], axis=-1) / values.shape[-1]
+    idx = np.argmax(ccors, axis=-1)
+    return idx, ccors[np.arange(len(ccors)), idx]
+
+
 def kernel_corr(ts1, ts2, mult=1):
     '''
     Given two standardized time series, calculates the distance between them
@@ -146,6 +185,10 @@ def kernel_corr(ts1, ts2, mult=1):
     '0.43'
     '''
 
+    # standardize once for all three cross-correlations
+    ts1 = stand(ts1)
+    ts2 = stand(ts2)
+
     # calculate cross-correlation
     cross_correlation = ccor(ts1, ts2)
 
@@ -195,9 +238,200 @@ def kernel_dist(ts1, ts2, mult=1):
         raise ValueError("Time series must be standardized")
 
     # The kernel correlation value for ts1 and ts2
-    kernel_corr_val = kernel_corr(ts1,ts2, mult)
+    kernel_corr_val = kernel_corr(stand1, stand2, mult)
 
     # dist= sqrt(C(ts1,ts1)+C(ts2,ts2)-2C(ts1,ts2))
     # When using normalized kernels, dist = sqrt(2(1-C(ts1,ts2)))
     return np.sqrt(2*(1-kernel_corr_val))
 
+
+def kernel_dist_multi(ts1, ts2, mults):
+    '''
+    Given two time series, calculates their kernel distance for many
+    multiplicative constants at once. The cross-correlations are computed
+    once, and each kernel sum is taken as a log-sum-exp so large constants
+    do not overflow.
+    Parameters
+    ----------
+    ts1 : TimeSeries
+        A time series (standardized internally)
+    ts2 : TimeSeries
+        Another time series (standardized internally)
+    mults : sequence of float
+        Multiplicative constants in kernel function (gammas)
+    Returns
+    -------
+    numpy array
+        kernel_dist(ts1, ts2, mult) for each mult
+
+    >>> ts1 = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> ts2 = TimeSeries(values=[4, 9.8, 7, 2, -0.5], times=[1, 1.5, 2, 2.5, 10])
+    >>> [format(d, '.2f') for d in kernel_dist_multi(ts1, ts2, [1, 3, 1000])]
+    ['0.45', '1.06', '1.41']
+    '''
+    return kernel_dist_matrix_multi([ts1, ts2], mults)[:, 0, 1]
+
+def kernel_dist_matrix_multi(tss, mults, block_size=64):
+    '''
+    Given a list of time series of the same length, calculates the kernel
+    distance between every pair for many multiplicative constants at once,
+    with batched FFTs for all cross-correlations. The pairs are computed
+    block_size rows at a time, one multiplicative constant at a time, so the
+    cross-correlations held in memory are at most block_size x len(tss) x
+    length values rather than len(mults) x len(tss) x len(tss) x length.
+    Parameters
+    ----------
+    tss : list of TimeSeries
+        Time series (standardized internally)
+    mults : sequence of float
+        Multiplicative constants in kernel function (gammas)
+    block_size : int
+        Rows of the distance matrices computed together
+    Returns
+    -------
+    numpy array
+        Array of shape (len(mults), len(tss), len(tss)); entry [g, i, j] is
+        kernel_dist(tss[i], tss[j], mults[g])
+
+    >>> ts1 = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> ts2 = TimeSeries(values=[4, 9.8, 7, 2, -0.5], times=[1, 1.5, 2, 2.5, 10])
+    >>> kernel_dist_matrix_multi([ts1, ts2], [1, 3]).shape
+    (2, 2, 2)
+    '''
+    values = np.array([stand(t)._values for t in tss])
+    n, length = values.shape
+    mults = np.asarray(mults, dtype=float)
+    fft = get_backend()
+    spectra = fft.rfft(values, axis=-1)
+
+    # log K(x,x) of every series, the normalization of each pair
+    acorrs = fft.irfft(spectra * np.conjugate(spectra), length, axis=-1) / length
+    log_self = np.array([logsumexp(mult * acorrs, axis=-1) for mult in mults])
+
+    dists = np.empty((len(mults), n, n))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        ccors = fft.irfft(spectra[start:stop, np.newaxis, :] * np.conjugate(spectra[np.newaxis, :, :]),
+                          length, axis=-1) / length
+        for g, mult in enumerate(mults):
+            # Normalize by sqrt(K(x,x)K(y,y)) in log space
+            log_kernels = logsumexp(mult * ccors, axis=-1)
+            kernel_corrs = np.exp(log_kernels - (log_self[g, start:stop, np.newaxis] + log_self[g]) / 2)
+            dists[g, start:stop] = np.sqrt(np.maximum(2*(1-kernel_corrs), 0))
+    return dists
+
+def self_kernel(ts, mult=1):
+    '''
+    Given a time series, calculates the kernel normalization term K(ts,ts)
+    used by kernel_corr.
+    Parameters
+    ----------
+    ts : TimeSeries
+        A time series (standardized internally)
+    mult : int
+        Multiplicative constant in kernel function (gamma)
+    Returns
+    -------
+    float
+        sum of exp(mult * ccor(ts, ts)) over all lags
+
+    >>> ts = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> format(self_kernel(ts), '.2f')
+    '5.64'
+    '''
+    return np.sum(np.exp(mult * ccor(ts, ts)))
+
+def sketch(ts, n_coeffs=64):
+    '''
+    Computes a small, shift invariant sketch of a time series, used to
+    lower bound its kernel distance to other series without any FFTs.
+    Parameters
+    ----------
+    ts : TimeSeries
+        A time series (standardized internally)
+    n_coeffs : int
+        Number of leading DFT amplitudes to keep
+    Returns
+    -------
+    numpy array
+        The leading real-FFT amplitudes |X_f| of the standardized series,
+        followed by the residual power sum(|X_f|^2) and squared power
+        sum(|X_f|^4) of the dropped coefficients (over the full spectrum).
+
+    >>> ts = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> sketch(ts, 2).shape
+    (4,)
+    '''
+    s_ts = stand(ts)
+    values = s_ts._values
+    amps = np.abs(s_ts.spectrum())
+    weights = rfft_weights(len(values))
+    residual = amps[n_coeffs:]
+    power = np.sum(weights[n_coeffs:] * residual**2)
+    power2 = np.sum(weights[n_coeffs:] * residual**4)
+    return np.append(amps[:n_coeffs], [power, power2])
+
+def rfft_weights(length):
+    '''
+    Number of times each real-FFT coefficient of a series of the given
+    length appears in its full spectrum.
+
+    >>> rfft_weights(4)
+    array([1., 2., 1.])
+    '''
+    weights = np.full(length//2 + 1, 2.0)
+    weights[0] = 1
+    if length % 2 == 0:
+        weights[-1] = 1
+    return weights
+
+def kernel_dist_lower_bound(q_sketch, q_kernel, sketches, kernels, length, mult=1):
+    '''
+    Given the sketch of a query and the sketches of many time series,
+    calculates a lower bound on the kernel distance to each of them.
+    Parameters
+    ----------
+    q_sketch : numpy array
+        Sketch of the query (see sketch)
+    q_kernel : float
+        Kernel normalization term of the query (see self_kernel)
+    sketches : 2-d numpy array
+        One sketch per row
+    kernels : numpy array
+        Kernel normalization term of each sketched series
+    length : int
+        Number of points in each time series
+    mult : int
+        Multiplicative constant in kernel function (gamma)
+    Returns
+    -------
+    numpy array
+        Lower bounds on kernel_dist, one per row of sketches
+
+    Cross-correlations c_k of standardized series sum to zero, and by
+    Parseval sum(c_k^2) = Q = sum_f |X_f|^2 |Y_f|^2 / L^3 while
+    max(c_k) <= U = sum_f |X_f||Y_f| / L^2. The sketches bound Q and U from
+    above, and as e^x <= 1 + x + x^2 (e^a-1-a)/a^2 for x <= a,
+    sum_k e^(mult c_k) <= L + mult^2 Q (e^a-1-a)/a^2 with a = mult*min(U, sqrt(Q)).
+
+    >>> ts1 = TimeSeries(values=[0, 2, -1, 0.5, 0], times=[1, 1.5, 2, 2.5, 10])
+    >>> ts2 = TimeSeries(values=[4, 9.8, 7, 2, -0.5], times=[1, 1.5, 2, 2.5, 10])
+    >>> bound = kernel_dist_lower_bound(sketch(ts1, 2), self_kernel(ts1), np.array([sketch(ts2, 2)]), np.array([self_kernel(ts2)]), 5)
+    >>> bound[0] <= kernel_dist(ts1, ts2)
+    True
+    '''
+    n_coeffs = len(q_sketch) - 2
+    weights = rfft_weights(length)[:n_coeffs]
+    amps = sketches[:, :n_coeffs] * q_sketch[:n_coeffs]
+
+    q_bound = (np.sum(weights * amps**2, axis=1) +
+               np.sqrt(sketches[:, -1] * q_sketch[-1])) / length**3
+    u_bound = (np.sum(weights * amps, axis=1) +
+               np.sqrt(sketches[:, -2] * q_sketch[-2])) / length**2
+
+    a = mult * np.minimum(u_bound, np.sqrt(q_bound))
+    safe_a = np.where(a > 1e-6, a, 1)
+    h = np.where(a > 1e-6, (np.exp(safe_a) - 1 - safe_a) / safe_a**2, 0.5)
+    kernel_bound = length + mult**2 * q_bound * h
+
+    return np.sqrt(np.maximum(2*(1 - kernel_bound / np.sqrt(q_kernel * kernels)), 0))
@@ -24,12 +24,42 @@ def test_kernel_dist():
 	ts2 = stand(tsmaker(1, 0.5, random.uniform(0,10)))
 	assert(kernel_dist(ts1, ts1) == 0)
 
+def test_kernel_dist_lower_bound():
+	ts = [tsmaker(0.5, random.uniform(0.05,0.5), random.uniform(0,10)) for i in range(10)]
+	sketches = np.array([sketch(t) for t in ts])
+	kernels = np.array([self_kernel(t) for t in ts])
+	bounds = kernel_dist_lower_bound(sketches[0], kernels[0], sketches, kernels, len(ts[0]))
+	for i in range(10):
+		assert(bounds[i] <= kernel_dist(ts[0], ts[i]) + 1e-9)
 
+def test_max_corr_at_phase_batch():
+	ts = [tsmaker(random.uniform(0,1), random.uniform(0.05,0.5), random.uniform(0,1)) for i in range(10)]
+	idx, maxcorr = max_corr_at_phase_batch(ts[0], ts)
+	for i in range(10):
+		assert(idx[i] == max_corr_at_phase(stand(ts[0]), stand(ts[i]))[0])
+		assert(np.isclose(maxcorr[i], max_corr_at_phase(stand(ts[0]), stand(ts[i]))[1]))
 
+def test_kernel_dist_multi():
+	ts = [tsmaker(0.5, random.uniform(0.05,0.5), random.uniform(0,1)) for i in range(4)]
+	mults = [0, 0.5, 1, 5]
+	dists = kernel_dist_matrix_multi(ts, mults)
+	for g in range(len(mults)):
+		for i in range(4):
+			for j in range(4):
+				assert(np.isclose(dists[g, i, j], kernel_dist(ts[i], ts[j], mults[g]), atol=1e-6))
+	assert(np.allclose(kernel_dist_multi(ts[0], ts[1], mults), dists[:, 0, 1]))
+	# computed in blocks of rows, the matrices are the same
+	assert(np.allclose(kernel_dist_matrix_multi(ts, mults, block_size=3), dists))
+	# exp(mult) overflows, the log-sum-exp does not
+	assert(np.all(np.isfinite(kernel_dist_multi(ts[0], ts[1], [1000, 5000]))))
 
 
-
-
-
-
-
+def test_stand_once():
+	ts1 = tsmaker(0.5, 0.1, random.uniform(0,1))
+	ts2 = tsmaker(0.4, 0.2, random.uniform(0,1))
+	s1, s2 = stand(ts1), stand(ts2)
+	assert(stand(s1) is s1)
+	# raw and pre-standardized series give the same results
+	assert(np.isclose(kernel_dist(ts1, ts2, 3), kernel_dist(s1, s2, 3)))
+	assert(np.allclose(ccor(ts1, ts2), ccor(s1, s2)))
+	assert(np.allclose(sketch(ts1), sketch(s1)))
@@ -1,4 +1,5 @@
 from sizedcontainertimeseriesinterface import SizedContainerTimeSeriesInterface
+from timeindex import TimeIndex
 import numpy as np
 import numbers
 
@@ -52,14 +53,82 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
         # are (mostly) abstract things...
         self.__class__.is_sequence(times)
         self.__class__.is_sequence(values)
-        self._times = np.array(list(times))
-        self._values = np.array(list(values))
+        if isinstance(times, TimeIndex):
+            self._index = times
+        else:
+            self._index = TimeIndex(times if isinstance(times, np.ndarray) else list(times))
+        self._values = np.array(values) if isinstance(values, np.ndarray) else np.array(list(values))
 
         if len(self._times) != len(self._values):
             raise ValueError("Time and input data of incompatible dimensions")
 
-        if len(self._times) != len(set(self._times)):
+        if self._has_repeats(self._times):
             raise ValueError("Time data should contain no repeats")
+        self._stats = None
+        self._writes = [0]
+
+    @classmethod
+    def _from_validated(cls, times, values, copy=False):
+        """
+        Trusted constructor for times and values that are already known to be
+        a valid time series (results of arithmetic, interpolation, storage
+        loads): skips the sequence, length and repeat checks of __init__.
+        A TimeIndex is shared; an array of times gets a TimeIndex (which copies
+        it unless it is frozen, see timeindex.TimeIndex).
+
+        Parameters:
+        ----------
+            times : TimeIndex or np.array
+                Time values
+            values : np.array
+                Data points, one per time
+            copy : bool
+                Copy the values instead of wrapping them
+
+        Examples:
+        ---------
+        >>> ts = ArrayTimeSeries(times=[1, 2, 3], values=[100, 200, 300])
+        >>> (ts + 1).time_index is ts.time_index
+        True
+        """
+        ts = cls.__new__(cls)
+        ts._index = times if isinstance(times, TimeIndex) else TimeIndex(times)
+        ts._values = np.array(values) if copy else np.asarray(values)
+        ts._stats = None
+        ts._writes = [0]
+        return ts
+
+    @property
+    def _times(self):
+        """The (read-only) times of the time index"""
+        return self._index.times
+
+    @property
+    def time_index(self):
+        """
+        The immutable TimeIndex of the series, shared with the series derived
+        from it. Passing it as the times of a new series (or to interpolate)
+        shares it too.
+        """
+        return self._index
+
+    def _positions(self, lo, hi):
+        """views of the points lo..hi-1, which share the count of writes to the values"""
+        part = super()._positions(lo, hi)
+        part._writes = self._writes
+        return part
+
+    def _current_stats(self):
+        """
+        the dict of cached statistics, dropped if an item was set in this
+        series or in a view sharing its values (see between) since
+        """
+        if self._stats is None or self._stats[0] != self._writes[0]:
+            self._stats = (self._writes[0], {})
+        return self._stats[1]
+
+    def _clear_stats(self):
+        self._writes[0] += 1
 
     def __len__(self):
         """
@@ -98,7 +167,8 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot compare list to ArrayTimeSeries!"
             self.__class__._check_time_domains_helper(self, rhs)
-            return (np.array_equal(self._values,rhs._values) and np.array_equal(self._times,rhs._times))
+            # the times were compared by _check_time_domains_helper
+            return np.array_equal(self._values,rhs._values)
 
         except TypeError:
             raise NotImplemented
@@ -126,11 +196,11 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot add a list to a TimeSeries!"
             if isinstance(rhs, numbers.Real):
-                return self.__class__(values=(self._values + rhs), times=self._times)
+                return self._from_validated(self._index, (self._values + rhs))
             else:
                 self._check_length_helper(self, rhs)
                 self._check_time_domains_helper(self, rhs)
-                return self.__class__(values=self._values + rhs._values, times=self._times)
+                return self._from_validated(self._index, self._values + rhs._values)
         except TypeError:
             raise NotImplemented
 
@@ -153,11 +223,11 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot sub a list from a TimeSeries!"
             if isinstance(rhs, numbers.Real):
-                return self.__class__(values=(self._values - rhs), times=self._times)
+                return self._from_validated(self._index, (self._values - rhs))
             else:
                 self._check_length_helper(self, rhs)
                 self._check_time_domains_helper(self, rhs)
-                return self.__class__(values=self._values - rhs._values, times=self._times)
+                return self._from_validated(self._index, self._values - rhs._values)
         except TypeError:
             raise NotImplemented
 
@@ -180,12 +250,12 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot mul a list with a TimeSeries!"
             if isinstance(rhs, numbers.Real):
-                return self.__class__(values=(self._values * rhs), times=self._times)
+                return self._from_validated(self._index, (self._values * rhs))
             else:
                 self._check_length_helper(self, rhs)
                 self._check_time_domains_helper(self, rhs)
                 pairs = zip(self._values, rhs)
-                return self.__class__(values=self._values * rhs._values, times=self._times)
+                return self._from_validated(self._index, self._values * rhs._values)
         except TypeError:
             raise NotImplemented
 
@@ -197,7 +267,7 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             -------
                 self : an instance of self with negated values but no change to the times
         """
-        return self.__class__(values=((-1)*self._values), times=self._times)
+        return self._from_validated(self._index, ((-1)*self._values))
 
     def __pos__(self):
         """
@@ -207,7 +277,43 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
             -------
                 self : an instance of self with each value's sign preserved
         """
-        return self.__class__(values=self._values, times=self._times)
+        return self._from_validated(self._index, self._values, copy=True)
+
+    def interpolate(self, ts_to_interpolate):
+        """
+        Returns new instance with piecewise-linear-interpolated values for submitted
+        times. Times outside of the domain of the existing time series get the first
+        or last value, times equal to an existing time get its value.
+
+        All times are located with one np.interp (a binary search per time in C),
+        so this is O(m log n) instead of the O(n m) generic implementation, and
+        np.array input is used without conversion.
+
+        Parameters:
+        -----------
+        ts_to_interpolate : sequence-like or TimeIndex
+            times to be interpolated; a TimeIndex is shared by the result
+
+        Returns:
+        --------
+        instance of self.__class__ at the submitted times
+
+        Examples:
+        ---------
+        >>> ts = ArrayTimeSeries(times=[0, 5, 10], values=[1, 2, 3])
+        >>> ts.interpolate([-1, 1, 5, 12]).values().tolist()
+        [1.0, 1.2, 2.0, 3.0]
+        """
+        if isinstance(ts_to_interpolate, TimeIndex):
+            new_times = ts_to_interpolate.times
+        else:
+            if not isinstance(ts_to_interpolate, np.ndarray):
+                ts_to_interpolate = np.array(list(ts_to_interpolate))
+            if self._has_repeats(ts_to_interpolate):
+                raise ValueError("Time data should contain no repeats")
+            new_times = ts_to_interpolate
+        interpolated = np.interp(new_times, self._times, self._values)
+        return self._from_validated(ts_to_interpolate, interpolated)
 
     def mean(self, chunk = None):
         """
@@ -219,9 +325,9 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
 
         Returns: 
         --------
-        np.mean : the mean of the time series
+        np.mean : the mean of the time series, cached until an item is set
         """
-        return np.mean(self._values)
+        return self._cached('mean', lambda: np.mean(self._values))
 
     def std(self, chunk = None):
         """
@@ -233,6 +339,6 @@ class ArrayTimeSeries(SizedContainerTimeSeriesInterface):
 
         Returns:
         --------
-        np.std : the standard deviation of the time series 
+        np.std : the standard deviation of the time series, cached until an item is set
         """
-        return np.std(self._values, ddof=1)
+        return self._cached('std', lambda: np.std(self._values, ddof=1))
@@ -0,0 +1,242 @@
+import os
+import time
+import numpy as np
+import numpy.fft as nfft
+
+try:
+    import scipy.fft as sfft
+except ImportError:
+    sfft = None
+
+
+def next_fast_len(n):
+    """
+    Smallest length >= n whose only prime factors are 2, 3 and 5, for which
+    FFTs are fastest.
+
+    Parameters:
+    -----------
+    n : int
+        minimum transform length
+
+    Returns:
+    --------
+    int
+
+    Examples:
+    ---------
+    >>> next_fast_len(97)
+    100
+    >>> next_fast_len(1)
+    1
+    """
+    best = 1
+    while best < n:
+        best *= 2
+    fives = 1
+    while fives < best:
+        threes = fives
+        while threes < best:
+            length = threes
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            threes *= 3
+        fives *= 5
+    return best
+
+
+class NumpyFFT():
+    """
+    Real-input transforms from numpy.fft (single threaded, always available).
+    numpy.fft always computes in double precision; single precision input gets
+    single precision output, as from scipy.fft.
+
+    Attributes:
+    -----------
+    name : str
+        name of the backend in configuration
+    """
+    name = 'numpy'
+
+    def rfft(self, x, n=None, axis=-1):
+        x = np.asarray(x)
+        if x.dtype == np.float32:
+            return nfft.rfft(x, n, axis).astype(np.complex64)
+        return nfft.rfft(x, n, axis)
+
+    def irfft(self, x, n=None, axis=-1):
+        x = np.asarray(x)
+        if x.dtype == np.complex64:
+            return nfft.irfft(x, n, axis).astype(np.float32)
+        return nfft.irfft(x, n, axis)
+
+    def next_fast_len(self, n):
+        return next_fast_len(n)
+
+
+class ScipyFFT():
+    """
+    Real-input transforms from scipy.fft, spreading batched (2-d) transforms
+    over several threads.
+
+    Attributes:
+    -----------
+    name : str
+        name of the backend in configuration
+    workers : int
+        number of threads per transform (-1 uses all cores)
+    """
+    name = 'scipy'
+
+    def __init__(self, workers=-1):
+        if sfft is None:
+            raise ImportError("scipy.fft is not available")
+        self.workers = workers
+
+    def rfft(self, x, n=None, axis=-1):
+        return sfft.rfft(x, n, axis, workers=self.workers)
+
+    def irfft(self, x, n=None, axis=-1):
+        return sfft.irfft(x, n, axis, workers=self.workers)
+
+    def next_fast_len(self, n):
+        return sfft.next_fast_len(n, real=True)
+
+
+def available_backends(workers=-1):
+    """
+    All backends that can be used on this host, keyed by name.
+
+    Parameters:
+    -----------
+    workers : int
+        threads per transform for multi-threaded backends
+
+    Returns:
+    --------
+    dict of str -> backend
+
+    Examples:
+    ---------
+    >>> 'numpy' in available_backends()
+    True
+    """
+    backends = {'numpy': NumpyFFT()}
+    if sfft is not None:
+        backends['scipy'] = ScipyFFT(workers)
+    return backends
+
+
+def benchmark(backends, shape=(256, 100), repeat=20):
+    """
+    Micro-benchmark of a rfft/irfft round trip over a block of real rows,
+    the shape of a batched distance computation.
+
+    Parameters:
+    -----------
+    backends : dict of str -> backend
+        backends to time
+    shape : tuple
+        (rows, row length) of the block
+    repeat : int
+        round trips per backend; the fastest one counts
+
+    Returns:
+    --------
+    dict of str -> float
+        seconds per round trip for each backend
+    """
+    block = np.random.RandomState(0).randn(*shape)
+    timings = {}
+    for name, backend in backends.items():
+        backend.irfft(backend.rfft(block), shape[-1])  # warm up plan caches
+        best = np.inf
+        for i in range(repeat):
+            start = time.perf_counter()
+            backend.irfft(backend.rfft(block), shape[-1])
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def select_backend(name='auto', workers=-1, shape=(256, 100)):
+    """
+    Returns the configured backend; 'auto' benchmarks all available backends
+    on a block of the given shape and returns the fastest.
+
+    Parameters:
+    -----------
+    name : str
+        'auto', 'numpy' or 'scipy'
+    workers : int
+        threads per transform for multi-threaded backends
+    shape : tuple
+        block shape used by the 'auto' benchmark
+
+    Returns:
+    --------
+    backend
+
+    Raises:
+    -------
+    ValueError
+        if name is not an available backend
+
+    Examples:
+    ---------
+    >>> select_backend('numpy').name
+    'numpy'
+    """
+    backends = available_backends(workers)
+    if name == 'auto':
+        timings = benchmark(backends, shape)
+        return backends[min(timings, key=timings.get)]
+    if name not in backends:
+        raise ValueError("Unknown or unavailable FFT backend %r (choose from auto, %s)"
+                         % (name, ", ".join(sorted(backends))))
+    return backends[name]
+
+
+_backend = None
+_config = None
+
+
+def configure(name='auto', workers=-1, shape=(256, 100)):
+    """
+    Sets the arguments of select_backend for the backend get_backend chooses
+    on first use. Nothing is benchmarked until then, so importing a module
+    that configures the backend stays cheap.
+    """
+    global _backend, _config
+    _backend, _config = None, (name, workers, shape)
+
+
+def set_backend(name='auto', workers=-1, shape=(256, 100)):
+    """
+    Chooses the backend used by get_backend (see select_backend) and returns it.
+    """
+    global _backend
+    _backend = select_backend(name, workers, shape)
+    return _backend
+
+
+def get_backend():
+    """
+    Backend used for distance computations. Unless set_backend was called,
+    it is chosen on first use, as set by configure or else by the
+    TS_FFT_BACKEND environment variable ('auto' by default).
+
+    Examples:
+    ---------
+    >>> x = np.arange(8.)
+    >>> np.allclose(get_backend().irfft(get_backend().rfft(x), 8), x)
+    True
+    """
+    if _backend is None:
+        if _config is not None:
+            set_backend(*_config)
+        else:
+            set_backend(os.environ.get('TS_FFT_BACKEND', 'auto'),
+                        int(os.environ.get('TS_FFT_WORKERS', -1)))
+    return _backend
@@ -2,12 +2,17 @@ from storagemanagerinterface import StorageManagerInterface
 from arraytimeseries import ArrayTimeSeries
 import numpy as np
 import json
+import os
 
 class FileStorageManager(StorageManagerInterface):
 	"""
 		This class inherits from the StorageManagerInterface ABC and implements it by putting 2-d numpy
 		arrays with 64-bit floats for both times and values onto disk. 
 
+		With dtype=np.float32 the values are stored as 32-bit floats, halving their size on disk and
+		in memory. Times stay 64-bit (Julian dates need the precision), so both are then stored as the
+		'times' and 'values' fields of a structured array.
+
 		NOTES
 		-----
 		PRE: It supports access to the time series in memory both on get and store calls by managing 
@@ -23,13 +28,19 @@ class FileStorageManager(StorageManagerInterface):
 		>>> stored_ts = fsm.get(unique_id)
 		>>> assert stored_ts[2] == 22.0
 	"""
-	def __init__(self):
+	def __init__(self, dtype=np.float64):
 		"""
 		 The manager maintains a persistent structure in memory and on disk which maps ids to the 
 		 appropriate files and keeps track of lengths. It creates an on disk json file to store 
 		 an id/length map or, if one already exists, updates the map.
+
+		 dtype is the precision of the stored values: np.float64 (default) or np.float32.
 		"""
 
+		if np.dtype(dtype) not in (np.float64, np.float32):
+			raise ValueError("dtype must be np.float64 or np.float32")
+		self._dtype = np.dtype(dtype)
+
 		# set the file name for the time series id/length map
 		file_path = 'id_length_map.json'
 
@@ -99,11 +110,22 @@ class FileStorageManager(StorageManagerInterface):
 			id = str(id)
 
 		# convert the time series to 2-d numpy array with 64-bit floats for both times and values
-		ts = np.vstack((t.times(), t.values())).astype(np.float64)
+		if self._dtype == np.float64:
+			ts = np.vstack((t.times(), t.values())).astype(np.float64)
+
+		# or to a structured array with 64-bit times and 32-bit values
+		else:
+			ts = np.empty(len(t.times()), dtype=[('times', np.float64), ('values', np.float32)])
+			ts['times'] = t.times()
+			ts['values'] = t.values()
 
 		# save the time series to disk as a binary file in .npy format
 		np.save(str(id), ts)
 
+		# the summary statistics of the old values no longer hold
+		if os.path.exists(id + ".stats.json"):
+			os.remove(id + ".stats.json")
+
 		# update the id/length map in memory for this store
 		self._id_dict[id] = len(t.times())
 
@@ -180,10 +202,137 @@ class FileStorageManager(StorageManagerInterface):
 			ts = np.load(id + ".npy")
 
 			# return a SizedContainerTimeSeriesInterface instance
-			return ArrayTimeSeries(ts[0], ts[1])
+			# stored series were validated when they were stored
+			if ts.dtype.names:
+				return ArrayTimeSeries._from_validated(ts['times'], ts['values'])
+			return ArrayTimeSeries._from_validated(ts[0], ts[1])
 		else:
 			return None
 
+	def get_between(self, id, t0, t1):
+		"""
+		Description
+		-----------
+		Method used to return the part of a stored time series with times t0 <= t <= t1
+		without loading the rest of it. The file is memory-mapped, both ends are found by
+		binary search of the stored (ascending) times and only the points in between are
+		read from disk.
+
+		Parameters
+		----------
+		self: Instance of subclass of StorageManagerInterface.
+
+		id : int
+			The id of the time series of interest.
+
+		t0, t1 : float
+			The first and last time of interest.
+
+		Returns
+		-------
+		SizedContainerTimeSeriesInterface : the part of the time series requested by id, or
+		None if there is no time series with this id.
+		"""
+
+		# it should be a string
+		if not isinstance(id, str):
+			id = str(id)
+
+		if id not in self._id_dict:
+			return None
+
+		ts = np.load(id + ".npy", mmap_mode='r')
+		times, values = (ts['times'], ts['values']) if ts.dtype.names else (ts[0], ts[1])
+		lo = np.searchsorted(times, t0, side='left')
+		hi = max(lo, np.searchsorted(times, t1, side='right'))
+		return ArrayTimeSeries._from_validated(np.array(times[lo:hi]), np.array(values[lo:hi]))
+
+	def get_stats(self, id):
+		"""
+		Description
+		-----------
+		Method used to return the summary statistics (mean, std, ...) stored for a time
+		series by store_stats, kept in a small json file next to its .npy file.
+
+		Parameters
+		----------
+		self: Instance of subclass of StorageManagerInterface.
+
+		id : int
+			The id of the time series of interest.
+
+		Returns
+		-------
+		dict : the stored statistics by name; empty if none were stored since the time
+		series was last stored.
+		"""
+
+		# it should be a string
+		if not isinstance(id, str):
+			id = str(id)
+
+		try:
+			with open(id + ".stats.json", "r") as infile:
+				return json.load(infile)
+		except IOError:
+			return dict()
+
+	def store_stats(self, id, stats):
+		"""
+		Description
+		-----------
+		Method used to store summary statistics of a stored time series. They are dropped
+		when the time series is stored again.
+
+		Parameters
+		----------
+		self: Instance of subclass of StorageManagerInterface.
+
+		id : int
+			The id of the time series of interest.
+
+		stats : dict
+			float statistics by name
+		"""
+
+		# it should be a string
+		if not isinstance(id, str):
+			id = str(id)
+
+		with open(id + ".stats.json", "w") as outfile:
+			json.dump(stats, outfile)
+
+	def iter_chunks(self, id, points):
+		"""
+		Description
+		-----------
+		Method used to read a stored time series piece by piece, so series larger than
+		memory can be processed in one pass. The file is memory-mapped and read chunk by chunk.
+
+		Parameters
+		----------
+		self: Instance of subclass of StorageManagerInterface.
+
+		id : int
+			The id of the time series of interest.
+
+		points : int
+			The number of points per chunk.
+
+		Returns
+		-------
+		Generator of (times, values) tuples of np.arrays, in stored order.
+		"""
+
+		# it should be a string
+		if not isinstance(id, str):
+			id = str(id)
+
+		ts = np.load(id + ".npy", mmap_mode='r')
+		times, values = (ts['times'], ts['values']) if ts.dtype.names else (ts[0], ts[1])
+		for start in range(0, len(times), points):
+			yield np.array(times[start:start + points]), np.array(values[start:start + points])
+
 """
 	Create a single instance of the FileStorageManager class. This is used in
 	SMTimeSeries for delegation in methods that are implemented to satisfy interface
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def ragged_offsets(lengths):
+    """
+    Offsets of curves of the given lengths in their concatenation: curve i
+    is times[offsets[i]:offsets[i+1]].
+
+    Examples:
+    ---------
+    >>> ragged_offsets([3, 1, 2]).tolist()
+    [0, 3, 4, 6]
+    """
+    return np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+
+
+def interpolate_ragged(times, values, offsets, new_times):
+    """
+    Piecewise-linear interpolation of many irregularly sampled curves onto
+    one common grid in a single vectorized pass, with the semantics of
+    SizedContainerTimeSeriesInterface.interpolate: times of the grid before
+    (after) a curve's first (last) time get its first (last) value, times
+    equal to one of the curve's times get its value exactly.
+
+    The curves are given as a ragged structure: the times and values of all
+    curves concatenated, and the offsets where each curve starts. Every
+    curve time is located on the grid with one np.searchsorted; counting
+    them per curve and grid time (one np.bincount and cumsum) gives, for
+    every grid time, the last point of each curve at or before it.
+
+    Parameters:
+    -----------
+    times : 1-d np.array
+        concatenated times; the times of each curve ascending and unique
+    values : 1-d np.array
+        concatenated values, one per time
+    offsets : 1-d np.array of int
+        N+1 offsets (see ragged_offsets); every curve needs at least one point
+    new_times : 1-d np.array
+        ascending grid of L times
+
+    Returns:
+    --------
+    np.array of shape (N, L)
+
+    Raises:
+    -------
+    ValueError
+        if the offsets do not match the data or a curve is empty
+
+    Examples:
+    ---------
+    >>> times = np.array([0.1, 0.5, 0.2, 0.4, 0.6])
+    >>> values = np.array([1., 5., 2., 4., 6.])
+    >>> interpolate_ragged(times, values, [0, 2, 5], [0.0, 0.2, 0.3, 0.9]).tolist()
+    [[1.0, 2.0, 3.0, 5.0], [2.0, 2.0, 3.0, 6.0]]
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    new_times = np.asarray(new_times, dtype=np.float64)
+    n, m = len(offsets) - 1, len(new_times)
+    counts = np.diff(offsets)
+    if offsets[0] != 0 or offsets[-1] != len(times) or len(values) != len(times):
+        raise ValueError("offsets do not match the %d concatenated times and values" % len(times))
+    if np.any(counts < 1):
+        raise ValueError("every curve needs at least one point")
+
+    # Curve point k is at or before grid time g exactly when g >= (number of grid times before it)
+    curve = np.repeat(np.arange(n), counts)
+    first_grid = np.searchsorted(new_times, times, side='left')
+    at_or_before = np.bincount(curve * (m + 1) + first_grid, minlength=n * (m + 1))
+    at_or_before = np.cumsum(at_or_before.reshape(n, m + 1), axis=1)[:, :m]
+    j = (offsets[:-1, np.newaxis] + at_or_before - 1).ravel()
+
+    first = np.repeat(offsets[:-1], m)
+    last = np.repeat(offsets[1:] - 1, m)
+    t = np.tile(new_times, n)
+    below = j < first
+    j = np.clip(j, first, last)
+    high = np.minimum(j + 1, last)
+    t_low, t_high = times[j], times[high]
+    v_low, v_high = values[j].astype(np.float64), values[high]
+    at_point = (j == last) | (t_low == t)
+
+    # Between points j and j+1 (same formula as interpolate); nan where there is no next point
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (t - t_low) * ((v_high - v_low) / (t_high - t_low)) + v_low
+    result = np.where(below, values[first], np.where(at_point, v_low, between))
+    return result.reshape(n, m)
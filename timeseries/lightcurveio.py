@@ -0,0 +1,145 @@
+import sys
+import time
+import warnings
+import numpy as np
+
+CHUNK_ROWS = 1 << 18
+
+
+def iter_folded(filepath, columns=(0, 1), dtype=np.float64, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the rows of a (.dat_folded style) whitespace separated light
+    curve file in chunks of chunk_rows rows; a caller that consumes the
+    chunks one at a time holds only one chunk in memory. The file is read
+    through one buffer by the C parser of np.loadtxt (numpy >= 1.23), which
+    converts only the needed columns. Comments (#) and blank lines are
+    skipped.
+
+    Parameters:
+    -----------
+    filepath : str
+        path of the file
+    columns : tuple of int
+        columns to keep (time and magnitude by default)
+    dtype : numpy dtype
+        dtype of the chunks
+    chunk_rows : int
+        rows per chunk
+
+    Yields:
+    -------
+    np.array of shape (rows, len(columns)) per chunk, in file order
+    """
+    with open(filepath, buffering=1 << 20) as f, warnings.catch_warnings():
+        # loadtxt warns when it finds no rows left, which ends the stream
+        warnings.simplefilter('ignore', UserWarning)
+        while True:
+            chunk = np.loadtxt(f, usecols=columns, dtype=dtype, max_rows=chunk_rows, ndmin=2)
+            if not len(chunk):
+                return
+            yield chunk
+
+
+def load_folded(filepath, columns=(0, 1), dtype=np.float64, chunk_rows=CHUNK_ROWS):
+    """
+    Loads a (.dat_folded style) light curve file as sorted arrays of unique
+    times and their values. Only the needed columns are kept of each chunk.
+    Files already sorted by time (as phase folded files usually are) are
+    recognized in one pass; otherwise duplicate times (the first row of each
+    is kept) are dropped with one vectorized sort.
+
+    The whole curve is returned in memory: the parsed chunks are joined
+    before the sort, so the peak is about twice the kept columns of the
+    file (never the unused columns). Use iter_folded to stream a file that
+    does not fit.
+
+    Parameters:
+    -----------
+    filepath : str
+        path of the file
+    columns : tuple of int
+        column of the times, then the column(s) of the values
+    dtype : numpy dtype
+        dtype of the values (times are always float64)
+    chunk_rows : int
+        rows parsed per chunk (see iter_folded)
+
+    Returns:
+    --------
+    times, values : np.array
+        times in ascending order, values of shape (rows,) for a single value
+        column, else (rows, len(columns) - 1)
+
+    Raises:
+    -------
+    IOError
+        if the file can not be read
+    ValueError
+        if the file is empty or has rows that are not numbers
+
+    Examples:
+    ---------
+    >>> import tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), 'lc.dat_folded')
+    >>> with open(path, 'w') as f:
+    ...     _ = f.write("0.5\\t2.0\\t0.01\\n0.1\\t1.0\\t0.01\\n0.5\\t3.0\\t0.01\\n")
+    >>> times, values = load_folded(path)
+    >>> times.tolist(), values.tolist()
+    ([0.1, 0.5], [1.0, 2.0])
+    """
+    chunks = [chunk for chunk in iter_folded(filepath, columns, np.float64, chunk_rows)]
+    if not chunks:
+        raise ValueError("%s holds no light curve data" % filepath)
+    data = np.concatenate(chunks)
+    if np.all(np.diff(data[:, 0]) > 0):
+        times, values = data[:, 0], data[:, 1:].astype(dtype)
+    else:
+        times, indices = np.unique(data[:, 0], return_index=True)
+        values = data[indices, 1:].astype(dtype)
+    if values.shape[1] == 1:
+        values = values[:, 0]
+    return times, values
+
+
+def benchmark(filepaths, repeat=5):
+    """
+    Times load_folded against loading with the generic np.loadtxt (and the
+    same dedup and sort) on the given files.
+
+    Parameters:
+    -----------
+    filepaths : list of str
+        files to load
+    repeat : int
+        passes over the files; the fastest one counts
+
+    Returns:
+    --------
+    dict of str -> float
+        seconds per pass over all files for 'loadtxt' and 'load_folded'
+    """
+    def loadtxt(filepath):
+        data = np.loadtxt(filepath)[:, :2]
+        _, indices = np.unique(data[:, 0], return_index=True)
+        return data[indices].T
+
+    timings = {}
+    for name, load in [('loadtxt', loadtxt), ('load_folded', load_folded)]:
+        best = np.inf
+        for i in range(repeat):
+            start = time.perf_counter()
+            for filepath in filepaths:
+                load(filepath)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+if __name__ == "__main__":
+    # python lightcurveio.py FILE [FILE ...] benchmarks the loaders on the files
+    if len(sys.argv) < 2:
+        print("Usage: python lightcurveio.py FILE [FILE ...]")
+    else:
+        timings = benchmark(sys.argv[1:])
+        for name, seconds in sorted(timings.items(), key=lambda x: x[1]):
+            print("%-12s %8.2f ms  (%.1fx)" % (name, 1000 * seconds, timings['loadtxt'] / seconds))
@@ -0,0 +1,105 @@
+import numpy as np
+
+AGGREGATIONS = ('mean', 'min', 'max', 'last', 'count')
+
+# points read from disk at a time by SMTimeSeries.resample
+CHUNK_POINTS = 1 << 20
+
+
+def _check(period, agg):
+    if agg not in AGGREGATIONS:
+        raise ValueError("Unknown aggregation %r (choose from %s)" % (agg, ", ".join(AGGREGATIONS)))
+    if not period > 0:
+        raise ValueError("A resampling period needs to be positive, not %r" % (period,))
+
+
+def _partial(times, values, period):
+    """
+    Key, sum, count, min, max and last value of every bucket with points in
+    one chunk of ascending times, as a tuple of np.arrays.
+    """
+    keys = np.floor_divide(times, period).astype(np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], len(keys))
+    return (keys[starts], np.add.reduceat(values, starts, dtype=np.float64), ends - starts,
+            np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts), values[ends - 1])
+
+
+def resample_chunks(chunks, period, agg='mean'):
+    """
+    Aggregates a series given as consecutive chunks of (times, values) into
+    buckets of length period, in one pass over the chunks. Bucket k holds
+    the times k * period <= t < (k + 1) * period and is labelled with its
+    start time; only buckets with points are returned.
+
+    Every chunk is reduced on its own: the bucket of each point is found
+    with one vectorized floor division and the points of each bucket (runs
+    of equal buckets, as the times are ascending) are reduced with
+    np.add.reduceat, np.minimum.reduceat and np.maximum.reduceat. A bucket
+    split between two chunks is then merged with the same reductions.
+
+    Parameters:
+    -----------
+    chunks : iterable of (np.array, np.array)
+        times and values; the times ascending within and across chunks
+    period : number
+        length of a bucket
+    agg : str
+        'mean', 'min', 'max', 'last' (value with the latest time) or 'count'
+
+    Returns:
+    --------
+    times, values : np.array
+        bucket start times and aggregated values
+
+    Raises:
+    -------
+    ValueError
+        if agg is unknown, period is not positive or the times are not ascending
+
+    Examples:
+    ---------
+    >>> chunks = [(np.array([0.5, 1.0, 1.5]), np.array([1., 2., 4.])), (np.array([1.75, 3.5]), np.array([6., 5.]))]
+    >>> times, values = resample_chunks(chunks, 1.0, 'mean')
+    >>> times.tolist(), values.tolist()
+    ([0.0, 1.0, 3.0], [1.0, 4.0, 5.0])
+    """
+    _check(period, agg)
+    parts, last_time = [], None
+    for times, values in chunks:
+        times, values = np.asarray(times), np.asarray(values)
+        if not len(times):
+            continue
+        if np.any(times[1:] <= times[:-1]) or (last_time is not None and times[0] <= last_time):
+            raise ValueError("Resampling needs ascending times")
+        last_time = times[-1]
+        parts.append(_partial(times, values, period))
+    if not parts:
+        return np.array([]), np.array([])
+
+    keys, sums, counts, mins, maxs, lasts = [np.concatenate(columns) for columns in zip(*parts)]
+    if len(parts) > 1:
+        # only the first bucket of a chunk can continue the last one of the chunk before
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        ends = np.append(starts[1:], len(keys))
+        keys, sums, counts = keys[starts], np.add.reduceat(sums, starts), np.add.reduceat(counts, starts)
+        mins, maxs = np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+        lasts = lasts[ends - 1]
+
+    results = {'mean': lambda: sums / counts, 'min': lambda: mins, 'max': lambda: maxs,
+               'last': lambda: lasts, 'count': lambda: counts}
+    return keys * period, results[agg]()
+
+
+def resample_arrays(times, values, period, agg='mean'):
+    """
+    Aggregates the ascending times and values of a series into buckets of
+    length period (see resample_chunks).
+
+    Examples:
+    ---------
+    >>> times, values = resample_arrays(np.array([0, 1, 2, 5]), np.array([3, 1, 2, 7]), 2, 'max')
+    >>> times.tolist(), values.tolist()
+    ([0, 2, 4], [3, 2, 7])
+    """
+    return resample_chunks([(times, values)], period, agg)
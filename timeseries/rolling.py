@@ -0,0 +1,113 @@
+import operator
+from collections import deque
+import numpy as np
+
+
+class Rolling():
+    """
+    Trailing-window aggregations of a sized time series (see
+    SizedContainerTimeSeriesInterface.rolling). The window ending at each
+    point either holds the last `window` points (by='count'; points with
+    fewer before them get nan) or all points with times in
+    (t - window, t] (by='time').
+
+    Every aggregation is O(n) whatever the window size: sums, means and
+    standard deviations are differences of cumulative sums (of the values
+    minus their mean, which keeps the sums of squares accurate), minima and
+    maxima keep a monotonic deque of the candidates of the current window.
+    The results are series of the same class on the same (shared) times.
+
+    Attributes:
+    -----------
+    ts : instance of subclass of SizedContainerTimeSeriesInterface
+        the series, with ascending times
+    window : int or float
+        number of points (by='count') or length of time (by='time')
+    by : str
+        'count' or 'time'
+
+    Examples:
+    ---------
+    >>> from arraytimeseries import ArrayTimeSeries
+    >>> ts = ArrayTimeSeries(times=[0, 1, 2, 4, 5], values=[1, 3, 2, 6, 4])
+    >>> ts.rolling(2).sum().values().tolist()
+    [nan, 4.0, 5.0, 8.0, 10.0]
+    >>> ts.rolling(2.5, by='time').max().values().tolist()
+    [1.0, 3.0, 3.0, 6.0, 6.0]
+    """
+    BYS = ('count', 'time')
+
+    def __init__(self, ts, window, by='count'):
+        if by not in self.BYS:
+            raise ValueError("Unknown window type %r (choose from %s)" % (by, ", ".join(self.BYS)))
+        if by == 'count' and (int(window) != window or window < 1):
+            raise ValueError("A count window needs a positive number of points, not %r" % (window,))
+        if not window > 0:
+            raise ValueError("A time window needs a positive length, not %r" % (window,))
+        self.ts = ts
+        self.window = window
+        self.by = by
+        self._times = np.asarray(ts.times())
+        self._values = np.asarray(ts.values(), dtype=np.float64)
+        if len(self._times) > 1 and not np.all(self._times[1:] > self._times[:-1]):
+            raise ValueError("Rolling windows need ascending times")
+
+        # window i holds the points starts[i]..i
+        positions = np.arange(len(self._times))
+        if by == 'count':
+            self._starts = np.maximum(positions - int(window) + 1, 0)
+            self._complete = positions >= int(window) - 1
+        else:
+            self._starts = np.searchsorted(self._times, self._times - window, side='right')
+            self._complete = np.ones(len(positions), dtype=bool)
+        self._counts = positions + 1 - self._starts
+
+    def _series(self, values):
+        """the aggregated values as a series like ts (see _derived), on its times"""
+        values = np.where(self._complete, values, np.nan)
+        return self.ts._derived(getattr(self.ts, '_index', self.ts._times), values)
+
+    def _window_sums(self, values):
+        sums = np.concatenate([[0.0], np.cumsum(values)])
+        return sums[1:] - sums[self._starts]
+
+    def sum(self):
+        """Sum of each window"""
+        shift = np.mean(self._values) if len(self._values) else 0.0
+        return self._series(self._window_sums(self._values - shift) + self._counts * shift)
+
+    def mean(self):
+        """Mean of each window"""
+        shift = np.mean(self._values) if len(self._values) else 0.0
+        return self._series(self._window_sums(self._values - shift) / self._counts + shift)
+
+    def std(self):
+        """Sample standard deviation (ddof=1, as std()) of each window; nan for single points"""
+        centered = self._values - (np.mean(self._values) if len(self._values) else 0.0)
+        sums = self._window_sums(centered)
+        squares = self._window_sums(centered ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variances = (squares - sums ** 2 / self._counts) / (self._counts - 1)
+        variances = np.where(self._counts > 1, np.maximum(variances, 0), np.nan)
+        return self._series(np.sqrt(variances))
+
+    def _extremes(self, dominated):
+        values, starts = self._values.tolist(), self._starts.tolist()
+        extremes, candidates = [], deque()
+        for i, value in enumerate(values):
+            # candidates stay in window order with values getting worse
+            while candidates and dominated(values[candidates[-1]], value):
+                candidates.pop()
+            candidates.append(i)
+            while candidates[0] < starts[i]:
+                candidates.popleft()
+            extremes.append(values[candidates[0]])
+        return self._series(np.array(extremes))
+
+    def min(self):
+        """Minimum of each window"""
+        return self._extremes(operator.ge)
+
+    def max(self):
+        """Maximum of each window"""
+        return self._extremes(operator.le)
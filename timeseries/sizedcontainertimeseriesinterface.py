@@ -1,6 +1,9 @@
 import abc
 import numpy as np
 from timeseriesinterface import TimeSeriesInterface
+from timeindex import TimeIndex, has_repeats
+from rolling import Rolling
+from resampling import resample_arrays
 
 class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
     """
@@ -12,6 +15,9 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
     # abbreviation will occur in __str__() and __repr__()
     MAX_LENGTH = 10
 
+    # no instance attributes here, so subclasses can use __slots__
+    __slots__ = ()
+
     ###############################################################
     ## Abstract methods that are defined differently for different
     ## subclasses of SizedContainerTimeSeriesInterface
@@ -151,6 +157,7 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
             self._values[index] = item
         except IndexError:
             raise IndexError("Index out of bounds!")
+        self._clear_stats()
 
     def __contains__(self, needle):
         """
@@ -234,10 +241,13 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
 
         Notes
         -----
-        Casts `self._values` into a np-array for fasted norm calcualtion.
-        This won't impact the final return value, as it is a float.
+        Computed with one np.dot of the values (wrapped, not copied) on first
+        use and cached until an item is set.
         """
-        return (np.array(self._values)**2).sum()
+        def norm():
+            values = np.asarray(self._values)
+            return np.dot(values, values)
+        return self._cached('abs', norm)
 
     def __bool__(self):
         """
@@ -255,10 +265,65 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
         """
         return bool(abs(self))
 
+    def min(self):
+        """
+        Description
+        -----------
+        The smallest value, computed on first use and cached until an item
+        is set.
+
+        Raises
+        ------
+        ValueError: if the series is empty
+        """
+        return self._cached('min', lambda: np.asarray(self._values).min())
+
+    def max(self):
+        """
+        Description
+        -----------
+        The largest value, computed on first use and cached until an item
+        is set.
+
+        Raises
+        ------
+        ValueError: if the series is empty
+        """
+        return self._cached('max', lambda: np.asarray(self._values).max())
+
+    def _cached(self, name, compute):
+        """
+        summary statistic `name` of the values (mean, std, abs, min or max):
+        compute() on first use, then the cached result until an item is set
+        """
+        stats = self._current_stats()
+        if name not in stats:
+            stats[name] = compute()
+        return stats[name]
+
+    def _current_stats(self):
+        """the dict of cached statistics of the current values"""
+        if self._stats is None:
+            self._stats = {}
+        return self._stats
+
+    def _clear_stats(self):
+        """drops the cached statistics, after the values changed"""
+        self._stats = None
+
     def values(self):
         """Return values as np.array for use in unit tests"""
         return np.array(self._values)
 
+    def values_view(self):
+        """
+        Return values as a read-only np.array, without copying them when
+        they are stored in one (values() always returns a writable copy)
+        """
+        view = np.asarray(self._values).view()
+        view.flags.writeable = False
+        return view
+
     def times(self):
         """Return values as np.array for use in unit tests"""
         return np.array(self._times)
@@ -322,6 +387,238 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
         interpolated_ts = [interpolate_val(self._times, self._values, t) for t in ts_to_interpolate]
         return self.__class__(values=interpolated_ts, times=ts_to_interpolate)
 
+    ALIGN_HOWS = ('inner', 'outer', 'left')
+    ALIGN_FILLS = ('interpolate', 'nan')
+
+    def align(self, other, how='inner', fill='interpolate'):
+        """
+        Description
+        -----------
+        Puts two time series with different time domains on common times, so
+        they can be combined with arithmetic or correlated. The time arrays of
+        both series are merged in one linear pass (a stable sort of two
+        sorted runs), and the two results share their times, so arithmetic
+        on them only does an O(1) alignment check.
+
+        Parameters
+        ----------
+        other: instance of subclass of SizedContainerTimeSeriesInterface
+        how: str
+            'inner' keeps the times of both series, 'outer' the times of
+            either series, 'left' the times of self
+        fill: str
+            values at times a series does not have: 'interpolate' (linear
+            between neighbours, first/last value outside the domain, as in
+            interpolate) or 'nan'
+
+        Returns
+        -------
+        Tuple of two series (of the classes of self and other, see _derived)
+        on the same times
+
+        Raises
+        ------
+        ValueError: if how or fill is unknown
+
+        Examples
+        --------
+        >>> from arraytimeseries import ArrayTimeSeries
+        >>> a = ArrayTimeSeries(times=[0, 1, 2, 3], values=[0, 10, 20, 30])
+        >>> b = ArrayTimeSeries(times=[1, 1.5, 3], values=[1, 2, 5])
+        >>> a2, b2 = a.align(b, how='outer')
+        >>> a2.times().tolist(), a2.values().tolist(), b2.values().tolist()
+        ([0.0, 1.0, 1.5, 2.0, 3.0], [0.0, 10.0, 15.0, 20.0, 30.0], [1.0, 1.0, 2.0, 3.0, 5.0])
+        >>> (a2 + b2).values().tolist()
+        [1.0, 11.0, 17.0, 23.0, 35.0]
+        >>> a.align(b, how='left', fill='nan')[1].values().tolist()
+        [nan, 1.0, nan, 5.0]
+        """
+        if how not in self.ALIGN_HOWS:
+            raise ValueError("Unknown how %r (choose from %s)" % (how, ", ".join(self.ALIGN_HOWS)))
+        if fill not in self.ALIGN_FILLS:
+            raise ValueError("Unknown fill %r (choose from %s)" % (fill, ", ".join(self.ALIGN_FILLS)))
+        lhs_times, lhs_values = self._sorted_arrays()
+        rhs_times, rhs_values = other._sorted_arrays()
+
+        if how == 'left':
+            times = lhs_times
+        else:
+            # timsort merges the two ascending runs in linear time
+            merged = np.concatenate([lhs_times, rhs_times])
+            merged.sort(kind='stable')
+            repeated = merged[1:] == merged[:-1]
+            if how == 'inner':
+                times = merged[1:][repeated]
+            else:
+                times = merged[np.concatenate([[True], ~repeated])]
+
+        lhs = self._derived(TimeIndex(times), self._fill(lhs_times, lhs_values, times, fill))
+        rhs = other._derived(getattr(lhs, '_index', lhs._times), other._fill(rhs_times, rhs_values, times, fill))
+        return lhs, rhs
+
+    def _derived(self, times, values):
+        """
+        a series like this one for values computed from it (windows,
+        buckets, slices, aligned values); see StandardizedTimeSeries._derived
+        """
+        return self._from_validated(times, values)
+
+    def _time_range(self, t0, t1):
+        """positions lo, hi of the times t0 <= t <= t1, found by binary search"""
+        times = np.asarray(self._times)
+        return np.searchsorted(times, t0, side='left'), np.searchsorted(times, t1, side='right')
+
+    def between(self, t0, t1):
+        """
+        Description
+        -----------
+        The part of the series with times t0 <= t <= t1. The two ends are
+        found by binary search of the (ascending) times in O(log n). For an
+        ArrayTimeSeries the result is a view: its times and values share
+        memory with this series, so setting an item changes both.
+
+        Parameters
+        ----------
+        t0, t1: numbers
+            first and last time of the range
+
+        Returns
+        -------
+        A series of the same class (an empty one if no time is in the range;
+        a plain ArrayTimeSeries view for a StandardizedTimeSeries)
+
+        Examples
+        --------
+        >>> from arraytimeseries import ArrayTimeSeries
+        >>> ts = ArrayTimeSeries(times=[1, 2, 3, 5, 8], values=[10, 20, 30, 50, 80])
+        >>> ts.between(2, 5).values().tolist()
+        [20, 30, 50]
+        >>> ts.loc[2.5:8].times().tolist(), ts.loc[5], ts.at(8)
+        ([3, 5, 8], 50, 80)
+        """
+        lo, hi = self._time_range(t0, t1)
+        return self._positions(lo, max(lo, hi))
+
+    def _positions(self, lo, hi):
+        """
+        the points lo..hi-1 as a series like this one (see _derived): for
+        np.array storage (ArrayTimeSeries) both are views into this series
+        """
+        return self._derived(self._times[lo:hi], self._values[lo:hi])
+
+    def at(self, t):
+        """
+        Description
+        -----------
+        The value at time t, found by binary search of the (ascending) times.
+
+        Raises
+        ------
+        KeyError: if t is not one of the times
+        """
+        lo, hi = self._time_range(t, t)
+        if hi <= lo:
+            raise KeyError(t)
+        return self._values[lo]
+
+    @property
+    def loc(self):
+        """
+        Description
+        -----------
+        Selection by time rather than position: ts.loc[t0:t1] is
+        ts.between(t0, t1) (either end may be left out), ts.loc[t] is ts.at(t).
+        """
+        return _TimeLocator(self)
+
+    def rolling(self, window, by='count'):
+        """
+        Description
+        -----------
+        Trailing-window statistics: rolling(window).mean(), .std(), .min(),
+        .max() and .sum() each return a series on the same times with the
+        statistic of the window ending at each point, in O(n) whatever the
+        window size (see rolling.Rolling).
+
+        Parameters
+        ----------
+        window: int or float
+            number of points (by='count') or length of time (by='time')
+        by: str
+            'count' (incomplete windows at the start give nan) or 'time'
+            (the points with times in (t - window, t])
+
+        Returns
+        -------
+        Rolling (its results are plain ArrayTimeSeries for a
+        StandardizedTimeSeries)
+
+        Raises
+        ------
+        ValueError: if the window is not positive, by is unknown or the
+        times are not ascending
+        """
+        return Rolling(self, window, by)
+
+    def resample(self, period, agg='mean'):
+        """
+        Description
+        -----------
+        Downsamples the series by aggregating its points into buckets of
+        length period: bucket k holds the times k * period <= t < (k + 1) *
+        period and becomes one point at time k * period. Buckets without
+        points are left out. The buckets are found and reduced vectorized
+        (see resampling.resample_chunks).
+
+        Parameters
+        ----------
+        period: number
+            length of a bucket
+        agg: str
+            'mean', 'min', 'max', 'last' (value with the latest time) or
+            'count' (number of points)
+
+        Returns
+        -------
+        A series of the same class (a plain ArrayTimeSeries for a
+        StandardizedTimeSeries, see _derived)
+
+        Raises
+        ------
+        ValueError: if agg is unknown, period is not positive or the times
+        are not ascending
+
+        Examples
+        --------
+        >>> from arraytimeseries import ArrayTimeSeries
+        >>> ts = ArrayTimeSeries(times=[0, 1, 2, 3, 7], values=[1, 3, 2, 6, 4])
+        >>> ts.resample(2).items()
+        [(0, 2.0), (2, 4.0), (6, 4.0)]
+        >>> ts.resample(5, 'count').values().tolist()
+        [4, 1]
+        """
+        times, values = resample_arrays(np.asarray(self._times), np.asarray(self._values), period, agg)
+        return self._derived(TimeIndex(times), values)
+
+    def _sorted_arrays(self):
+        """times and values as np.arrays in ascending time order"""
+        times, values = np.asarray(self.times()), np.asarray(self.values())
+        if len(times) > 1 and not np.all(times[1:] > times[:-1]):
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+        return times, values
+
+    @staticmethod
+    def _fill(times, values, new_times, fill):
+        """values of a series (ascending times) at new_times (ascending), see align"""
+        if fill == 'interpolate':
+            return np.interp(new_times, times, values)
+        positions = np.minimum(np.searchsorted(times, new_times), len(times) - 1)
+        found = times[positions] == new_times
+        filled = np.full(len(new_times), np.nan)
+        filled[found] = values[positions[found]]
+        return filled
+
     ##############################################################################
     ## GLOBAL HELPER METHODS FOR ALL CONTAINER TIME SERIES.
     ## NO NEED TO IMPLEMENT IN SUBCLASS.
@@ -353,12 +650,24 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
     @staticmethod
     def _check_time_domains_helper(lhs, rhs):
 
-        # J: casting to list here since comparing np.arrays
-        # with == yields a boolean array with results of elemwise
-        # comparinsons.
-        if not list(lhs._times)==list(rhs._times):
+        # Series derived from one another share their times (or TimeIndex):
+        # an O(1) identity check. Distinct indexes compare lengths and hashes first.
+        if lhs._times is rhs._times:
+            return
+        lhs_index, rhs_index = getattr(lhs, '_index', None), getattr(rhs, '_index', None)
+        if isinstance(lhs_index, TimeIndex) and isinstance(rhs_index, TimeIndex):
+            same = lhs_index == rhs_index
+        else:
+            # J: casting to list here since comparing np.arrays
+            # with == yields a boolean array with results of elemwise
+            # comparinsons.
+            same = list(lhs._times)==list(rhs._times)
+        if not same:
             raise ValueError(str(lhs)+' and '+str(rhs)+' must have identical time domains')
 
+    # vectorized check for repeated times (see timeindex.has_repeats)
+    _has_repeats = staticmethod(has_repeats)
+
     @staticmethod
     def is_sequence(seq):
         """
@@ -379,3 +688,18 @@ class SizedContainerTimeSeriesInterface(TimeSeriesInterface):
         except TypeError as te:
             # J: unified string formatting with .format()
             raise TypeError("{} is not a valid sequence".format(seq))
+
+
+class _TimeLocator():
+    """Time based indexing of a sized time series (see SizedContainerTimeSeriesInterface.loc)"""
+    def __init__(self, ts):
+        self._ts = ts
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step is not None:
+                raise ValueError("Time slices do not support a step")
+            t0 = -np.inf if key.start is None else key.start
+            t1 = np.inf if key.stop is None else key.stop
+            return self._ts.between(t0, t1)
+        return self._ts.at(key)
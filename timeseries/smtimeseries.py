@@ -1,6 +1,7 @@
 from sizedcontainertimeseriesinterface import SizedContainerTimeSeriesInterface
 from arraytimeseries import ArrayTimeSeries
 from filestoragemanager import FileStorageManagerSingleton
+from resampling import resample_chunks, CHUNK_POINTS
 import numbers
 import numpy as np
 
@@ -50,10 +51,12 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		"""
 		self.__class__.is_sequence(times)
 		self.__class__.is_sequence(values)
-		self._times = (list(times))
+		self._times = times if isinstance(times, np.ndarray) else (list(times))
 
 		if isinstance(values, dict):
 			self._values = (list(values.values()))
+		elif isinstance(values, np.ndarray):
+			self._values = values
 		else:
 			self._values = (list(values))
 
@@ -65,6 +68,14 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		FileStorageManagerSingleton.store(str(id), ArrayTimeSeries(self._times, self._values))
 		self._id = str(id)
 
+	@classmethod
+	def _from_validated(cls, times, values, copy=False):
+		"""
+		Constructor used for derived series (see ArrayTimeSeries._from_validated).
+		The series is stored under a new id like any other.
+		"""
+		return cls(np.asarray(times), np.asarray(values))
+
 	@classmethod
 	def from_db(cls, id):
 		"""
@@ -395,11 +406,9 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 
 		Notes
 		-----
-		Casts `self._values` into a np-array for fasted norm calcualtion.
-		This won't impact the final return value, as it is a float.
+		Cached on disk with the time series (see _cached).
 		"""
-		ts = FileStorageManagerSingleton.get(self._id)
-		return abs(ts)
+		return self._cached('abs', lambda: abs(FileStorageManagerSingleton.get(self._id)))
 
 	def __bool__(self):
 		"""
@@ -415,14 +424,18 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		-------
 		True/False
 		"""
-		ts = FileStorageManagerSingleton.get(self._id)
-		return bool(abs(ts))
+		return bool(abs(self))
 
 	def values(self):
 		"""Return values for use in unit tests"""
 		ts = FileStorageManagerSingleton.get(self._id)
 		return ts.values()
 
+	def values_view(self):
+		"""Return the stored values as a read-only np.array (see values)"""
+		ts = FileStorageManagerSingleton.get(self._id)
+		return ts.values_view()
+
 	def times(self):
 		"""Return times for use in unit tests"""
 		ts = FileStorageManagerSingleton.get(self._id)
@@ -444,11 +457,43 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		self: TimeSeries instance
 		ts_to_interpolate: list or other sequence of times to be interpolated
 
+		The stored series is loaded once and interpolated with
+		ArrayTimeSeries.interpolate (np.interp); the arrays are stored as they are.
 		"""
 		ts = FileStorageManagerSingleton.get(self._id)
 		arrayinterpolate = ts.interpolate(newTimes)
 		return SMTimeSeries(arrayinterpolate.times(), arrayinterpolate.values())
 
+	def between(self, t0, t1):
+		"""
+		Returns a new SMTimeSeries instance with the points of times t0 <= t <= t1.
+		Only these points are read from disk (see FileStorageManager.get_between).
+		"""
+		ts = FileStorageManagerSingleton.get_between(self._id, t0, t1)
+		return SMTimeSeries(ts.times(), ts.values())
+
+	def at(self, t):
+		"""
+		Returns the value at time t, reading only that point from disk.
+
+		Raises
+		------
+		KeyError : if the time series has no point at time t
+		"""
+		ts = FileStorageManagerSingleton.get_between(self._id, t, t)
+		if not len(ts):
+			raise KeyError(t)
+		return ts[0]
+
+	def resample(self, period, agg='mean', chunk_points=CHUNK_POINTS):
+		"""
+		Returns a new SMTimeSeries instance aggregated into buckets of length period (see
+		SizedContainerTimeSeriesInterface.resample). The stored series is read from disk
+		chunk_points points at a time, so only one chunk is in memory at once.
+		"""
+		times, values = resample_chunks(FileStorageManagerSingleton.iter_chunks(self._id, chunk_points), period, agg)
+		return SMTimeSeries(times, values)
+
 	def mean(self, chunk = None):
 		"""
 		Method used to calculate the mean of the time series. 
@@ -461,8 +506,7 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		--------
 		np.mean : the mean of the time series
 		"""
-		ts = FileStorageManagerSingleton.get(self._id)
-		return np.mean(ts._values)
+		return self._cached('mean', lambda: np.mean(FileStorageManagerSingleton.get(self._id)._values))
 
 	def std(self, chunk = None):
 		"""
@@ -476,5 +520,25 @@ class SMTimeSeries(SizedContainerTimeSeriesInterface):
 		--------
 		np.std : the standard deviation of the time series 
 		"""
-		ts = FileStorageManagerSingleton.get(self._id)
-		return np.std(ts._values, ddof=1)
\ No newline at end of file
+		return self._cached('std', lambda: np.std(FileStorageManagerSingleton.get(self._id)._values, ddof=1))
+
+	def min(self):
+		"""The smallest value, cached on disk with the time series (see _cached)"""
+		return self._cached('min', lambda: FileStorageManagerSingleton.get(self._id).min())
+
+	def max(self):
+		"""The largest value, cached on disk with the time series (see _cached)"""
+		return self._cached('max', lambda: FileStorageManagerSingleton.get(self._id).max())
+
+	def _cached(self, name, compute):
+		"""
+		Summary statistic `name` of the stored values: computed (loading the time series)
+		on first use and then stored next to it by the storage manager, so later calls,
+		also of other SMTimeSeries instances of the same id, only read the small stats
+		file. Storing the time series again (e.g. setting an item) drops the statistics.
+		"""
+		stats = FileStorageManagerSingleton.get_stats(self._id)
+		if name not in stats:
+			stats[name] = float(compute())
+			FileStorageManagerSingleton.store_stats(self._id, stats)
+		return stats[name]
\ No newline at end of file
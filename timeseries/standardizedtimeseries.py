@@ -0,0 +1,135 @@
+from arraytimeseries import ArrayTimeSeries
+from fftbackend import get_backend
+import numpy as np
+
+class StandardizedTimeSeries(ArrayTimeSeries):
+    """
+    An ArrayTimeSeries whose values are standardized to mean 0 and (sample)
+    standard deviation 1 once, when it is constructed. The distance functions
+    recognize it and skip re-standardizing: `mean()` and `std()` return the
+    cached 0 and 1, and the real-input spectrum of the values is computed on
+    first use and then reused by every cross-correlation.
+
+    Attributes:
+    ----------
+        _values : np.array
+            Standardized data points (read-only)
+        _times : np.array
+            Time values
+
+    Notes
+    -----
+        PRE: the values are not all equal (their standard deviation is not 0)
+
+    WARNINGS:
+        - The values are read-only; setting an item raises a TypeError.
+        - Arithmetic (except negation), rolling statistics, resample(),
+          between() and align() return a plain ArrayTimeSeries, since the
+          result is in general no longer standardized.
+        - interpolate() re-standardizes the interpolated values.
+    """
+    def __init__(self, times, values, standardized=False):
+        """
+        Parameters:
+        ----------
+            times : sequence-like
+                Time values. Mandatory
+            values : sequence-like
+                Data points, standardized here. Mandatory.
+            standardized : bool
+                The values already have mean 0 and standard deviation 1 and are
+                taken as they are.
+
+        Examples:
+        ---------
+        >>> ts = StandardizedTimeSeries(times=[1, 2, 3], values=[100, 200, 300])
+        >>> ts.values().tolist()
+        [-1.0, 0.0, 1.0]
+        >>> ts.mean(), ts.std()
+        (0.0, 1.0)
+        """
+        super().__init__(times, values)
+        self._standardize(standardized)
+
+    def _standardize(self, standardized):
+        if not standardized:
+            self._values = (self._values - np.mean(self._values)) / np.std(self._values, ddof=1)
+        else:
+            # a view, so the flag below does not change the caller's array
+            self._values = self._values.view()
+        self._values.flags.writeable = False
+        self._spectrum = None
+
+    @classmethod
+    def _from_validated(cls, times, values, copy=False, standardized=False):
+        """
+        Trusted constructor (see ArrayTimeSeries._from_validated) that
+        standardizes the values unless standardized is True.
+        """
+        ts = super()._from_validated(times, values, copy)
+        ts._standardize(standardized)
+        return ts
+
+    @classmethod
+    def from_series(cls, ts):
+        """
+        Standardized copy of any sized time series, or ts itself if it is
+        already a StandardizedTimeSeries.
+
+        Examples:
+        ---------
+        >>> ts = StandardizedTimeSeries.from_series(ArrayTimeSeries(times=[1, 2, 3], values=[1, 2, 3]))
+        >>> StandardizedTimeSeries.from_series(ts) is ts
+        True
+        """
+        if isinstance(ts, cls):
+            return ts
+        if isinstance(ts, ArrayTimeSeries):
+            return cls._from_validated(ts._index, ts._values)
+        return cls._from_validated(ts.times(), ts.values())
+
+    def __setitem__(self, index, item):
+        raise TypeError("StandardizedTimeSeries is read-only")
+
+    def _derived(self, times, values):
+        """values computed from the series are taken as they are, not re-standardized"""
+        return ArrayTimeSeries._from_validated(times, values)
+
+    def _unstandardized(self):
+        return ArrayTimeSeries._from_validated(self._index, self._values)
+
+    def __add__(self, rhs):
+        return self._unstandardized() + rhs
+
+    def __sub__(self, rhs):
+        return self._unstandardized() - rhs
+
+    def __mul__(self, rhs):
+        return self._unstandardized() * rhs
+
+    def __neg__(self):
+        return self._from_validated(self._index, -self._values, standardized=True)
+
+    def __pos__(self):
+        return self
+
+    def mean(self, chunk = None):
+        """The mean of a standardized time series: 0"""
+        return 0.0
+
+    def std(self, chunk = None):
+        """The standard deviation of a standardized time series: 1"""
+        return 1.0
+
+    def spectrum(self):
+        """
+        Real-input FFT of the values, computed once with the current FFT
+        backend (see fftbackend.get_backend) and cached.
+
+        Returns:
+        --------
+        np.array of len(self)//2 + 1 complex coefficients
+        """
+        if self._spectrum is None:
+            self._spectrum = get_backend().rfft(self._values)
+        return self._spectrum
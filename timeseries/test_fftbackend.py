@@ -0,0 +1,42 @@
+import numpy as np
+from pytest import raises
+import fftbackend
+from fftbackend import next_fast_len, available_backends, benchmark, select_backend, set_backend, get_backend
+
+def test_next_fast_len():
+    def smooth(n):
+        for p in (2, 3, 5):
+            while n % p == 0:
+                n //= p
+        return n == 1
+    for n in range(1, 300):
+        length = next_fast_len(n)
+        assert length >= n and smooth(length)
+        assert not any(smooth(m) for m in range(n, length))
+
+def test_backends_agree():
+    x = np.random.randn(4, 25)
+    for backend in available_backends().values():
+        assert np.allclose(backend.rfft(x), np.fft.rfft(x))
+        assert np.allclose(backend.irfft(backend.rfft(x), 25), x)
+        assert backend.next_fast_len(97) >= 97
+
+def test_select_backend():
+    timings = benchmark(available_backends(), (8, 16), repeat=2)
+    assert set(timings) == set(available_backends())
+    assert select_backend('auto', shape=(8, 16)).name in timings
+    with raises(ValueError):
+        select_backend('fftw')
+
+    previous = fftbackend._backend, fftbackend._config
+    try:
+        assert set_backend('numpy') is get_backend()
+        # a configured backend is only selected on first use
+        fftbackend.configure('fftw')
+        assert fftbackend._backend is None
+        with raises(ValueError):
+            get_backend()
+        fftbackend.configure('numpy')
+        assert get_backend().name == 'numpy'
+    finally:
+        fftbackend._backend, fftbackend._config = previous
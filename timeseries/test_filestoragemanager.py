@@ -66,6 +66,27 @@ def test_get_return_none():
 
 	remove_test_files()
 
+def test_float32_values():
+	fsm = FileStorageManager(dtype=np.float32)
+	ts = ArrayTimeSeries(times=[2451545.1, 2451545.2, 2451545.3], values=[0.1, 0.2, 0.3])
+	unique_id = fsm.get_unique_id()
+	fsm.store(unique_id, ts)
+	stored_ts = fsm.get(unique_id)
+
+	# values are 32-bit floats, times keep full precision
+	assert stored_ts.values().dtype == np.float32
+	assert np.allclose(stored_ts.values(), [0.1, 0.2, 0.3])
+	assert list(stored_ts.times()) == [2451545.1, 2451545.2, 2451545.3]
+
+	# a default manager reads the file as well
+	assert FileStorageManager().get(unique_id).values().dtype == np.float32
+
+	with raises(ValueError):
+		FileStorageManager(dtype=np.int32)
+
+	os.remove(unique_id + '.npy')
+	remove_test_files()
+
 def remove_test_files():
 	test_files = ['1.npy','2.npy', 'ts_1.npy', 'ts_2.npy', 'ts_3.npy', 'ts_4.npy', 'id_length_map.json']
 	for i in test_files:
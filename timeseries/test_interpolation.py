@@ -0,0 +1,32 @@
+from pytest import raises
+from interpolation import ragged_offsets, interpolate_ragged
+from arraytimeseries import ArrayTimeSeries
+import numpy as np
+
+def test_interpolate_ragged():
+    rng = np.random.RandomState(0)
+    grid = np.arange(0.0, 1.0, 0.05)
+    curves = [(np.array([0.5]), np.array([3.0])),       # single point
+              (grid[2:9].copy(), rng.randn(7)),         # exactly on the grid
+              (np.array([-0.2, 1.3]), np.array([0.0, 1.5]))]  # grid inside one segment
+    for i in range(50):
+        t = np.unique(np.round(rng.rand(rng.randint(1, 30)) * 1.4 - 0.2, 2))
+        curves.append((t, rng.randn(len(t))))
+    offsets = ragged_offsets([len(t) for t, v in curves])
+    resampled = interpolate_ragged(np.concatenate([t for t, v in curves]),
+                                   np.concatenate([v for t, v in curves]), offsets, grid)
+
+    # the same values as interpolating each curve on its own, edges included
+    assert resampled.shape == (len(curves), len(grid))
+    for row, (t, v) in zip(resampled, curves):
+        assert np.array_equal(row, ArrayTimeSeries(times=t, values=v).interpolate(grid).values())
+    assert np.all(resampled[0] == 3.0)
+
+def test_interpolate_ragged_errors():
+    times, values = np.array([0.1, 0.2, 0.3]), np.array([1.0, 2.0, 3.0])
+    with raises(ValueError):
+        interpolate_ragged(times, values, [0, 2], [0.5])
+    with raises(ValueError):
+        interpolate_ragged(times, values[:2], [0, 3], [0.5])
+    with raises(ValueError):
+        interpolate_ragged(times, values, [0, 3, 3], [0.5])
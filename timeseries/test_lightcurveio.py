@@ -0,0 +1,54 @@
+from pytest import raises
+from lightcurveio import iter_folded, load_folded, benchmark
+import numpy as np
+import os
+
+def write_lc(path, rows):
+    with open(path, 'w') as f:
+        f.write(''.join('\t'.join(str(x) for x in row) + '\n' for row in rows))
+
+def test_load_folded(tmpdir):
+    path = str(tmpdir.join('lc.dat_folded'))
+    rows = np.random.RandomState(0).rand(100, 4)
+    rows[10, 0] = rows[20, 0]
+    write_lc(path, rows)
+
+    # same times and values as the generic loader, in chunks or not
+    data = np.loadtxt(path)
+    times, indices = np.unique(data[:, 0], return_index=True)
+    for chunk_rows in [7, 1000]:
+        t, v = load_folded(path, chunk_rows=chunk_rows)
+        assert np.array_equal(t, times)
+        assert np.array_equal(v, data[indices, 1])
+    assert len(t) == 99
+
+    # more than one value column, single precision values
+    t, v = load_folded(path, columns=(0, 1, 2), dtype=np.float32)
+    assert v.shape == (99, 2) and v.dtype == np.float32 and t.dtype == np.float64
+
+    # the stream keeps file order and only the asked columns
+    chunks = list(iter_folded(path, columns=(3,), chunk_rows=30))
+    assert [len(c) for c in chunks] == [30, 30, 30, 10]
+    assert np.array_equal(np.concatenate(chunks)[:, 0], rows[:, 3])
+
+    assert set(benchmark([path], repeat=1)) == {'loadtxt', 'load_folded'}
+
+def test_load_folded_sample_files():
+    # the bundled (tab separated) folded light curves
+    for path in ['../SimSearch/169975.dat_folded.txt', '../tsbtreedb_for_team4/sample_data/51886.dat_folded']:
+        t, v = load_folded(path)
+        assert np.all(np.diff(t) > 0)
+        assert len(t) == len(v) > 0
+
+def test_load_folded_errors(tmpdir):
+    path = str(tmpdir.join('lc.dat_folded'))
+    with open(path, 'w') as f:
+        f.write('# comments and blank lines only\n\n')
+    with raises(ValueError):
+        load_folded(path)
+    with open(path, 'w') as f:
+        f.write('0.1\t15.1\n0.2\tnot a number\n')
+    with raises(ValueError):
+        load_folded(path)
+    with raises(IOError):
+        load_folded(str(tmpdir.join('missing.dat_folded')))
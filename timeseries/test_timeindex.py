@@ -0,0 +1,61 @@
+from pytest import raises
+from timeindex import TimeIndex, RegularTimeIndex, has_repeats
+from arraytimeseries import ArrayTimeSeries
+from timeseries import TimeSeries
+import numpy as np
+
+def test_time_index():
+    index = TimeIndex(np.array([0.5, 1.0, 2.0]))
+    assert not index.times.flags.writeable
+    assert index == TimeIndex([0.5, 1.0, 2.0]) and hash(index) == hash(TimeIndex([0.5, 1.0, 2.0]))
+    assert index != TimeIndex([0.5, 1.0, 3.0]) and index != TimeIndex([0.5, 1.0])
+
+    # regular grids are stored as start, step and length, and interned
+    grid = RegularTimeIndex.unit_grid(100)
+    assert grid is TimeIndex.from_times(np.arange(0.0, 1.0, 0.01)) and len(grid) == 100
+    assert grid == TimeIndex(np.arange(0.0, 1.0, 0.01)) and hash(grid) == hash(TimeIndex(grid.times))
+    assert grid.times is grid.times
+    assert type(TimeIndex.from_times([0, 1, 3])) is TimeIndex
+    assert TimeIndex.from_times([0, 1, 2]) == TimeIndex([0.0, 1.0, 2.0])
+    assert not has_repeats(np.array([2, 0, 1])) and has_repeats(np.array([0.0, 1.0, 0.0]))
+
+def test_index_copies_times():
+    # the caller's array stays writable and changing it does not change the index
+    times = np.array([0.5, 1.0, 2.0])
+    index = TimeIndex(times)
+    hashed = hash(index)
+    times[0] = 0.0
+    assert times.flags.writeable and index.times.tolist() == [0.5, 1.0, 2.0] and hash(index) == hashed
+    # frozen times (of another index, or slices of them) are shared
+    assert TimeIndex(index.times).times is index.times
+    assert np.shares_memory(TimeIndex(index.times[1:]).times, index.times)
+    view = times.view()
+    view.setflags(write=False)
+    assert not np.shares_memory(TimeIndex(view).times, times)
+
+def test_regular_indexes_not_kept_alive():
+    import gc
+    import timeindex
+    grid = TimeIndex.from_times(np.arange(0.0, 1.0, 1.0 / 12345))
+    assert TimeIndex.from_times(np.arange(0.0, 1.0, 1.0 / 12345)) is grid
+    count = len(timeindex._regular_indexes)
+    del grid
+    gc.collect()
+    assert len(timeindex._regular_indexes) == count - 1
+
+def test_shared_alignment():
+    values = np.random.RandomState(0).randn(100)
+    grid = RegularTimeIndex.unit_grid(100)
+    a = ArrayTimeSeries(times=grid, values=values)
+    b = ArrayTimeSeries(times=np.arange(0.0, 1.0, 0.01), values=values)
+    assert a.time_index is grid and b.time_index is not grid
+    assert (a * 2 - a).time_index is grid and a.interpolate(grid).time_index is grid
+
+    # equal but distinct indexes still align, different ones do not
+    assert a + b == a * 2
+    with raises(ValueError):
+        a + ArrayTimeSeries(times=np.arange(1.0, 101.0), values=values)
+
+    # list based series share their packed times too
+    t = TimeSeries(values=[1, 2, 3], times=[1, 2, 3])
+    assert (t + t)._times is t._times
@@ -1,4 +1,7 @@
 import operator
+import statistics
+from fractions import Fraction
+from decimal import Decimal
 from pytest import raises
 import numpy as np
 from lazy import lazy
@@ -7,6 +10,8 @@ from timeseries import TimeSeries
 from arraytimeseries import ArrayTimeSeries
 from simulatedtimeseries import SimulatedTimeSeries
 from smtimeseries import SMTimeSeries
+from filestoragemanager import FileStorageManagerSingleton
+from standardizedtimeseries import StandardizedTimeSeries
 import os, glob
 
 def test_sized_container_timeseries():
@@ -63,6 +68,236 @@ def test_time_series():
 	verify_lazy_property_time_series(TimeSeries)
 	verify_lazyfied_time_series_check_length(TimeSeries)
 
+def test_packed_time_series():
+	"""TimeSeries stores numbers packed in arrays, without an instance __dict__"""
+	ts = TimeSeries(values=(x / 2 for x in range(100)), times=range(100))
+	assert ts._values.typecode == 'd' and ts._times.typecode == 'q'
+	assert not hasattr(ts, '__dict__')
+	assert ts.mean() == 24.75 and np.isclose(ts.std(), np.std(np.arange(100) / 2, ddof=1))
+
+	# items that do not fit widen the storage
+	ints = TimeSeries(values=[1, 2, 3], times=[1, 2, 3])
+	ints[0] = 0.5
+	assert ints.values_lst() == [0.5, 2, 3]
+	ints[1] = 'a'
+	assert ints.values_lst() == [0.5, 'a', 3]
+
+	# only exact ints and floats are packed, so items read back unchanged
+	assert TimeSeries([1, 2.5])[0] == 1 and type(TimeSeries([1, 2.5])[0]) is int
+	big = TimeSeries([2**70, 1])
+	assert big[0] == 2**70 and isinstance(big._values, list)
+	fractions = TimeSeries([Fraction(1, 3), Fraction(2, 3)])
+	assert type(fractions[0]) is Fraction and fractions.mean() == Fraction(1, 2)
+	decimals = TimeSeries([Decimal('0.1'), Decimal('0.2')])
+	assert decimals[1] == Decimal('0.2') and decimals.mean() == Decimal('0.15')
+	floats = TimeSeries([1.0, 2.0])
+	floats[0] = 3
+	assert type(floats[0]) is int and floats.values_lst() == [3, 2.0]
+
+	# the mean of ints is an int when it is a whole number, as with statistics.mean
+	for values in [[1, 2, 3], [1, 2], [10**15, 10**15 + 1, 10**15 + 5]]:
+		mean = TimeSeries(values).mean()
+		assert mean == statistics.mean(values) and type(mean) is type(statistics.mean(values))
+		assert type(TimeSeries(values).std()) is float
+
+	# unsorted times are still checked for repeats
+	TimeSeries(values=[1, 2, 3], times=[3, 1, 2])
+	with raises(ValueError):
+		TimeSeries(values=[1, 2, 3], times=[3, 1, 3])
+
+def test_from_validated():
+	times, values = np.arange(5.0), np.arange(5.0) * 2
+	ts = ArrayTimeSeries._from_validated(times, values)
+	assert not np.shares_memory(ts._times, times) and ts._values is values
+	assert ArrayTimeSeries._from_validated(times, values, copy=True)._values is not values
+
+	# derived series share the time index and are the same as checked ones
+	for derived in [ts + 1, ts * ts, -ts, +ts, StandardizedTimeSeries.from_series(ts)]:
+		assert derived.time_index is ts.time_index
+	assert ts + ts == ArrayTimeSeries(times=times, values=values * 2)
+	assert (+ts)._values is not values
+	t = TimeSeries(values=[1, 2, 3], times=[1, 2, 3])
+	assert (t * t)._times is t._times and (t * t).values_lst() == [1, 4, 9]
+
+	# standardized values wrapped as they are stay writeable for the caller
+	s = StandardizedTimeSeries._from_validated(times, values, standardized=True)
+	assert values.flags.writeable and not s._values.flags.writeable
+
+	# the vectorized repeat check
+	assert not ArrayTimeSeries._has_repeats(np.array([3.0, 1.0, 2.0]))
+	assert ArrayTimeSeries._has_repeats(np.array([1, 2, 2]))
+	assert ArrayTimeSeries._has_repeats(np.array(['a', 'b', 'a']))
+	with raises(ValueError):
+		ts.interpolate([1, 2, 2])
+
+def test_align():
+	lhs_times, rhs_times = [0, 1, 2, 3, 5], [3, 1, 4, 5.5]
+	for class_name in [TimeSeries, ArrayTimeSeries, SMTimeSeries]:
+		lhs = class_name(times=lhs_times, values=[0, 10, 20, 30, 50])
+		rhs = ArrayTimeSeries(times=rhs_times, values=[3, 1, 4, 5])
+		for how, times in [('inner', [1, 3]), ('outer', [0, 1, 2, 3, 4, 5, 5.5]), ('left', lhs_times)]:
+			a, b = lhs.align(rhs, how=how)
+			assert type(a) is class_name and type(b) is ArrayTimeSeries
+			assert a.times().tolist() == times and b.times().tolist() == times
+			assert np.allclose(a.values(), np.interp(times, lhs_times, [0, 10, 20, 30, 50]))
+			assert np.allclose(b.values(), np.interp(times, [1, 3, 4, 5.5], [1, 3, 4, 5]))
+
+		a, b = lhs.align(rhs, how='outer', fill='nan')
+		assert np.array_equal(np.isnan(a.values()), [False, False, False, False, True, False, True])
+		assert b.values_lst()[1] == 1 and np.isnan(b.values_lst()[0])
+	remove_test_files()
+
+	# the results share their times, so they combine directly
+	x = ArrayTimeSeries(times=[0, 1, 2], values=[1, 2, 3])
+	y = ArrayTimeSeries(times=[0.5, 2], values=[1, 1])
+	a, b = x.align(y, how='outer')
+	assert a.time_index is b.time_index and (a - b).values().tolist() == [0, 0.5, 1, 2]
+	t, u = TimeSeries(values=[1, 2], times=[0, 1]).align(TimeSeries(values=[1, 2], times=[0, 2]), how='outer')
+	assert t._times is u._times and (t + u).values_lst() == [2, 3.5, 4]
+	with raises(ValueError):
+		x.align(y, how='right')
+	with raises(ValueError):
+		x.align(y, fill='zero')
+
+	# standardized values are aligned as they are, gaps filled with nan
+	a, b = StandardizedTimeSeries(times=[0, 1, 2], values=[1, 2, 3]).align(y, how='outer', fill='nan')
+	assert type(a) is ArrayTimeSeries and np.allclose(a.values(), [-1, np.nan, 0, 1], equal_nan=True)
+
+def test_rolling():
+	rng = np.random.RandomState(0)
+	times = np.cumsum(rng.rand(300) + 0.01)
+	values = rng.randn(300) * 3 + 1000
+	reductions = [('sum', np.sum), ('mean', np.mean), ('min', np.min), ('max', np.max),
+		('std', lambda x: np.std(x, ddof=1) if len(x) > 1 else np.nan)]
+	for class_name in [TimeSeries, ArrayTimeSeries, SMTimeSeries]:
+		ts = class_name(times=list(times), values=list(values))
+		for window, by in [(1, 'count'), (7, 'count'), (500, 'count'), (2.5, 'time'), (1e-3, 'time')]:
+			rolling = ts.rolling(window, by)
+			for name, reduce in reductions:
+				result = getattr(rolling, name)()
+				assert type(result) is class_name and np.array_equal(result.times(), times)
+				# the same as reducing each window on its own
+				expected = []
+				for i, t in enumerate(times):
+					if by == 'count':
+						expected.append(reduce(values[i + 1 - window:i + 1]) if i + 1 >= window else np.nan)
+					else:
+						expected.append(reduce(values[(times > t - window) & (times <= t)]))
+				assert np.allclose(result.values(), expected, equal_nan=True)
+	remove_test_files()
+
+	ts = ArrayTimeSeries(times=[0, 1, 2], values=[1, 2, 3])
+	assert ts.rolling(2).mean().time_index is ts.time_index
+	for window, by in [(0, 'count'), (1.5, 'count'), (-1.0, 'time'), (1, 'points')]:
+		with raises(ValueError):
+			ts.rolling(window, by)
+	with raises(ValueError):
+		ArrayTimeSeries(times=[2, 1, 3], values=[1, 2, 3]).rolling(2)
+
+	# windows of standardized values are taken as they are, not standardized again
+	ts = StandardizedTimeSeries(times=[0, 1, 2, 3], values=[1, 2, 3, 4])
+	for name in ['sum', 'mean', 'min', 'max', 'std']:
+		result = getattr(ts.rolling(2), name)()
+		assert type(result) is ArrayTimeSeries and result.time_index is ts.time_index
+		assert np.allclose(result.values(), getattr(ts._unstandardized().rolling(2), name)().values(), equal_nan=True)
+	assert np.allclose(ts.rolling(2).max().values()[1:], ts.values()[1:])
+
+def test_between():
+	times, values = [1, 2, 3, 5, 8], [10, 20, 30, 50, 80]
+	for class_name in [TimeSeries, ArrayTimeSeries, SMTimeSeries]:
+		ts = class_name(times=times, values=values)
+		for t0, t1 in [(2, 5), (2.5, 8), (-1, 100), (4, 4), (9, 10), (5, 2)]:
+			part = ts.between(t0, t1)
+			inside = [i for i, t in enumerate(times) if t0 <= t <= t1]
+			assert type(part) is class_name
+			assert list(part.times()) == [times[i] for i in inside]
+			assert list(part.values()) == [values[i] for i in inside]
+		assert list(ts.loc[:3].values()) == [10, 20, 30] and list(ts.loc[5:].times()) == [5, 8]
+		assert ts.at(5) == 50 and ts.loc[8] == 80
+		with raises(KeyError):
+			ts.at(4)
+		with raises(ValueError):
+			ts.loc[1:5:2]
+	remove_test_files()
+
+	# parts of an ArrayTimeSeries are views
+	ts = ArrayTimeSeries(times=times, values=values)
+	part = ts.loc[2:5]
+	assert np.shares_memory(part._values, ts._values) and np.shares_memory(part._times, ts._times)
+	part[0] = 25
+	assert ts[1] == 25
+
+	# and so are parts of a StandardizedTimeSeries, which are not standardized again
+	ts = StandardizedTimeSeries(times=times, values=values)
+	part = ts.between(2, 5)
+	assert type(part) is ArrayTimeSeries and np.array_equal(part._values, ts._values[1:4])
+	assert np.shares_memory(part._values, ts._values) and np.shares_memory(part._times, ts._times)
+
+def test_resample():
+	rng = np.random.RandomState(0)
+	times = np.cumsum(rng.rand(500) + 0.01)
+	values = rng.randn(500)
+	reductions = [('mean', np.mean), ('min', np.min), ('max', np.max), ('last', lambda x: x[-1]), ('count', len)]
+	for class_name in [TimeSeries, ArrayTimeSeries, SMTimeSeries]:
+		ts = class_name(times=list(times), values=list(values))
+		for period in [0.3, 2, 1000]:
+			buckets = np.floor(times / period)
+			for agg, reduce in reductions:
+				resampled = ts.resample(period, agg)
+				assert type(resampled) is class_name
+				assert np.allclose(resampled.times(), np.unique(buckets) * period)
+				assert np.allclose(resampled.values(), [reduce(values[buckets == b]) for b in np.unique(buckets)])
+		with raises(ValueError):
+			ts.resample(0)
+		with raises(ValueError):
+			ts.resample(1, 'median')
+
+	# reading the stored series in chunks splits buckets between chunks
+	ts = SMTimeSeries(times=times, values=values)
+	for agg, reduce in reductions:
+		chunked, whole = ts.resample(2, agg, chunk_points=7), ts.resample(2, agg)
+		assert np.array_equal(chunked.times(), whole.times()) and np.allclose(chunked.values(), whole.values())
+	assert len(SMTimeSeries(times=[], values=[]).resample(1)) == 0
+	remove_test_files()
+
+	with raises(ValueError):
+		ArrayTimeSeries(times=[2, 1, 3], values=[1, 2, 3]).resample(2)
+
+	# buckets of standardized values are taken as they are, not standardized again
+	ts = StandardizedTimeSeries(times=[0, 1, 2, 3, 7], values=[1, 3, 2, 6, 4])
+	resampled = ts.resample(5, 'count')
+	assert type(resampled) is ArrayTimeSeries and resampled.values().tolist() == [4, 1]
+	assert np.allclose(ts.resample(2).values(), ts._unstandardized().resample(2).values())
+
+def test_cached_stats():
+	for class_name in [TimeSeries, ArrayTimeSeries, SMTimeSeries]:
+		ts = class_name(times=[1, 2, 3, 4], values=[3, 1, 4, 1])
+		stats = [ts.mean(), ts.std(), abs(ts), ts.min(), ts.max()]
+		assert np.allclose(stats, [2.25, np.std([3, 1, 4, 1], ddof=1), 27, 1, 4])
+		assert [ts.mean(), ts.std(), abs(ts), ts.min(), ts.max()] == stats
+
+		# setting an item drops them
+		ts[2] = 8
+		assert np.allclose([ts.mean(), ts.std(), abs(ts), ts.min(), ts.max()],
+			[3.25, np.std([3, 1, 8, 1], ddof=1), 75, 1, 8])
+
+	# stored with an SMTimeSeries, for every instance of its id
+	ts = SMTimeSeries(times=[1, 2, 3], values=[1, 2, 6])
+	assert ts.mean() == 3
+	assert FileStorageManagerSingleton.get_stats(ts._id) == {'mean': 3.0}
+	FileStorageManagerSingleton.store_stats(ts._id, {'mean': 5.0})
+	assert ts.mean() == 5
+	ts[0] = 4
+	assert ts.mean() == 4 and FileStorageManagerSingleton.get_stats(ts._id) == {'mean': 4.0}
+	remove_test_files()
+
+	# a view from between shares its values, and the count of writes to them
+	ts = ArrayTimeSeries(times=[1, 2, 3, 4], values=[3., 1., 4., 1.])
+	part = ts.between(2, 3)
+	assert ts.max() == 4 and part.max() == 4
+	part[1] = 9
+	assert ts.max() == 9 and part.max() == 9
+
 def test_sm_time_series():
 	"""Calls tests on smtimeseries class exclusively"""
 	test_smtimeseries()
@@ -231,6 +466,46 @@ def operator_list_nparray_not_allowed(class_name):
 			rhs = list([1,2,3])
 			op(ts, rhs)
 
+def test_standardized_time_series():
+	ts = ArrayTimeSeries(times=[1, 2, 3, 4], values=[3, 1, 4, 1])
+	s = StandardizedTimeSeries.from_series(ts)
+	assert np.allclose(s.values(), (ts.values() - ts.mean()) / ts.std())
+	assert s.mean() == 0 and s.std() == 1
+	assert StandardizedTimeSeries.from_series(s) is s
+
+	# the spectrum is computed once and reused
+	assert np.allclose(s.spectrum(), np.fft.rfft(s.values()))
+	assert s.spectrum() is s.spectrum()
+
+	# read-only, and arithmetic gives plain (no longer standardized) series
+	with raises(TypeError):
+		s[0] = 1
+	with raises(ValueError):
+		s.values_view()[0] = 1
+	# values() copies, like for the other series, values_view() does not
+	copied = s.values()
+	copied[0] = 1
+	assert s[0] != 1 and not np.shares_memory(copied, s._values)
+	assert np.shares_memory(s.values_view(), s._values)
+	assert type(s + 1) is ArrayTimeSeries
+	assert np.isclose((s * 2).std(), 2)
+	assert isinstance(-s, StandardizedTimeSeries)
+	assert np.allclose((-s).values(), -s.values())
+
+def test_vectorized_interpolate():
+	rng = np.random.RandomState(0)
+	times = np.unique(rng.rand(200))
+	values = rng.randn(len(times))
+	new_times = np.concatenate([[-1.0, 2.0], times[::7], rng.rand(100)])
+
+	# same values as the generic implementation, edges and existing times included
+	generic = TimeSeries(times=list(times), values=list(values)).interpolate(list(new_times))
+	for class_name in [ArrayTimeSeries, SMTimeSeries]:
+		interpolated = class_name(times=times, values=values).interpolate(new_times)
+		assert np.array_equal(interpolated.times(), new_times)
+		assert np.array_equal(interpolated.values(), generic.values())
+	remove_test_files()
+
 def test_smtimeseries():
 	ts = SMTimeSeries(range(5),range(5),1)
 	assert len(ts) == 5
@@ -0,0 +1,215 @@
+import weakref
+import numpy as np
+
+
+def _is_frozen(times):
+    """
+    Checks if a np.array can never change: it and every array it is a view
+    of are read-only, down to the one owning the memory.
+    """
+    while isinstance(times, np.ndarray):
+        if times.flags.writeable:
+            return False
+        if times.base is None:
+            return True
+        times = times.base
+    return False
+
+
+def has_repeats(times):
+    """
+    Checks if a np.array of times holds a time more than once. Ascending
+    numeric times (the usual case) are recognized with one vectorized
+    comparison of neighbours (the sign of np.diff); other times are sorted
+    with np.unique. Non-numeric times fall back to a hashed check.
+
+    Parameters:
+    -----------
+    times : np.array
+
+    Returns:
+    --------
+    bool
+
+    Examples:
+    ---------
+    >>> has_repeats(np.array([3.0, 1.0, 2.0])), has_repeats(np.array([1, 2, 2]))
+    (False, True)
+    """
+    if len(times) < 2:
+        return False
+    if times.dtype.kind in 'iuf':
+        if np.all(times[1:] > times[:-1]):
+            return False
+        return len(np.unique(times)) != len(times)
+    return len(set(times.tolist())) != len(times)
+
+
+class TimeIndex():
+    """
+    Immutable times of a time series, shared (not copied) by all series
+    derived from one another: arithmetic, standardizing and interpolating
+    onto an index all reuse the index object. Two series are aligned when
+    their indexes are the same object, which is checked in O(1); equal but
+    distinct indexes are compared by length and cached hash first, and
+    element-wise only if those agree.
+
+    The index keeps its own read-only copy of the times, so neither the
+    caller's array nor the cached hash can change under it. Only arrays that
+    are already frozen (such as another index's times, or slices of them)
+    are taken without copying.
+
+    Attributes:
+    -----------
+    times : np.array
+        the (read-only) times
+
+    Examples:
+    ---------
+    >>> index = TimeIndex([1, 2, 3])
+    >>> len(index), index[1], list(index)
+    (3, 2, [1, 2, 3])
+    >>> index == TimeIndex(np.array([1, 2, 3]))
+    True
+    """
+    def __init__(self, times):
+        if isinstance(times, np.ndarray) and _is_frozen(times):
+            self._times = times
+        else:
+            self._times = np.array(times)
+            self._times.setflags(write=False)
+        self._hash = None
+
+    @classmethod
+    def from_times(cls, times):
+        """
+        Index of the given times: a RegularTimeIndex if they are evenly spaced
+        (exactly as np.arange would produce them), else a TimeIndex. Regular
+        indexes are interned while in use, so every series on the same grid
+        shares one index object (and one array of times).
+
+        Examples:
+        ---------
+        >>> TimeIndex.from_times(np.arange(0.0, 1.0, 0.01))
+        RegularTimeIndex(start=0.0, step=0.01, length=100)
+        >>> TimeIndex.from_times(np.arange(10.)) is TimeIndex.from_times(np.arange(10.))
+        True
+        >>> type(TimeIndex.from_times([0.0, 0.1, 0.5])).__name__
+        'TimeIndex'
+        """
+        if isinstance(times, TimeIndex):
+            return times
+        times = np.asarray(times)
+        if len(times) > 1 and times.dtype.kind in 'iuf':
+            key = (times.dtype.str, times[0], times[1] - times[0], len(times))
+            index = _regular_indexes.get(key)
+            if index is None:
+                index = RegularTimeIndex(times[0], times[1] - times[0], len(times))
+            if index._step != 0 and np.array_equal(index.times, times):
+                return _regular_indexes.setdefault(key, index)
+        return cls(times)
+
+    @property
+    def times(self):
+        return self._times
+
+    def __array__(self, dtype=None):
+        return self.times if dtype is None else self.times.astype(dtype)
+
+    def __len__(self):
+        return len(self._times)
+
+    def __iter__(self):
+        return iter(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index]
+
+    def __hash__(self):
+        if self._hash is None:
+            if self.times.dtype.kind in 'iuf':
+                # equal times of any numeric dtype (and 0.0, -0.0) hash the same
+                self._hash = hash((len(self), (self.times.astype(np.float64) + 0.0).tobytes()))
+            else:
+                self._hash = hash(tuple(self.times.tolist()))
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, TimeIndex):
+            return NotImplemented
+        if len(self) != len(other) or hash(self) != hash(other):
+            return False
+        return np.array_equal(self.times, other.times)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return '{}(Length: {})'.format(self.__class__.__name__, len(self))
+
+
+class RegularTimeIndex(TimeIndex):
+    """
+    Evenly spaced times start + i * step for i < length, stored as just these
+    three numbers. The array of times is built on first use and then cached,
+    so all series on the same grid share one array. Two regular indexes are
+    compared in O(1).
+
+    Examples:
+    ---------
+    >>> index = RegularTimeIndex(0.0, 0.25, 4)
+    >>> index.times.tolist()
+    [0.0, 0.25, 0.5, 0.75]
+    >>> index == RegularTimeIndex(0.0, 0.25, 4) == TimeIndex([0.0, 0.25, 0.5, 0.75])
+    True
+    """
+    def __init__(self, start, step, length):
+        self._start = start
+        self._step = step
+        self._length = int(length)
+        self._times = None
+        self._hash = None
+
+    @classmethod
+    def unit_grid(cls, length):
+        """
+        The shared index of the grid np.arange(0.0, 1.0, 1.0 / length) that
+        light curves are interpolated onto (see from_times).
+
+        Examples:
+        ---------
+        >>> RegularTimeIndex.unit_grid(100) is RegularTimeIndex.unit_grid(100)
+        True
+        """
+        return cls.from_times(np.arange(0.0, 1.0, (1.0 / length)))
+
+    @property
+    def times(self):
+        if self._times is None:
+            times = self._start + np.arange(self._length) * self._step
+            times.flags.writeable = False
+            self._times = times
+        return self._times
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, RegularTimeIndex):
+            return (self._start, self._step, self._length) == (other._start, other._step, other._length)
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return super().__hash__()
+
+    def __repr__(self):
+        return '{}(start={!r}, step={!r}, length={})'.format(self.__class__.__name__,
+                                                             float(self._start), float(self._step), self._length)
+
+
+# interned regular indexes, by dtype, start, step and length (see TimeIndex.from_times);
+# an index (and its array of times) is dropped once no series or catalog uses it
+_regular_indexes = weakref.WeakValueDictionary()
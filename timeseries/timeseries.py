@@ -1,11 +1,49 @@
 import numbers
 import statistics
+from array import array
 import numpy as np
 from lazy import LazyOperation
 from lazy import lazy
 from sizedcontainertimeseriesinterface import SizedContainerTimeSeriesInterface
+from timeindex import TimeIndex
 
 
+def _pack(seq):
+    """
+    Packs the elements of a sequence into a compact stdlib array: signed
+    64-bit integers ('q') if they all are ints that fit, doubles ('d') if
+    they all are floats. One element takes 8 bytes instead of a pointer plus
+    a boxed Python object (about 32 bytes), and reads back as the same value
+    and type. Other sequences (mixed ints and floats, out of range ints,
+    bools, Fractions, Decimals, non-numbers) are kept as a list.
+
+    Examples:
+    ---------
+    >>> _pack(range(3))
+    array('q', [0, 1, 2])
+    >>> _pack([0.0, 0.5])
+    array('d', [0.0, 0.5])
+    >>> _pack([0, 0.5]), _pack([2**70]), _pack('ab')
+    ([0, 0.5], [1180591620717411303424], ['a', 'b'])
+    """
+    if isinstance(seq, np.ndarray):
+        items = seq.tolist()
+    else:
+        items = seq if isinstance(seq, list) else list(seq)
+    types = set(map(type, items))
+    if types <= {int}:
+        try:
+            return array('q', items)
+        except OverflowError:
+            return items
+    if types == {float}:
+        return array('d', items)
+    return items
+
+
+# the element type that each packed typecode reads back as
+_PACKED_TYPES = {'q': int, 'd': float}
+
 
 class TimeSeries(SizedContainerTimeSeriesInterface):
     """
@@ -25,9 +63,14 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
     -----
     PRE: `values` is sorted in non-decreasing order
 
+    Times and values are stored packed in stdlib arrays (see _pack), and
+    instances have no __dict__, so a series takes about a quarter of the
+    memory of two lists of Python numbers.
+
     WARNINGS:
     - Does not maintain an accurate time series if `input data` is unsorted.
     """
+    __slots__ = ('_values', '_times', '_stats')
 
     def __init__(self, values, times=None):
         """
@@ -58,21 +101,56 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
         # J: all Python sequences implement __iter__(), which we can use here.
 
         self.__class__.is_sequence(values)
-        self._values = list(values)
+        self._values = _pack(values)
+        self._stats = None
 
-        if times:
+        if times is not None:
             self.__class__.is_sequence(times)
-            self._times = list(times)
+            self._times = _pack(times)
 
-        else:
-            self._times = list(range(len(self._values)))
+        if times is None or not len(self._times):
+            self._times = _pack(range(len(self._values)))
 
         if len(self._times) != len(self._values):
             raise ValueError("Time and input data of incompatible dimensions")
 
-        if len(self._times) != len(set(self._times)):
+        if isinstance(self._times, array):
+            repeats = self._has_repeats(np.frombuffer(self._times, dtype=self._times.typecode))
+        else:
+            repeats = len(self._times) != len(set(self._times))
+        if repeats:
             raise ValueError("Time data should contain no repeats")
 
+    @classmethod
+    def _from_validated(cls, times, values, copy=False):
+        """
+        Trusted constructor for times and values that are already known to be
+        a valid time series (e.g. results of arithmetic): skips the sequence,
+        length and repeat checks of __init__. The packed times are shared, not
+        copied; times are never modified in place.
+
+        Parameters
+        ----------
+        times : packed times of a TimeSeries, or a TimeIndex (packed here)
+        values : packed values (see _pack), or any iterable to be packed
+        copy : bool
+            Copy already packed values instead of wrapping them
+
+        Examples:
+        ---------
+        >>> ts = TimeSeries(times=[1, 2, 3], values=[100, 200, 300])
+        >>> (ts + 1)._times is ts._times
+        True
+        """
+        ts = cls.__new__(cls)
+        ts._stats = None
+        ts._times = _pack(times.times) if isinstance(times, TimeIndex) else times
+        if isinstance(values, (array, list)) and not copy:
+            ts._values = values
+        else:
+            ts._values = _pack(values)
+        return ts
+
     def __len__(self):
         """
         Method used to determine the length of the TimeSeries
@@ -85,6 +163,23 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
         return len(self._values)
 
 
+    def __setitem__(self, index, item):
+        """
+        Sets the value at index `index` to `item`, widening the packed storage
+        to a list if the item is not of its type (see _pack).
+        """
+        try:
+            if isinstance(self._values, array) and type(item) is not _PACKED_TYPES[self._values.typecode]:
+                raise TypeError("%r does not fit the packed values" % (item,))
+            self._values[index] = item
+        except IndexError:
+            raise IndexError("Index out of bounds!")
+        except (TypeError, OverflowError):
+            values = list(self._values)
+            values[index] = item
+            self._values = _pack(values)
+        self._clear_stats()
+
     def __neg__(self):
         """
             Used to return a time series instance with each value being negative of the original. The times are left untouched.
@@ -93,7 +188,7 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
             -------
                 self : an instance of self with negated values but no change to the times
         """
-        return self.__class__((-x for x in self._values), self._times)
+        return self._from_validated(self._times, (-x for x in self._values))
 
     def __pos__(self):
         """
@@ -103,7 +198,7 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
             -------
                 self : an instance of self with each value's sign preserved
         """
-        return self.__class__((x for x in self._values), self._times)
+        return self._from_validated(self._times, (x for x in self._values))
 
     def __add__(self, rhs):
         """
@@ -127,13 +222,13 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
                 raise "Cannot add a list to a TimeSeries!"
             if isinstance(rhs, numbers.Real):
                 # R: may be worth testing time domains are preserved correctly
-                return self.__class__(values=(a + rhs for a in self), times=self._times)
+                return self._from_validated(self._times, (a + rhs for a in self))
             else:
                 self._check_length_helper(self, rhs)
                 # R: test me. should fail when the time domains are non congruent
                 self._check_time_domains_helper(self, rhs)
                 pairs = zip(self._values, rhs)
-                return self.__class__(values=(a + b for a, b in pairs), times=self._times)
+                return self._from_validated(self._times, (a + b for a, b in pairs))
         except TypeError:
             raise NotImplemented # R: test me. should fail when we try to add a numpy array or list
 
@@ -158,12 +253,12 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot sub a list from a TimeSeries!"
             if isinstance(rhs, numbers.Real):
-                return self.__class__((a - rhs for a in self), self._times)
+                return self._from_validated(self._times, (a - rhs for a in self))
             else:
                 self._check_length_helper(self, rhs)
                 self._check_time_domains_helper(self, rhs)
                 pairs = zip(self._values, rhs)
-                return self.__class__((a - b for a, b in pairs), self._times)
+                return self._from_validated(self._times, (a - b for a, b in pairs))
         except TypeError:
             raise NotImplemented
 
@@ -189,12 +284,12 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
             if isinstance(rhs, list):
                 raise "Cannot mul a list with a TimeSeries!"
             if isinstance(rhs, numbers.Real):
-                return TimeSeries((a * rhs for a in self), self._times)
+                return TimeSeries._from_validated(self._times, (a * rhs for a in self))
             else:
                 self._check_length_helper(self, rhs)
                 self._check_time_domains_helper(self, rhs)
                 pairs = zip(self._values, rhs)
-                return TimeSeries((a * b for a, b in pairs), self._times)
+                return TimeSeries._from_validated(self._times, (a * b for a, b in pairs))
         except TypeError:
             raise NotImplemented
 
@@ -222,7 +317,10 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
                 raise "Cannot compare numpy array to TimeSeries!"
             self._check_length_helper(self, rhs)
             self._check_time_domains_helper(self, rhs)
-            return self._values==rhs._values
+            if type(self._values) is type(rhs._values):
+                return self._values==rhs._values
+            # packed and list storage (see _pack) compare element by element
+            return list(self._values)==list(rhs._values)
         except TypeError:
             raise NotImplemented
 
@@ -260,7 +358,16 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
         --------
         np.mean : the mean of the time series
         """
-        return statistics.mean(self._values)
+        def mean():
+            if isinstance(self._values, array) and len(self._values) > 1:
+                if self._values.typecode == 'q':
+                    # exactly as statistics.mean: an int if the mean is one, else the rounded quotient
+                    total = sum(self._values)
+                    quotient, remainder = divmod(total, len(self._values))
+                    return quotient if not remainder else total / len(self._values)
+                return float(np.mean(np.frombuffer(self._values, dtype=self._values.typecode)))
+            return statistics.mean(self._values)
+        return self._cached('mean', mean)
 
     def std(self, chunk = None):
         """
@@ -274,4 +381,8 @@ class TimeSeries(SizedContainerTimeSeriesInterface):
         --------
         np.std : the standard deviation of the time series
         """
-        return statistics.stdev(self._values)
+        def std():
+            if isinstance(self._values, array) and len(self._values) > 1:
+                return float(np.std(np.frombuffer(self._values, dtype=self._values.typecode), ddof=1))
+            return statistics.stdev(self._values)
+        return self._cached('std', std)
@@ -13,6 +13,9 @@ class TimeSeriesInterface(abc.ABC):
     ##############################################################################
     MAX_LENGTH = 10
 
+    # no instance attributes here, so subclasses can use __slots__
+    __slots__ = ()
+
     ##############################################################################
     ## ABSTRACT METHODS TO BE IMPLEMENTED BY ALL TIMESERIES OF FIXED LENGTH
     ##############################################################################
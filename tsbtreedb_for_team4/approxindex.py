@@ -0,0 +1,187 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import sys
+import time
+import numpy as np
+
+from catalog import load_catalog
+from crosscorr import spectra_matrix
+from settings import CATALOG_DIR, RECALL_K
+
+# Global variables
+
+IVF_FILE = "ivf.npz"
+
+HELP_MESSAGE = \
+"""
+Approximate Light Curve Index
+
+A python command line utility to build the approximate (IVF) index over the light curve catalog
+and report its recall@k against the exact search for each probe setting.
+
+Usage: ./approxindex [optional flags]
+
+Optional flags:
+  -h, --help    Show this help message and exit.
+"""
+
+def ivf_features(values):
+    """
+    Shift invariant feature vectors for a (N, L) matrix of standardized light curves:
+    the real-FFT amplitudes without the (zero) mean term. Curves whose kernel distance is small
+    have similar amplitude spectra, so nearby features make good candidates.
+    """
+    return np.abs(spectra_matrix(values))[:, 1:]
+
+def sq_dists(features, centroids):
+    """Squared euclidean distance between every feature row and every centroid"""
+    return (np.sum(features**2, axis=1)[:, np.newaxis] - 2 * features.dot(centroids.T) +
+            np.sum(centroids**2, axis=1)[np.newaxis, :])
+
+def kmeans(features, n_lists, n_iter=20, seed=0):
+    """
+    Plain Lloyd's k-means used as the coarse quantizer.
+
+    Args:
+        features: (N, D) np.array of feature vectors
+        n_lists: number of centroids
+        n_iter: maximum number of iterations
+        seed: seed of the random initial centroids, so rebuilds are reproducible
+    Returns:
+        Tuple: (n_lists, D) np.array of centroids, (N,) np.array with the centroid of each row
+    """
+    rng = np.random.RandomState(seed)
+    centroids = features[rng.choice(len(features), n_lists, replace=False)].copy()
+    for i in range(n_iter):
+        dists = sq_dists(features, centroids)
+        assignments = np.argmin(dists, axis=1)
+        for j in range(n_lists):
+            members = features[assignments == j]
+            if len(members):
+                centroids[j] = members.mean(axis=0)
+            else:
+                # Reseed empty lists with the point farthest from its centroid
+                centroids[j] = features[np.argmax(dists[np.arange(len(features)), assignments])]
+    assignments = np.argmin(sq_dists(features, centroids), axis=1)
+    return centroids, assignments
+
+class IVFIndex(object):
+    """
+    Inverted file index over the catalog: every light curve lives in the list of its nearest centroid.
+    A search only computes exact distances for the curves in the `probe` lists closest to the query,
+    trading recall for latency.
+    """
+
+    def __init__(self, centroids, assignments):
+        self.centroids = centroids
+        self.assignments = assignments
+        order = np.argsort(assignments, kind='mergesort')
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.lists = [order[bounds[j]:bounds[j+1]] for j in range(len(centroids))]
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def candidates(self, s_values, probe=1):
+        """Catalog rows in the `probe` inverted lists closest to the standardized query values"""
+        dists = sq_dists(ivf_features(s_values), self.centroids)[0]
+        nearest = np.argsort(dists)[:probe]
+        return np.concatenate([self.lists[j] for j in nearest])
+
+    def search(self, s_values, catalog, k=1, probe=1):
+        """
+        Approximate k nearest neighbours of the standardized query values.
+
+        Returns:
+            List of up to k (distance, light curve filename) tuples, closest first
+        """
+        rows = self.candidates(s_values, probe)
+        dists = catalog.distances(s_values, rows)
+        best = np.argsort(dists)[:k]
+        return [(dists[i], catalog.ids[rows[i]]) for i in best]
+
+def exact_search(s_values, catalog, k=1):
+    """Exact k nearest neighbours by scanning the whole catalog, in the same format as IVFIndex.search"""
+    dists = catalog.distances(s_values)
+    best = np.argsort(dists)[:k]
+    return [(dists[i], catalog.ids[i]) for i in best]
+
+def recall_at_k(approx, exact):
+    """Fraction of the exact k nearest neighbours that the approximate search also returned"""
+    exact_ids = set(fn for d, fn in exact)
+    return len(exact_ids.intersection(fn for d, fn in approx)) / len(exact_ids)
+
+def build_ivf(catalog, n_lists=None, catalog_dir=CATALOG_DIR):
+    """
+    Trains the coarse quantizer on the catalog (sqrt(N) lists by default) and saves the index to disk,
+    together with the fingerprint of the catalog it was built for (see Catalog.fingerprint)
+    """
+    if n_lists is None:
+        n_lists = max(1, int(np.sqrt(len(catalog))))
+    centroids, assignments = kmeans(ivf_features(catalog.values), n_lists)
+    np.savez(catalog_dir + IVF_FILE, centroids=centroids, assignments=assignments,
+             fingerprint=catalog.fingerprint())
+    return IVFIndex(centroids, assignments)
+
+def load_ivf(catalog_dir=CATALOG_DIR, catalog=None):
+    """
+    Loads a previously built IVF index, or returns None if there is none. With a catalog, an index built
+    for other catalog contents (or saved without a fingerprint) counts as none.
+    """
+    try:
+        data = np.load(catalog_dir + IVF_FILE)
+    except(IOError):
+        return None
+    if catalog is not None and ('fingerprint' not in data or str(data['fingerprint']) != catalog.fingerprint()):
+        return None
+    return IVFIndex(data['centroids'], data['assignments'])
+
+def recall_report(catalog, ivf, probes=None, n_queries=50, k=RECALL_K, seed=0):
+    """
+    Measures mean recall@k and latency of the approximate search for each probe setting
+    (powers of two up to the number of lists by default), using catalog light curves with added noise as queries.
+
+    Returns:
+        List of (probe, mean recall@k, approx seconds per query, exact seconds per query) tuples
+    """
+    rng = np.random.RandomState(seed)
+    rows = rng.choice(len(catalog), min(n_queries, len(catalog)), replace=False)
+    queries = catalog.values[rows] + 0.5 * rng.randn(len(rows), catalog.values.shape[1])
+    queries = (queries - queries.mean(axis=1, keepdims=True)) / queries.std(axis=1, ddof=1, keepdims=True)
+
+    start = time.time()
+    exact = [exact_search(q, catalog, k) for q in queries]
+    exact_time = (time.time() - start) / len(queries)
+
+    if probes is None:
+        probes = sorted(set([2**i for i in range(int(np.log2(len(ivf))) + 1)] + [len(ivf)]))
+
+    report = []
+    for probe in probes:
+        start = time.time()
+        approx = [ivf.search(q, catalog, k, probe) for q in queries]
+        approx_time = (time.time() - start) / len(queries)
+        recall = np.mean([recall_at_k(a, e) for a, e in zip(approx, exact)])
+        report.append((probe, recall, approx_time, exact_time))
+    return report
+
+if __name__ == "__main__":
+    """Enables this file to be run independently of simsearch as it's own CLU."""
+    need_help = False
+
+    for arg in sys.argv[1:]:
+        if arg.lower() in ['-h','--help', 'help']: need_help = True
+
+    if need_help:
+        print (HELP_MESSAGE)
+    else:
+        catalog = load_catalog()
+        ivf = build_ivf(catalog)
+        print("Built IVF index with %d lists over %d light curves" % (len(ivf), len(catalog)))
+        print("probe  recall@%d  approx ms/query  exact ms/query" % RECALL_K)
+        for probe, recall, approx_time, exact_time in recall_report(catalog, ivf):
+            print("%5d  %9.3f  %15.3f  %14.3f" % (probe, recall, 1000 * approx_time, 1000 * exact_time))
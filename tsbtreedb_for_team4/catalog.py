@@ -0,0 +1,335 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import os
+import shutil
+import hashlib
+import numpy as np
+
+from crosscorr import standardize_values, spectra_matrix, self_kernels, sketch_values, kernel_dist_block
+from crosscorr import downsample_values, max_corr_at_phase_block, kernel_dist_block_multi
+from crosscorr import precision_dtype
+from timeindex import TimeIndex
+from settings import LIGHT_CURVES_DIR, CATALOG_DIR, SKETCH_COEFFS, SCAN_BLOCK_SIZE, COARSE_LENGTHS, SHORTLIST_SIZE
+from settings import PRECISION
+
+# Files making up a catalog on disk
+IDS_FILE = "ids.txt"
+TIMES_FILE = "times.npy"
+VALUES_FILE = "values.npy"
+SPECTRA_FILE = "spectra.npy"
+KERNELS_FILE = "kernels.npy"
+SKETCHES_FILE = "sketches.npy"
+STATS_FILE = "stats.npy" # optional
+INGESTED_FILE = "ingested.txt" # optional: ids of the rows added by ingest.py, one per line
+FINGERPRINT_FILE = "fingerprint.txt" # optional: Catalog.fingerprint of the saved catalog
+LEVEL_DIR = "res-%d/" # sub-directory with the catalog downsampled to a coarser length
+
+class Catalog(object):
+    """
+    All light curves of the database held as dense matrices for vectorized search.
+
+    Attributes:
+        ids: list of light curve filenames (e.g. 'ts-13.txt'), one per row
+        times: 1-d np.array with the time grid shared by all light curves
+        index: TimeIndex of times (a shared RegularTimeIndex for evenly spaced grids), the times of the
+            light curves returned by searches
+        values: (N, L) np.array of standardized light curve values (float64, or float32 in single precision mode;
+            queries are cast to the same dtype)
+        spectra: (N, L//2+1) complex np.array with the real-input FFT of each row of values
+        sketches: (N, SKETCH_COEFFS+2) np.array of lower bounding sketches (see crosscorr.sketch_values)
+        levels: dict of coarser resolutions of the same light curves, {length: Catalog}
+        stats: (N, 2) np.array with the mean and std deviation of each light curve before it was standardized,
+            or None if they are unknown
+        fingerprint: when given, the known fingerprint of ids and values (e.g. as saved with the catalog)
+    """
+
+    def __init__(self, ids, times, values, spectra=None, kernels=None, sketches=None, levels=None, stats=None,
+                 fingerprint=None):
+        self.ids = list(ids)
+        self.index = TimeIndex.from_times(times)
+        self.times = self.index.times
+        self.values = np.atleast_2d(values)
+        self.length = self.values.shape[-1]
+        if spectra is None:
+            spectra = spectra_matrix(self.values)
+        elif spectra.shape[-1] == self.length and self.length > 2:
+            # Catalogs saved before spectra were stored one-sided hold the full FFT
+            spectra = spectra[:, :self.length//2 + 1]
+        self.spectra = spectra
+        if sketches is None:
+            sketches = sketch_values(self.values, SKETCH_COEFFS)
+        self.sketches = sketches
+        self._kernels = {}
+        if kernels is not None:
+            self._kernels[1] = kernels
+        self._rows = {fn: i for i, fn in enumerate(self.ids)}
+        self.levels = levels if levels is not None else {}
+        self.stats = stats
+        self._fingerprint = fingerprint
+
+        if len(self.ids) != self.values.shape[0]:
+            raise ValueError("Catalog ids and value rows of incompatible dimensions")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fingerprint(self):
+        """
+        Hex digest of the ids and values of the light curves. It changes whenever the catalog is rebuilt
+        or appended to with other contents, so files derived from the catalog can be checked against it.
+        Computed once (and saved with the catalog, see save_catalog), so checking it costs no pass over the values.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1("\n".join(self.ids).encode('utf-8'))
+            digest.update(str(self.values.dtype).encode('utf-8'))
+            # block by block, so a memory-mapped catalog is never copied (or read) whole
+            for start in range(0, len(self), SCAN_BLOCK_SIZE):
+                digest.update(np.ascontiguousarray(self.values[start:start + SCAN_BLOCK_SIZE]))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def take(self, rows):
+        """New Catalog with the given rows (copied) of this one and of its coarse levels"""
+        rows = np.asarray(rows, dtype=np.intp)
+        return Catalog([self.ids[i] for i in rows], self.times, self.values[rows], self.spectra[rows],
+                       self.kernels()[rows], self.sketches[rows],
+                       {length: level.take(rows) for length, level in self.levels.items()},
+                       self.stats[rows] if self.stats is not None else None)
+
+    def rows(self, ids):
+        """Row indexes of the given light curve filenames (None for filenames not in the catalog)"""
+        return [self._rows.get(fn) for fn in ids]
+
+    def kernels(self, mult=1):
+        """K(x,x) normalization term of every light curve for multiplier mult (cached)"""
+        if mult not in self._kernels:
+            self._kernels[mult] = self_kernels(self.spectra, mult, self.length)
+        return self._kernels[mult]
+
+    def blocks(self, block_size, mult=1):
+        """Yields (start index, spectra block, kernels block) tuples of at most block_size rows"""
+        kernels = self.kernels(mult)
+        for start in range(0, len(self), block_size):
+            stop = start + block_size
+            yield start, self.spectra[start:stop], kernels[start:stop]
+
+    def distances(self, s_values, rows=None, mult=1, block_size=SCAN_BLOCK_SIZE):
+        """
+        Exact kernel distances from standardized query values to every row (or only the given rows),
+        computed block by block.
+        """
+        q_spectrum = spectra_matrix(np.asarray(s_values, dtype=self.values.dtype))[0]
+        q_kernel = self_kernels(q_spectrum[np.newaxis], mult, self.length)[0]
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        kernels = self.kernels(mult)
+
+        dists = np.empty(len(rows))
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            dists[start:start + block_size] = kernel_dist_block(q_spectrum, q_kernel, self.spectra[block],
+                                                                kernels[block], mult, self.length)
+        return dists
+
+    def distances_multi(self, s_values, mults, rows=None, block_size=SCAN_BLOCK_SIZE):
+        """
+        Exact kernel distances from standardized query values to every row (or only the given rows)
+        for many multipliers at once, e.g. to tune mult. Returns a (len(mults), len(rows)) np.array.
+        """
+        q_spectrum = spectra_matrix(np.asarray(s_values, dtype=self.values.dtype))[0]
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        dists = np.empty((len(mults), len(rows)))
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            dists[:, start:start + block_size] = kernel_dist_block_multi(q_spectrum, self.spectra[block], mults,
+                                                                        self.length)
+        return dists
+
+    def phase_align(self, s_values, rows=None, block_size=SCAN_BLOCK_SIZE):
+        """
+        Best lag and peak cross-correlation of every row (or only the given rows) against standardized
+        query values, block by block (see crosscorr.max_corr_at_phase_block).
+
+        Returns:
+            Tuple: 1-d int np.array of lags, 1-d np.array of peak cross-correlations.
+            crosscorr.roll_rows(self.values[rows], lags) phase-aligns the rows with the query.
+        """
+        q_spectrum = spectra_matrix(np.asarray(s_values, dtype=self.values.dtype))[0]
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        lags = np.empty(len(rows), dtype=int)
+        peaks = np.empty(len(rows))
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            lags[start:start + block_size], peaks[start:start + block_size] = \
+                max_corr_at_phase_block(q_spectrum, self.spectra[block], self.length)
+        return lags, peaks
+
+    def downsampled(self, length):
+        """New Catalog of the same light curves resampled (and re-standardized) to length points"""
+        span = (self.times[1] - self.times[0]) * len(self.times)
+        times = self.times[0] + np.arange(length) * (span / length)
+        return Catalog(self.ids, times, standardize_values(downsample_values(self.values, length)))
+
+    def shortlist_distances(self, s_values, shortlist=SHORTLIST_SIZE, mult=1):
+        """
+        Coarse-to-fine search. Each coarse level, from the lowest resolution up, ranks the rows that
+        survived the previous one and keeps the best; only the last shortlist rows are compared at full resolution.
+        Levels keep shortlist * 2**(number of finer levels) rows, so the early (cheapest) passes prune the least.
+
+        Returns:
+            Tuple: np.array of shortlisted rows, np.array of their exact kernel distances
+        """
+        rows = np.arange(len(self))
+        lengths = sorted(self.levels)
+        for depth, length in enumerate(lengths):
+            keep = shortlist * 2**(len(lengths) - 1 - depth)
+            if keep >= len(rows):
+                continue
+            coarse_q = standardize_values(downsample_values(s_values, length))[0]
+            dists = self.levels[length].distances(coarse_q, rows, mult)
+            rows = rows[np.argsort(dists, kind='mergesort')[:keep]]
+        return rows, self.distances(s_values, rows, mult)
+
+def lc_filenames(lc_dir):
+    """Sorted list of generated light curve filenames in lc_dir"""
+    return sorted(f for f in os.listdir(lc_dir) if f.startswith("ts-") and f.endswith(".txt"))
+
+def build_catalog(lc_dir=LIGHT_CURVES_DIR, catalog_dir=CATALOG_DIR, coarse_lengths=COARSE_LENGTHS,
+                  precision=PRECISION):
+    """
+    Stacks all generated light curves in lc_dir into a standardized catalog and saves it to disk.
+    Light curves ingested into an existing catalog in catalog_dir (see ingest.py) are kept.
+
+    Args:
+        lc_dir: directory with ts-*.txt light curve files
+        catalog_dir: directory the catalog matrices are written to
+        coarse_lengths: downsampled lengths stored for coarse-to-fine search (lengths >= the curve length are skipped)
+        precision: 'float64' or 'float32' (see crosscorr.precision_dtype)
+    Returns:
+        The new Catalog
+    """
+    ids = lc_filenames(lc_dir)
+    data = [np.loadtxt(lc_dir + fn) for fn in ids]
+    times = data[0][:, 0]
+    raw = np.array([d[:, 1] for d in data])
+    values = standardize_values(raw).astype(precision_dtype(precision))
+    stats = np.column_stack([raw.mean(axis=1), raw.std(axis=1, ddof=1)])
+    catalog = Catalog(ids, times, values, stats=stats)
+    catalog.levels = {length: catalog.downsampled(length) for length in coarse_lengths if length < len(times)}
+
+    ingested = ingested_ids(catalog_dir)
+    if ingested and catalog_exists(catalog_dir):
+        old = load_catalog(catalog_dir)
+        rows = sorted(row for row in old.rows(ingested) if row is not None)
+        try:
+            # copies the rows, so the files can be overwritten below
+            catalog = append_catalog(catalog, old.take(rows))
+        except ValueError:
+            print("Dropped %d ingested light curves on another time grid" % len(rows))
+            os.remove(catalog_dir + INGESTED_FILE)
+        del old
+    save_catalog(catalog, catalog_dir)
+    return catalog
+
+def append_catalog(catalog, new):
+    """
+    New Catalog with the light curves of catalog followed by those of new (both on the same time grid).
+    Rows of catalog whose filename is also in new are replaced. Coarse levels are extended with new's
+    curves downsampled to the same lengths.
+
+    Raises:
+        ValueError: if the time grids differ
+    """
+    if len(catalog.times) != len(new.times) or not np.allclose(catalog.times, new.times):
+        raise ValueError("Cannot append light curves on a different time grid to the catalog")
+    new_ids = set(new.ids)
+    keep = np.array([fn not in new_ids for fn in catalog.ids], dtype=bool)
+    dtype = catalog.values.dtype
+    stats = None
+    if catalog.stats is not None and new.stats is not None:
+        stats = np.concatenate([catalog.stats[keep], new.stats])
+    levels = {length: append_catalog(level, new.downsampled(length)) for length, level in catalog.levels.items()}
+    return Catalog([fn for fn, k in zip(catalog.ids, keep) if k] + new.ids, catalog.times,
+                   np.concatenate([catalog.values[keep], new.values.astype(dtype)]),
+                   np.concatenate([catalog.spectra[keep], new.spectra.astype(catalog.spectra.dtype)]),
+                   np.concatenate([catalog.kernels()[keep], new.kernels().astype(dtype)]),
+                   np.concatenate([catalog.sketches[keep], new.sketches]),
+                   levels, stats)
+
+def save_catalog(catalog, catalog_dir=CATALOG_DIR):
+    """Writes catalog matrices to catalog_dir as .npy files"""
+    os.makedirs(catalog_dir, exist_ok=True)
+    with open(catalog_dir + IDS_FILE, 'w') as f:
+        f.write("\n".join(catalog.ids))
+    with open(catalog_dir + FINGERPRINT_FILE, 'w') as f:
+        f.write(catalog.fingerprint())
+    np.save(catalog_dir + TIMES_FILE, catalog.times)
+    np.save(catalog_dir + VALUES_FILE, catalog.values)
+    np.save(catalog_dir + SPECTRA_FILE, catalog.spectra)
+    np.save(catalog_dir + KERNELS_FILE, catalog.kernels())
+    np.save(catalog_dir + SKETCHES_FILE, catalog.sketches)
+    if catalog.stats is not None:
+        np.save(catalog_dir + STATS_FILE, catalog.stats)
+    elif os.path.isfile(catalog_dir + STATS_FILE):
+        os.remove(catalog_dir + STATS_FILE)
+    for length, level in catalog.levels.items():
+        save_catalog(level, catalog_dir + LEVEL_DIR % length)
+    # Drop levels left over from a build with other COARSE_LENGTHS
+    for d in os.listdir(catalog_dir):
+        if d.startswith("res-") and int(d[4:]) not in catalog.levels:
+            shutil.rmtree(catalog_dir + d)
+
+def ingested_ids(catalog_dir=CATALOG_DIR):
+    """Ids of the light curves ingested into the catalog in catalog_dir (see record_ingested)"""
+    try:
+        with open(catalog_dir + INGESTED_FILE) as f:
+            return f.read().splitlines()
+    except(IOError):
+        return []
+
+def record_ingested(ids, catalog_dir=CATALOG_DIR):
+    """Adds ids to the ingested light curves of the catalog in catalog_dir, which rebuilds keep"""
+    known = set(ingested_ids(catalog_dir))
+    with open(catalog_dir + INGESTED_FILE, 'a') as f:
+        f.writelines(fn + "\n" for fn in ids if fn not in known)
+
+def catalog_exists(catalog_dir=CATALOG_DIR):
+    """Helper to determine whether a saved catalog is available in catalog_dir"""
+    files = [IDS_FILE, TIMES_FILE, VALUES_FILE, SPECTRA_FILE, KERNELS_FILE, SKETCHES_FILE]
+    return all(os.path.isfile(catalog_dir + f) for f in files)
+
+def catalog_size(catalog_dir=CATALOG_DIR):
+    """Number of light curves in the saved catalog, read without loading its matrices"""
+    with open(catalog_dir + IDS_FILE) as f:
+        return len(f.read().splitlines())
+
+def load_catalog(catalog_dir=CATALOG_DIR):
+    """
+    Loads a previously saved catalog from catalog_dir.
+    The value and spectra matrices are memory-mapped, so only the rows a search touches are read.
+    """
+    try:
+        # one id per line; ids of ingested files may contain spaces
+        with open(catalog_dir + IDS_FILE) as f:
+            ids = f.read().splitlines()
+        times = np.load(catalog_dir + TIMES_FILE)
+        values = np.load(catalog_dir + VALUES_FILE, mmap_mode='r')
+        spectra = np.load(catalog_dir + SPECTRA_FILE, mmap_mode='r')
+        kernels = np.load(catalog_dir + KERNELS_FILE)
+        sketches = np.load(catalog_dir + SKETCHES_FILE)
+        stats = np.load(catalog_dir + STATS_FILE) if os.path.isfile(catalog_dir + STATS_FILE) else None
+        fingerprint = None
+        if os.path.isfile(catalog_dir + FINGERPRINT_FILE):
+            with open(catalog_dir + FINGERPRINT_FILE) as f:
+                fingerprint = f.read().strip() or None
+    except(IOError):
+        raise IOError("Unable to load catalog from %s" % catalog_dir)
+    else:
+        levels = {}
+        for d in os.listdir(catalog_dir):
+            if d.startswith("res-") and catalog_exists(catalog_dir + d + "/"):
+                levels[int(d[4:])] = load_catalog(catalog_dir + d + "/")
+        return Catalog(ids, times, values, spectra, kernels, sketches, levels, stats, fingerprint)
@@ -8,8 +8,8 @@ import os
 import sys
 import random
 import numpy as np
-import numpy.fft as nfft
 from scipy.stats import norm
+from scipy.special import logsumexp
 
 # This is a hacky solution to import the array time series class from sister directory by inserting it into system path
 # should fix once time series library is turned into a proper python model
@@ -20,11 +20,68 @@ sys.path.insert(0,d + '/timeseries')
 
 import timeseries
 import arraytimeseries as ats
+import fftbackend
+from standardizedtimeseries import StandardizedTimeSeries
+from settings import FFT_BACKEND, FFT_WORKERS, SCAN_BLOCK_SIZE, TS_LENGTH
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+
+# The FFT backend is picked once, on first use ('auto' benchmarks the available ones on a typical scan block)
+fftbackend.configure(FFT_BACKEND, FFT_WORKERS, (SCAN_BLOCK_SIZE, TS_LENGTH))
 
 def standardize(ts):
-    """standardize timeseries ts by its mean and std deviation"""
-    stand_vals = (ts.values() - ts.mean())/ts.std()
-    return ats.ArrayTimeSeries(times=ts.times(), values=stand_vals)
+    """
+    standardize timeseries ts by its mean and std deviation
+    Returns a StandardizedTimeSeries (ts itself if it already is one), which the distance functions
+    below recognize to skip the mean check and reuse its cached spectrum.
+    """
+    return StandardizedTimeSeries.from_series(ts)
+
+def standardize_aligned(ts1, ts2, how='outer'):
+    """
+    Puts two time series with different time domains (e.g. irregularly sampled light curves) on common
+    times with a linear merge of their times and linear interpolation (see align), and standardizes both,
+    ready for ccor, kernel_corr and kernel_dist. The default 'outer' keeps the times of either series,
+    since irregularly sampled curves rarely share exact times.
+    Raises ValueError when fewer than 2 common times are left (e.g. an 'inner' join of disjoint times).
+    """
+    aligned1, aligned2 = ts1.align(ts2, how, fill='interpolate')
+    if len(aligned1) < 2:
+        raise ValueError("Aligning with how=%r leaves %d common times" % (how, len(aligned1)))
+    return standardize(aligned1), standardize(aligned2)
+
+def series_spectrum(ts):
+    """real-input FFT of the values of ts (cached on a StandardizedTimeSeries)"""
+    if isinstance(ts, StandardizedTimeSeries):
+        return ts.spectrum()
+    return fftbackend.get_backend().rfft(ts.values_view())
+
+def precision_dtype(precision):
+    """
+    Real dtype of a precision mode: 'float64' (default) or 'float32', which stores and computes catalog
+    matrices in single precision (complex64 spectra) for half the memory and bandwidth.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError("Unknown precision %r (choose from %s)" % (precision, ", ".join(sorted(PRECISIONS))))
+    return PRECISIONS[precision]
+
+def standardize_values(values):
+    """standardize each row of a (N, L) value matrix by its mean and std deviation (same ddof as standardize; keeps float32)"""
+    values = np.atleast_2d(values)
+    means = values.mean(axis=-1, keepdims=True)
+    stds = values.std(axis=-1, ddof=1, keepdims=True)
+    return (values - means)/stds
+
+def downsample_values(values, length):
+    """
+    Resamples each row of a (N, L) value matrix down to length points by keeping only the
+    lowest length//2+1 Fourier coefficients (a low-pass filter, so no aliasing).
+    Rows must be re-standardized before computing kernel distances on them.
+    """
+    fft = fftbackend.get_backend()
+    values = np.atleast_2d(values)
+    coeffs = fft.rfft(values, axis=-1)[:, :length//2 + 1]
+    return fft.irfft(coeffs, length, axis=-1) * (length / values.shape[-1])
 
 def ccor(ts1, ts2):
     """
@@ -45,26 +102,55 @@ def ccor(ts1, ts2):
     if len(ts1) != len(ts2):
         raise ValueError("ts1 must be the same length as ts2 to calculate cross correlation")
 
-    # fast fourier transform for ts1
-    X = nfft.fft(ts1.values())
+    # real-input fast fourier transform for ts1 (the input is real, so the
+    # negative frequencies are redundant)
+    fft = fftbackend.get_backend()
+    X = series_spectrum(ts1)
 
     # Complex conjugate of the fft transform of ts2
-    Yhat = np.conjugate(nfft.fft(ts2.values()))
+    Yhat = np.conjugate(series_spectrum(ts2))
 
     # Normalizing scaler is required so that each shift is counted exactly once
     s = 1 / (1. * len(ts1))
 
     # The cross-correlation is the convolution of the fft transformed ts1 (X)
     # and the conjugate of ts2 (Yhat) scaled by s
-    return  nfft.ifft(X * Yhat).real * s
+    return  fft.irfft(X * Yhat, len(ts1)) * s
 
 def max_corr_at_phase(ts1, ts2):
-    """ this is just for checking the max correlation with the kernelized cross-correlation """
+    """
+    this is just for checking the max correlation with the kernelized cross-correlation
+    (see max_corr_at_phase_block to do it for many curves at once)
+    """
     ccorts = ccor(ts1, ts2)
     idx = np.argmax(ccorts)
     maxcorr = ccorts[idx]
     return idx, maxcorr
 
+def max_corr_at_phase_block(q_spectrum, spectra, length=None):
+    """
+    Batched max_corr_at_phase: the best lag and peak cross-correlation between one standardized
+    query and every light curve of a block, from one row-wise product with the stored spectra.
+
+    Args:
+        q_spectrum: 1-d complex np.array, FFT of the standardized query values
+        spectra: 2-d complex np.array with one standardized light curve spectrum per row
+        length: number of points in each time series (see spectra_ccors)
+    Returns:
+        Tuple: 1-d int np.array of lags, 1-d np.array of peak cross-correlations, one per row.
+        np.roll(row, lag) is the row shifted into phase with the query.
+    """
+    ccors = spectra_ccors(q_spectrum, spectra, length)
+    lags = np.argmax(ccors, axis=-1)
+    return lags, ccors[np.arange(len(ccors)), lags]
+
+def roll_rows(values, lags):
+    """np.roll of each row of a (N, L) matrix by its own lag, in one fancy-indexing pass"""
+    values = np.atleast_2d(values)
+    length = values.shape[-1]
+    cols = (np.arange(length)[np.newaxis, :] - np.asarray(lags)[:, np.newaxis]) % length
+    return values[np.arange(len(values))[:, np.newaxis], cols]
+
 def kernel_corr(ts1, ts2, mult=1):
     """
     Compute a kernelized correlation between two time series objects to be used as distance measure
@@ -83,14 +169,20 @@ def kernel_corr(ts1, ts2, mult=1):
     of a time series with itself is 1. We'll set the default multiplier to 1.
     """
 
+    if len(ts1) != len(ts2):
+        raise ValueError("ts1 must be the same length as ts2 to calculate cross correlation")
+
+    # ccor(ts1,ts2), ccor(ts1,ts1) and ccor(ts2,ts2) from one transform of each series
+    X, Y = series_spectrum(ts1), series_spectrum(ts2)
+    ccors = spectra_ccors(np.array([X, X, Y]), np.array([Y, X, Y]), len(ts1))
+
     # calculate kernel
     # K(e^(m*ccor(ts1,ts2)))
-    kernel = np.sum(np.exp(mult * ccor(ts1, ts2)))
+    kernel = np.sum(np.exp(mult * ccors[0]))
 
     # Calculate kernel normalization constant:
     # sqrt(K(x,x)K(y,y))
-    k_norm = np.sqrt(np.sum(np.exp(mult * ccor(ts1, ts1))) *
-                     np.sum(np.exp(mult * ccor(ts2, ts2))))
+    k_norm = np.sqrt(np.sum(np.exp(mult * ccors[1])) * np.sum(np.exp(mult * ccors[2])))
 
     # return normalized kernel if k_norm is non-zero
     if k_norm != 0:
@@ -123,6 +215,189 @@ def kernel_dist(ts1, ts2, mult=1):
     # However, we are using normalized kernels here, so the dist^2 will be 2(1-C(ts1,ts2))
     return np.sqrt(2*(1-kernel_corr_val))
 
+def kernel_dist_multi(ts1, ts2, mults):
+    """
+    Kernel distance between two standardized time series for many multiplier factors at once.
+
+    Args:
+        ts1: 1st time series object. (Must be standardized)
+        ts2: 2nd time series object. (Must be standardized)
+        mults: sequence of multiplier factors (gammas). (Must be non-negative.)
+    Returns:
+        1-d np.array with kernel_dist(ts1, ts2, mult) for each mult
+
+    The cross-correlations are computed once. Each kernel sum is taken as a log-sum-exp, so
+    large multipliers (where exp(mult) overflows) still give finite distances.
+    """
+    if abs(ts1.mean()) >= .0001 or abs(ts2.mean()) >= .0001:
+        raise ValueError("time series must be standardized before calculating kernel distance")
+    spectra = np.array([series_spectrum(ts1), series_spectrum(ts2)])
+    return kernel_dist_block_multi(spectra[0], spectra[1:], mults, len(ts1))[:, 0]
+
+def log_kernels(ccors, mults):
+    """log(sum_k exp(mult * ccor_k)) over the last axis of ccors, for each mult; shape (len(mults),) + ccors.shape[:-1]"""
+    mults = np.asarray(mults, dtype=float).reshape((-1,) + (1,) * ccors.ndim)
+    return logsumexp(mults * ccors, axis=-1)
+
+def spectra_matrix(values):
+    """
+    Computes the real-input FFT of every row of a (N, L) matrix of standardized light curve values.
+
+    Args:
+        values: 2-d np.array with one standardized light curve per row
+    Returns:
+        (N, L//2+1) complex np.array, one spectrum per row (the other half of the full
+        spectrum holds the complex conjugates, so it is not stored)
+    """
+    return fftbackend.get_backend().rfft(np.atleast_2d(values), axis=-1)
+
+def spectra_ccors(q_spectrum, spectra, length=None):
+    """
+    Circular cross-correlations of a query with every row of a spectra matrix (see ccor).
+
+    Args:
+        q_spectrum: complex np.array, spectrum of the standardized query (see spectra_matrix)
+        spectra: complex np.array with one spectrum per row
+        length: number of points in each time series. Defaults to an even length,
+            2*(spectra.shape[-1]-1); pass it explicitly for odd lengths.
+    Returns:
+        np.array with one cross-correlation per row, over all lags
+    """
+    if length is None:
+        length = 2 * (spectra.shape[-1] - 1)
+    s = 1 / (1. * length)
+    return fftbackend.get_backend().irfft(q_spectrum * np.conjugate(spectra), length, axis=-1) * s
+
+def self_kernels(spectra, mult=1, length=None):
+    """
+    Computes the kernel normalization term K(x,x) for every row of a spectra matrix.
+
+    Args:
+        spectra: 2-d complex np.array as returned by spectra_matrix
+        mult: multiplier factor. Defaults to 1. (Must be non-negative.)
+        length: number of points in each time series (see spectra_ccors)
+    Returns:
+        1-d np.array with K(x,x) for each row
+    """
+    acorr = spectra_ccors(spectra, spectra, length)
+    return np.sum(np.exp(mult * acorr), axis=-1)
+
+def kernel_dist_block(q_spectrum, q_kernel, spectra, kernels, mult=1, length=None):
+    """
+    Calculates the kernel distance between one standardized query and a block of
+    standardized light curves in a single vectorized pass.
+
+    Args:
+        q_spectrum: 1-d complex np.array, FFT of the standardized query values
+        q_kernel: K(q,q) for the query (see self_kernels)
+        spectra: 2-d complex np.array with one light curve spectrum per row
+        kernels: 1-d np.array with K(x,x) for each row of spectra
+        mult: multiplier factor. Defaults to 1. (Must be non-negative.)
+        length: number of points in each time series (see spectra_ccors)
+    Returns:
+        1-d np.array of distances, one per row of spectra
+
+    Gives the same values as kernel_dist on each pair; the sum over all lags of the
+    cross-correlation does not depend on which curve is conjugated.
+    """
+    ccors = spectra_ccors(q_spectrum, spectra, length)
+    kernel = np.sum(np.exp(mult * ccors), axis=-1)
+    k_norm = np.sqrt(q_kernel * kernels)
+    kernel_corr_vals = np.where(k_norm != 0, kernel / np.where(k_norm != 0, k_norm, 1), 0)
+
+    # Clip tiny negative values caused by rounding for (near) identical curves
+    return np.sqrt(np.maximum(2*(1-kernel_corr_vals), 0))
+
+def kernel_dist_block_multi(q_spectrum, spectra, mults, length=None):
+    """
+    kernel_dist_block for many multiplier factors at once: the cross-correlations of the query with the
+    block (and the autocorrelations) are computed once and reused for every mult.
+
+    Args:
+        q_spectrum: 1-d complex np.array, FFT of the standardized query values
+        spectra: 2-d complex np.array with one light curve spectrum per row
+        mults: sequence of multiplier factors (gammas). (Must be non-negative.)
+        length: number of points in each time series (see spectra_ccors)
+    Returns:
+        (len(mults), N) np.array of distances, one row per mult
+
+    Kernel correlations are formed as exp(log K(q,x) - (log K(q,q) + log K(x,x))/2) from log-sum-exps,
+    which stays finite for multipliers far beyond where exp(mult) overflows.
+    """
+    ccors = spectra_ccors(q_spectrum, spectra, length)
+    q_acorr = spectra_ccors(q_spectrum, q_spectrum, length)
+    acorrs = spectra_ccors(spectra, spectra, length)
+
+    log_norms = (log_kernels(q_acorr, mults)[:, np.newaxis] + log_kernels(acorrs, mults)) / 2
+    kernel_corr_vals = np.exp(log_kernels(ccors, mults) - log_norms)
+    return np.sqrt(np.maximum(2*(1-kernel_corr_vals), 0))
+
+def sketch_values(values, n_coeffs=64):
+    """
+    Computes a small, shift invariant sketch of every row of a standardized value matrix.
+
+    Args:
+        values: 2-d np.array with one standardized light curve per row
+        n_coeffs: number of leading DFT amplitudes to keep (capped at L//2+1)
+    Returns:
+        (N, n_coeffs+2) np.array. Each row holds the leading real-FFT amplitudes |X_f|, followed by
+        the (two-sided) residual power sum(|X_f|^2) and squared power sum(|X_f|^4) of the dropped coefficients.
+    """
+    # Always double precision: a sketch is small, and its bound must not lose to rounding
+    values = np.atleast_2d(values).astype(np.float64)
+    amps = np.abs(spectra_matrix(values))
+    weights = rfft_weights(values.shape[-1])
+    n_coeffs = min(n_coeffs, amps.shape[-1])
+    residual = amps[:, n_coeffs:]
+    power = np.sum(weights[n_coeffs:] * residual**2, axis=-1)
+    power2 = np.sum(weights[n_coeffs:] * residual**4, axis=-1)
+    return np.hstack([amps[:, :n_coeffs], power[:, np.newaxis], power2[:, np.newaxis]])
+
+def rfft_weights(length):
+    """Number of times each real-FFT coefficient appears in the full spectrum of a length-long signal"""
+    weights = np.full(length//2 + 1, 2.0)
+    weights[0] = 1
+    if length % 2 == 0:
+        weights[-1] = 1
+    return weights
+
+def kernel_dist_lower_bound(q_sketch, q_kernel, sketches, kernels, length, mult=1):
+    """
+    Cheap lower bound on kernel_dist between a query and many light curves, computed from sketches alone.
+
+    Args:
+        q_sketch: 1-d np.array, sketch of the standardized query (see sketch_values)
+        q_kernel: K(q,q) for the query (see self_kernels)
+        sketches: 2-d np.array of light curve sketches, one per row
+        kernels: 1-d np.array with K(x,x) for each row of sketches
+        length: number of points in each time series
+        mult: multiplier factor. Defaults to 1. (Must be non-negative.)
+    Returns:
+        1-d np.array with a lower bound on the kernel distance for each row
+
+    The cross-correlation c_k of two standardized series sums to zero over all lags, and by
+    Parseval sum(c_k^2) = Q = sum_f |X_f|^2 |Y_f|^2 / L^3, while max(c_k) <= U = sum_f |X_f||Y_f| / L^2.
+    The sketch bounds Q and U from above (Cauchy-Schwarz on the dropped coefficients), and since
+    e^x <= 1 + x + x^2 (e^a - 1 - a)/a^2 for all x <= a, sum_k e^(m c_k) <= L + m^2 Q (e^a - 1 - a)/a^2
+    with a = m*min(U, sqrt(Q)). That bounds the kernel correlation from above and the distance from below.
+    """
+    n_coeffs = len(q_sketch) - 2
+    weights = rfft_weights(length)[:n_coeffs]
+    amps = sketches[..., :n_coeffs] * q_sketch[:n_coeffs]
+
+    q_bound = (np.sum(weights * amps**2, axis=-1) +
+               np.sqrt(sketches[..., -1] * q_sketch[-1])) / length**3
+    u_bound = (np.sum(weights * amps, axis=-1) +
+               np.sqrt(sketches[..., -2] * q_sketch[-2])) / length**2
+
+    a = mult * np.minimum(u_bound, np.sqrt(q_bound))
+    safe_a = np.where(a > 1e-6, a, 1)
+    h = np.where(a > 1e-6, (np.exp(safe_a) - 1 - safe_a) / safe_a**2, 0.5)
+    kernel_bound = length + mult**2 * q_bound * h
+
+    kernel_corr_bound = kernel_bound / np.sqrt(q_kernel * kernels)
+    return np.sqrt(np.maximum(2*(1-kernel_corr_bound), 0))
+
 def s_stats(n,ts):
     """Prints summary stats for ts """
     return "%s mean: %.4f, %s std: %.4f" % (n,ts.mean(),n,ts.std())
@@ -0,0 +1,96 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import dbm
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+from crosscorr import kernel_dist
+from settings import DIST_CACHE_FILE, DIST_CACHE_SIZE
+
+def content_hash(ts):
+    """Short hex digest of the values of time series ts"""
+    return hashlib.sha1(np.ascontiguousarray(ts.values_view(), dtype=np.float64).tobytes()).hexdigest()[:16]
+
+class DistanceCache(object):
+    """
+    Persistent cache of pairwise kernel distances.
+
+    Entries are keyed by (id_a, id_b, mult, content hash of both curves), so regenerated light curves
+    with a reused filename never hit stale distances. Lookups go through a bounded in-memory LRU
+    before falling back on the on-disk dbm store.
+
+    Attributes:
+        hits: lookups answered from memory
+        disk_hits: lookups answered from the on-disk store
+        misses: lookups that had to compute the distance
+    """
+
+    def __init__(self, filename=DIST_CACHE_FILE, capacity=DIST_CACHE_SIZE):
+        self._db = dbm.open(filename, 'c')
+        self._lru = OrderedDict()
+        self.capacity = capacity
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(id_a, ts_a, id_b, ts_b, mult=1):
+        """Cache key for the distance between ts_a and ts_b (the distance is symmetric, so is the key)"""
+        a = (str(id_a), content_hash(ts_a))
+        b = (str(id_b), content_hash(ts_b))
+        if b < a:
+            a, b = b, a
+        return "%s|%s|%r|%s%s" % (a[0], b[0], mult, a[1], b[1])
+
+    def get(self, key):
+        """Cached distance for key, or None if it has not been computed before"""
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return self._lru[key]
+        try:
+            dist = float(self._db[key])
+        except KeyError:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, dist)
+        return dist
+
+    def set(self, key, dist):
+        """Stores a distance in memory and on disk"""
+        self._db[key] = repr(float(dist))
+        self._remember(key, dist)
+
+    def _remember(self, key, dist):
+        self._lru[key] = dist
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def kernel_dist(self, id_a, ts_a, id_b, ts_b, mult=1):
+        """kernel_dist(ts_a, ts_b, mult) for standardized time series, computed only on a cache miss"""
+        key = self.key(id_a, ts_a, id_b, ts_b, mult)
+        dist = self.get(key)
+        if dist is None:
+            dist = kernel_dist(ts_a, ts_b, mult)
+            self.set(key, dist)
+        return dist
+
+    def hit_rate(self):
+        """Fraction of lookups that did not need any FFT work"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.
+
+    def stats(self):
+        """One line summary of the hit statistics"""
+        return "hits=%d disk_hits=%d misses=%d hit_rate=%.3f" % (self.hits, self.disk_hits,
+                                                                 self.misses, self.hit_rate())
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,154 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import Pool
+
+from catalog import load_catalog
+from crosscorr import kernel_dist_block
+from settings import CATALOG_DIR, DIST_MATRIX_FILE, DIST_MATRIX_TILE
+
+# Global variables
+
+HELP_MESSAGE = \
+"""
+Build Distance Matrix
+
+A python command line utility to compute the full N x N kernel distance matrix of the light curve catalog.
+The matrix is computed in tiles and written to a memory-mapped float32 .npy file. Finished tiles are
+recorded, so an interrupted run picks up where it stopped. A run with another tile size or multiplier, or
+on a catalog with other contents, starts over.
+
+Usage: ./distmatrix [optional flags]
+
+Optional flags:
+  -h, --help        Show this help message and exit.
+  -w, --workers N   Number of worker processes (Defaults to the number of CPUs)
+  -t, --tile N      Number of light curves per tile side (Defaults to DIST_MATRIX_TILE in settings)
+"""
+
+# Catalog opened once per worker process (see init_worker)
+worker_catalog = None
+
+def progress_path(matrix_path):
+    """catalog/distances.npy -> catalog/distances.done"""
+    return os.path.splitext(matrix_path)[0] + ".done"
+
+def tiles(n, tile):
+    """All (row start, column start) pairs of the upper triangle of an n x n matrix split in tile x tile blocks"""
+    starts = range(0, n, tile)
+    return [(i, j) for i in starts for j in starts if i <= j]
+
+def progress_header(catalog, tile, mult):
+    """First line of the progress file: the settings and catalog contents the finished tiles belong to"""
+    return "# mult=%r tile=%d catalog=%s\n" % (float(mult), tile, catalog.fingerprint())
+
+def load_done_tiles(matrix_path):
+    """Set of tiles that a previous run already finished"""
+    try:
+        with open(progress_path(matrix_path)) as f:
+            return set(tuple(int(x) for x in line.split()) for line in f if line.strip() and line[0] != '#')
+    except(IOError):
+        return set()
+
+def open_matrix(matrix_path, n, header):
+    """
+    Opens the memory-mapped distance matrix. It is created anew (and progress reset) if it does not fit
+    n curves or its progress file was written with another header (see progress_header).
+    """
+    try:
+        with open(progress_path(matrix_path)) as f:
+            resumable = f.readline() == header
+    except(IOError):
+        resumable = False
+    if resumable and os.path.isfile(matrix_path):
+        matrix = np.load(matrix_path, mmap_mode='r+')
+        if matrix.shape == (n, n) and matrix.dtype == np.float32:
+            return matrix
+    matrix = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=np.float32, shape=(n, n))
+    with open(progress_path(matrix_path), 'w') as progress:
+        progress.write(header)
+    return matrix
+
+def init_worker(catalog_dir):
+    global worker_catalog
+    worker_catalog = load_catalog(catalog_dir)
+
+def compute_tile(args):
+    """
+    Computes one tile of the distance matrix (and its mirror image below the diagonal) and writes it to disk.
+    Uses the same vectorized kernel distance as the catalog scan, so values match kernel_dist.
+    """
+    matrix_path, i, j, tile, mult = args
+    spectra, kernels = worker_catalog.spectra, worker_catalog.kernels(mult)
+    rows = slice(i, min(i + tile, len(worker_catalog)))
+    cols = slice(j, min(j + tile, len(worker_catalog)))
+
+    block = np.array([kernel_dist_block(spectra[r], kernels[r], spectra[cols], kernels[cols], mult, worker_catalog.length)
+                      for r in range(rows.start, rows.stop)], dtype=np.float32)
+    if i == j:
+        np.fill_diagonal(block, 0)
+
+    matrix = np.load(matrix_path, mmap_mode='r+')
+    matrix[rows, cols] = block
+    matrix[cols, rows] = block.T
+    matrix.flush()
+    return i, j
+
+def build_distance_matrix(catalog_dir=CATALOG_DIR, matrix_path=None, tile=DIST_MATRIX_TILE, workers=None, mult=1):
+    """
+    Computes (or resumes computing) the full kernel distance matrix of the catalog.
+
+    Args:
+        catalog_dir: directory of the saved catalog
+        matrix_path: output .npy file. Defaults to DIST_MATRIX_FILE in catalog_dir
+        tile: number of light curves per tile side
+        workers: number of worker processes. Defaults to the number of CPUs
+        mult: multiplier factor of the kernel distance
+    Returns:
+        The distance matrix as a read-only np.memmap
+    """
+    if matrix_path is None:
+        matrix_path = catalog_dir + DIST_MATRIX_FILE
+    catalog = load_catalog(catalog_dir)
+    n = len(catalog)
+    open_matrix(matrix_path, n, progress_header(catalog, tile, mult))
+
+    done = load_done_tiles(matrix_path)
+    todo = [(matrix_path, i, j, tile, mult) for i, j in tiles(n, tile) if (i, j) not in done]
+    print("Computing %d of %d distance matrix tiles" % (len(todo), len(todo) + len(done)), end="")
+
+    start = time.time()
+    with Pool(workers, initializer=init_worker, initargs=(catalog_dir,)) as pool, \
+         open(progress_path(matrix_path), 'a') as progress:
+        for i, j in pool.imap_unordered(compute_tile, todo):
+            progress.write("%d %d\n" % (i, j))
+            progress.flush()
+            print('.', end="")
+    print("Done. (%.1fs)" % (time.time() - start))
+    return np.load(matrix_path, mmap_mode='r')
+
+if __name__ == "__main__":
+    """Enables this file to be run independently of simsearch as it's own CLU."""
+    need_help = False
+    workers = None
+    tile = DIST_MATRIX_TILE
+
+    # First, identify which flags were included
+    for i, arg in enumerate(sys.argv[1:]):
+        if arg.lower() in ['-h','--help', 'help']: need_help = True
+        elif arg.lower() in ['-w','--workers'] and i + 2 < len(sys.argv):
+            workers = int(sys.argv[i + 2])
+        elif arg.lower() in ['-t','--tile'] and i + 2 < len(sys.argv):
+            tile = int(sys.argv[i + 2])
+
+    if need_help:
+        print (HELP_MESSAGE)
+    else:
+        build_distance_matrix(tile=tile, workers=workers)
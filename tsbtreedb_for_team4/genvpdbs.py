@@ -6,17 +6,20 @@
 
 import sys
 import os
-import random
 import numpy as np
 
 from unbalancedDB import connect
 from crosscorr import kernel_dist, standardize
 from makelcs import clear_dir
-from settings import LIGHT_CURVES_DIR, DB_DIR, TS_LENGTH
+from distcache import DistanceCache
+from vpselect import select_vantage_points, VP_STRATEGIES
+from settings import LIGHT_CURVES_DIR, DB_DIR, TS_LENGTH, VP_STRATEGY, VP_COMPARE_LENGTH
 import arraytimeseries as ats
 
 # Global variables
 
+INDEXED_FILE = "indexed.txt" # light curves the vantage point dbs cover, one per line
+
 HELP_MESSAGE = \
 """
 Generate Vantage Point Index DBs
@@ -26,7 +29,9 @@ A python command line utility to generate vantage point DBs from light-curve fil
 Usage: ./genvpdbs  [optional flags]
 
 Optional flags:
-  -h, --help    Show this help message and exit.
+  -h, --help            Show this help message and exit.
+  -s, --strategy NAME   Vantage point selection strategy: random, farthest, variance or kmedoids
+                        (Defaults to VP_STRATEGY in settings)
 """
 
 def load_ts(LIGHT_CURVES_DIR):
@@ -41,23 +46,36 @@ def load_ts(LIGHT_CURVES_DIR):
             timeseries_dict[file] = ts
     return timeseries_dict
 
-def pick_vantage_points(timeseries_dict,n=20):
-    """Selects n light curves at random to serve as vantage points"""
-    return random.sample(timeseries_dict.keys(), n)
+def pick_vantage_points(timeseries_dict,n=20,strategy=VP_STRATEGY,length=VP_COMPARE_LENGTH):
+    """
+    Selects n light curves to serve as vantage points (see vpselect for the strategies).
+    Candidates are compared at full resolution unless length (VP_COMPARE_LENGTH) asks for a downsampled
+    comparison, which is cheaper but can pick different vantage points.
+    Returns tuple with the list of vantage point filenames and the expected pruning ratio of the index.
+    """
+    ids = sorted(timeseries_dict)
+    values = np.array([timeseries_dict[k].values() for k in ids])
+    return select_vantage_points(ids, values, n, strategy, length=length)
 
-def calc_distances(vp_k,timeseries_dict):
-    """Calculates kernel distance between vantage point and all loaded light curves"""
+def calc_distances(vp_k,timeseries_dict,cache=None):
+    """
+    Calculates kernel distance between vantage point and all loaded light curves.
+    Distances already in the (optional) DistanceCache are not recomputed.
+    """
     distances = []
     vp = standardize(timeseries_dict[vp_k])
     for k in timeseries_dict:
         if k != vp_k:
-            k_dist = kernel_dist(vp, standardize(timeseries_dict[k]))
+            if cache is not None:
+                k_dist = cache.kernel_dist(vp_k, vp, k, standardize(timeseries_dict[k]))
+            else:
+                k_dist = kernel_dist(vp, standardize(timeseries_dict[k]))
             distances.append((k_dist,k))
     return distances
 
-def save_vp_dbs(vp,timeseries_dict):
+def save_vp_dbs(vp,timeseries_dict,cache=None):
     """ Creates unbalanced binary tree databases and saves them to disk"""
-    sorted_ds = calc_distances(vp,timeseries_dict)
+    sorted_ds = calc_distances(vp,timeseries_dict,cache)
 
     # ts-13.txt -> vp_dbs/ts-13.dbdb
     db_filepath = DB_DIR + vp[:-4] + ".dbdb"
@@ -69,30 +87,58 @@ def save_vp_dbs(vp,timeseries_dict):
     db.commit()
     db.close()
 
-def create_vpdbs(n,LIGHT_CURVES_DIR):
+    # Sorted distances let the query planner count candidates without walking the tree
+    np.save(vp_dists_path(vp), np.sort([dist_to_vp for dist_to_vp,ts_fn in sorted_ds]))
+
+def load_indexed_ids():
+    """Set of light curve filenames the vantage point dbs index, or None for dbs built without the list"""
+    try:
+        with open(DB_DIR + INDEXED_FILE) as f:
+            return set(f.read().splitlines())
+    except(IOError):
+        return None
+
+def vp_dists_path(vp):
+    """ts-13.txt -> vp_dbs/ts-13.dists.npy"""
+    return DB_DIR + vp[:-4] + ".dists.npy"
+
+def create_vpdbs(n,LIGHT_CURVES_DIR,strategy=VP_STRATEGY):
     """
     Executes functions above:
         (1) Creates timeseries_dict from time series files on disk
-        (2) Picks 20 vantage points at random
+        (2) Picks 20 vantage points with the given selection strategy
         (3) Calculates kernel distance between vantage points and generated time series (This can take a while)
-        (4) Saves kernel distance indexes to disk as binary tree databases
+        (4) Saves kernel distance indexes to disk as binary tree databases, and the list of light curves
+            they cover
     """
     print("Creating %d vantage point dbs" % n,end="")
     timeseries_dict = load_ts(LIGHT_CURVES_DIR)
-    vantage_points = pick_vantage_points(timeseries_dict,n)
+    vantage_points, pruning = pick_vantage_points(timeseries_dict,n,strategy)
     clear_dir(DB_DIR)
+    cache = DistanceCache()
     for vp in vantage_points:
         print('.', end="")
-        save_vp_dbs(vp,timeseries_dict)
-    print("Done.")
+        save_vp_dbs(vp,timeseries_dict,cache)
+    cache.close()
+    with open(DB_DIR + INDEXED_FILE, 'w') as f:
+        f.writelines(fn + "\n" for fn in sorted(timeseries_dict))
+    print("Done. (Distance cache %s)" % cache.stats())
+    print("Vantage points picked by %s strategy; expected pruning ratio %.3f" % (strategy, pruning))
 
 if __name__ == "__main__":
     """Enables this file to be run independently of simsearch as it's own CLU."""
     need_help = False
+    strategy = VP_STRATEGY
 
     # First, identify which flags were included
-    for arg in sys.argv[1:]:
+    for i, arg in enumerate(sys.argv[1:]):
         if arg.lower() in ['-h','--help', 'help']: need_help = True
+        elif arg.lower() in ['-s','--strategy'] and i + 2 < len(sys.argv):
+            strategy = sys.argv[i + 2]
+
+    if strategy not in VP_STRATEGIES:
+        print("Unknown strategy %s" % strategy)
+        need_help = True
 
     while(True):
         if need_help:
@@ -100,5 +146,5 @@ if __name__ == "__main__":
             break
         else:
             print("Starting...(May take a little while)")
-            create_vpdbs(20,LIGHT_CURVES_DIR)
+            create_vpdbs(20,LIGHT_CURVES_DIR,strategy)
             break
@@ -0,0 +1,162 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import Pool
+
+from crosscorr import standardize_values, spectra_matrix, self_kernels, sketch_values, precision_dtype
+from catalog import Catalog, append_catalog, save_catalog, load_catalog, catalog_exists, record_ingested
+from lightcurveio import load_folded
+from interpolation import ragged_offsets, interpolate_ragged
+from settings import CATALOG_DIR, TS_LENGTH, SKETCH_COEFFS, COARSE_LENGTHS, PRECISION, INGEST_SUFFIX, INGEST_CHUNK
+
+# Global variables
+
+HELP_MESSAGE = \
+"""
+Ingest Light Curves
+
+A python command line utility to add a directory of external light curves (e.g. .dat_folded files) to the
+catalog. The directory is walked recursively; each file is parsed, interpolated to TS_LENGTH points between
+0 and 1 and standardized, and its spectrum, kernel norm, sketch and statistics are computed, all on a
+process pool. Files already in the catalog (same path relative to the directory) are replaced. Ingested
+files are not in the vantage point index, so searches scan the catalog; rebuilds keep them.
+
+Usage: ./ingest directory [optional flags]
+
+Optional flags:
+  -h, --help        Show this help message and exit.
+  -w, --workers N   Number of worker processes (Defaults to the number of CPUs)
+  -c, --catalog D   Catalog directory to add the light curves to (Defaults to CATALOG_DIR in settings)
+  --suffix S        Only ingest files ending with S (Defaults to INGEST_SUFFIX in settings)
+"""
+
+def find_files(directory, suffix=INGEST_SUFFIX):
+    """Sorted paths of all files below directory ending with suffix"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in files if f.endswith(suffix))
+    return sorted(paths)
+
+def ingest_files(args):
+    """
+    Parses a batch of light curve files and computes everything the catalog stores for them. The parsed
+    curves are resampled onto the grid together (see interpolation.interpolate_ragged) and the rest of
+    the pipeline runs on the resulting matrix.
+
+    Args:
+        args: tuple of list of file paths, number of grid points, precision
+    Returns:
+        List of tuples, one per file: file path, then either (values, spectrum, kernel, sketch, stats)
+        or an error message
+    """
+    filepaths, length, precision = args
+    loaded, results = [], []
+    for filepath in filepaths:
+        try:
+            loaded.append((filepath,) + load_folded(filepath))
+        except (IOError, ValueError) as e:
+            results.append((filepath, str(e)))
+    if not loaded:
+        return results
+
+    grid = np.arange(0.0, 1.0, (1.0 / length))
+    offsets = ragged_offsets([len(times) for filepath, times, values in loaded])
+    raw = interpolate_ragged(np.concatenate([times for filepath, times, values in loaded]),
+                             np.concatenate([values for filepath, times, values in loaded]), offsets, grid)
+    stats = np.column_stack([raw.mean(axis=1), raw.std(axis=1, ddof=1)])
+    constant = ~(stats[:, 1] > 0)
+    results.extend((filepath, "light curve is constant") for (filepath, t, v), c in zip(loaded, constant) if c)
+    raw, stats = raw[~constant], stats[~constant]
+    s_values = standardize_values(raw).astype(precision_dtype(precision))
+    spectra = spectra_matrix(s_values)
+    kernels = self_kernels(spectra, length=length)
+    sketches = sketch_values(s_values, SKETCH_COEFFS)
+    ingested = [filepath for (filepath, t, v), c in zip(loaded, constant) if not c]
+    results.extend((filepath, (s_values[i], spectra[i], kernels[i], sketches[i], stats[i]))
+                   for i, filepath in enumerate(ingested))
+    return results
+
+def ingest_dir(directory, catalog_dir=CATALOG_DIR, workers=None, suffix=INGEST_SUFFIX, length=TS_LENGTH,
+               precision=PRECISION, coarse_lengths=COARSE_LENGTHS, chunksize=INGEST_CHUNK):
+    """
+    Adds all light curve files below directory to the catalog in catalog_dir (creating it if there is none).
+
+    Args:
+        directory: directory to walk for light curve files
+        catalog_dir: catalog directory
+        workers: number of worker processes. Defaults to the number of CPUs
+        suffix: only files ending with suffix are ingested
+        length: number of grid points (must match an existing catalog)
+        precision: 'float64' or 'float32' for a new catalog; an existing catalog keeps its own
+        coarse_lengths: coarse levels of a new catalog; an existing catalog keeps its own
+        chunksize: files handed to a worker (and resampled together) at a time
+    Returns:
+        Tuple: the updated Catalog (None if no file could be ingested), files ingested per second,
+        list of (path, error message) tuples for the files that were skipped
+    """
+    paths = find_files(directory, suffix)
+    print("Ingesting %d files from %s" % (len(paths), directory))
+
+    start = time.time()
+    rows, errors = [], []
+    with Pool(workers) as pool:
+        batches = [(paths[i:i + chunksize], length, precision) for i in range(0, len(paths), chunksize)]
+        for results in pool.imap(ingest_files, batches):
+            for path, result in results:
+                if isinstance(result, str):
+                    errors.append((path, result))
+                else:
+                    rows.append((os.path.relpath(path, directory), result))
+    elapsed = time.time() - start
+    throughput = len(paths) / elapsed if elapsed > 0 else float('inf')
+    print("Parsed %d files in %.1fs (%.0f files/s), skipped %d" % (len(rows), elapsed, throughput, len(errors)))
+    if not rows:
+        return None, throughput, errors
+
+    ids = [fn for fn, result in rows]
+    values, spectra, kernels, sketches, stats = [np.array(col) for col in zip(*[result for fn, result in rows])]
+    new = Catalog(ids, np.arange(0.0, 1.0, (1.0 / length)), values, spectra, kernels, sketches, stats=stats)
+    if catalog_exists(catalog_dir):
+        catalog = append_catalog(load_catalog(catalog_dir), new)
+    else:
+        new.levels = {l: new.downsampled(l) for l in coarse_lengths if l < length}
+        catalog = new
+    save_catalog(catalog, catalog_dir)
+    record_ingested(ids, catalog_dir)
+    print("Catalog in %s now holds %d light curves (%.1fs total)" % (catalog_dir, len(catalog), time.time() - start))
+    return catalog, throughput, errors
+
+if __name__ == "__main__":
+    """Enables this file to be run independently of simsearch as it's own CLU."""
+    need_help = False
+    directory = None
+    workers = None
+    catalog_dir = CATALOG_DIR
+    suffix = INGEST_SUFFIX
+
+    # First, identify which flags were included
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        if arg.lower() in ['-h','--help', 'help']: need_help = True
+        elif arg.lower() in ['-w','--workers'] and i + 1 < len(args):
+            workers = int(args[i + 1])
+        elif arg.lower() in ['-c','--catalog'] and i + 1 < len(args):
+            catalog_dir = os.path.join(args[i + 1], '')
+        elif arg.lower() == '--suffix' and i + 1 < len(args):
+            suffix = args[i + 1]
+        elif os.path.isdir(arg) and (i == 0 or args[i - 1].lower() not in ['-c','--catalog']):
+            directory = arg
+
+    if need_help or directory is None:
+        print (HELP_MESSAGE)
+    else:
+        catalog, throughput, errors = ingest_dir(directory, catalog_dir, workers, suffix)
+        for path, error in errors:
+            print("Skipped %s: %s" % (path, error))
@@ -16,6 +16,7 @@ from os.path import dirname, abspath
 d = dirname(dirname(abspath(__file__)))
 sys.path.insert(0,d + '/timeseries')
 import arraytimeseries as ats
+from timeindex import RegularTimeIndex
 
 # Global variables
 
@@ -48,7 +49,7 @@ def tsmaker(mean, scale, jitter, length = 100):
         An array time series object.
 
     """
-    times = np.arange(0.0, 1.0, (1.0 / length))
+    times = RegularTimeIndex.unit_grid(length)
     values = norm.pdf(times, mean, scale) + jitter*np.random.randn(100)
     return ats.ArrayTimeSeries(times=times, values=values)
 
@@ -63,7 +64,7 @@ def random_ts(jitter,length = 100):
         An array time series object.
 
     """
-    times = np.arange(0.0, 1.0, (1.0 / length))
+    times = RegularTimeIndex.unit_grid(length)
     values = jitter*np.random.random(100)
     return ats.ArrayTimeSeries(times=times, values=values)
 
@@ -10,4 +10,31 @@ LIGHT_CURVES_DIR = "light_curves/"
 DB_DIR = "vp_dbs/"
 SAMPLE_DIR = "sample_data/"
 TEMP_DIR = "temp/"
+CATALOG_DIR = "catalog/"
 TS_LENGTH = 100 #Number of data points for generated time series
+LOG_FILE = "simsearch.log"
+
+# Query planner: relative cost of checking one index candidate (load text file + distance)
+# vs. one row of the vectorized brute-force scan. Tune from the timings in LOG_FILE.
+PLANNER_INDEX_COST = 1.0
+PLANNER_SCAN_COST = 0.02
+PLANNER_SCAN_OVERHEAD = 5.0 # fixed cost of loading the catalog and computing its kernel norms
+SCAN_BLOCK_SIZE = 256 # light curves per block in the brute-force scan
+SKETCH_COEFFS = 64 # leading DFT amplitudes kept in each light curve's lower bounding sketch
+DIST_CACHE_FILE = "dist_cache" # on-disk store of previously computed kernel distances
+DIST_CACHE_SIZE = 100000 # distances kept in the in-memory LRU in front of it
+RECALL_K = 10 # neighbours compared when reporting recall of the approximate search
+DIST_MATRIX_FILE = "distances.npy" # full N x N kernel distance matrix, written to CATALOG_DIR
+DIST_MATRIX_TILE = 128 # light curves per tile side when building it
+VP_STRATEGY = "kmedoids" # vantage point selection strategy: random, farthest, variance or kmedoids
+VP_SAMPLE_SIZE = 500 # light curves sampled to compare candidate vantage points
+VP_SEED = 0 # seed of that sample, so rebuilds pick the same vantage points
+COARSE_LENGTHS = [25, 50] # downsampled lengths stored in the catalog for coarse-to-fine search
+SHORTLIST_SIZE = 0 # candidates the coarse passes hand on to the full resolution ranking (0 scans at full resolution only)
+VP_COMPARE_LENGTH = None # length vantage point candidates are compared at (None for full resolution)
+SUBSEQ_K = 5 # matches reported by the subsequence search
+FFT_BACKEND = "auto" # numpy, scipy (multi-threaded), or auto to benchmark both on first use and keep the fastest
+FFT_WORKERS = -1 # threads per transform for the scipy backend (-1 uses all cores)
+PRECISION = "float64" # catalog precision; "float32" halves memory and bandwidth (see README for error bounds)
+INGEST_SUFFIX = ".dat_folded" # files picked up when ingesting a directory of external light curves
+INGEST_CHUNK = 64 # files handed to an ingestion worker (and resampled together) at a time
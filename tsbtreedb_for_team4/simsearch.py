@@ -6,18 +6,31 @@
 
 import sys
 import os
+import time
+import logging
 import numpy as np
 import random
 
-from crosscorr import standardize, kernel_dist
+from crosscorr import standardize, kernel_dist, kernel_dist_block, spectra_matrix, self_kernels
+from crosscorr import sketch_values, kernel_dist_lower_bound
 from makelcs import make_lc_files
-from genvpdbs import create_vpdbs
+from genvpdbs import create_vpdbs, vp_dists_path, load_indexed_ids
+from catalog import build_catalog, load_catalog, catalog_exists
+from approxindex import build_ivf, load_ivf, exact_search, recall_at_k
+from distcache import DistanceCache
+from subseq import subsequence_search
 import unbalancedDB
 import arraytimeseries as ats
+from timeindex import RegularTimeIndex
+from lightcurveio import load_folded
 
 # Global variables
 
-from settings import LIGHT_CURVES_DIR, DB_DIR, SAMPLE_DIR, TS_LENGTH
+from settings import LIGHT_CURVES_DIR, DB_DIR, SAMPLE_DIR, TS_LENGTH, LOG_FILE
+from settings import PLANNER_INDEX_COST, PLANNER_SCAN_COST, PLANNER_SCAN_OVERHEAD, SCAN_BLOCK_SIZE, RECALL_K
+from settings import SHORTLIST_SIZE, SUBSEQ_K
+
+logger = logging.getLogger(__name__)
 
 HELP_MESSAGE = \
 """
@@ -31,6 +44,13 @@ Optional flags:
   -p, --plot        Plot submitted light curve with most similar curve in database
   -r, --rebuild     Recreates light curve files vantage point indexes (Run automatically on first use)
   -d, --demo        Loads a random time series from sample data folder and runs similarity search
+  -a, --approx      Approximate search over the IVF index
+  --recall          With --approx, also run the exact search and report recall@k against it (slower)
+  --probe N         Number of inverted lists the approximate search visits (Defaults to 1; more is slower but more exact)
+  --shortlist N     Approximate catalog scans: the low resolution passes keep N candidates for the full resolution
+                    ranking (Defaults to SHORTLIST_SIZE in settings; 0 scans at full resolution only, exactly)
+  -s, --subseq      Treat input as a short query and find the light curves containing the most similar stretch
+  -k N              Number of subsequence matches to report (Defaults to SUBSEQ_K in settings)
 
 """
 USAGE = "Usage: ./simsearch input_ts.txt [optional flags]"
@@ -54,31 +74,58 @@ def load_ts(ts_fname):
     else:
         raise ValueError("'%s' does not appear to be a time series file" % ts_fname)
 
-def load_external_ts(filepath):
+def catalog_ts(catalog, ts_fname):
+    """
+    Light curve of a catalog search result: generated curves are loaded from their file, ingested
+    external curves (see ingest.py) come from the catalog's standardized values.
+    """
+    if ts_fname.startswith("ts-"):
+        return load_ts(ts_fname)
+    row = catalog.rows([ts_fname])[0]
+    return ats.ArrayTimeSeries._from_validated(catalog.index, np.array(catalog.values[row], dtype=float))
+
+def load_clean_ts(filepath):
+    """
+    Loads space delimited time series text file from disk as an ArrayTimeSeries.
+    Notes:
+        - Only considers the first two columns of the text file (other columns are not even parsed)
+        - First column is presumed to be times and second column is presumed to be light curve values.
+        - Rows with duplicate time values are dropped and the rest sorted by time.
+        - Files are parsed in chunks, keeping only the two columns (see lightcurveio.load_folded)
+    """
+    try:
+        times, values = load_folded(filepath)
+    except(IOError):
+        raise IOError("Unable to load np array %s" % filepath)
+    return ats.ArrayTimeSeries._from_validated(times, values)
+
+def load_external_ts(filepath, length=TS_LENGTH):
     """
     Loads space delimited time series text file from disk to be searched on.
 
     Args:
         filepath: path to time series file
+        length: number of points to interpolate to. Defaults to TS_LENGTH
     Returns:
-        A 100 point interpolated ArrayTimeSeries object for times between 0 and 1.
+        A length point interpolated ArrayTimeSeries object for times between 0 and 1.
     Notes:
         - Only considers the first two columns of the text file (other columns are discarded)
         - Only evaluates time values between 0 and 1
         - First column is presumed to be times and second column is presumed to be light curve values.
     """
-    data = load_nparray(filepath)
-    data = data[:,:2] # truncate to first 2 cols
-
-    # Remove rows with duplicate time values (if they exist) and resorts to ensure ts in ascending order
-    _, indices = np.unique(data[:, 0], return_index=True)
-    data = data[indices, :]
-
-    times, values = data.T
-    full_ts = ats.ArrayTimeSeries(times=times,values=values)
-    interpolated_ats = full_ts.interpolate(np.arange(0.0, 1.0, (1.0 /TS_LENGTH)))
+    full_ts = load_clean_ts(filepath)
+    interpolated_ats = full_ts.interpolate(RegularTimeIndex.unit_grid(length))
     return interpolated_ats
 
+def load_subsequence(filepath, step):
+    """
+    Loads a short query curve for subsequence search, interpolated to the catalog's time step
+    over its own time range (rather than stretched over 0 to 1).
+    """
+    full_ts = load_clean_ts(filepath)
+    times = full_ts.times()
+    return full_ts.interpolate(np.arange(times[0], times[-1] + step / 2, step))
+
 def load_vp_lcs():
     """
     Based on names of vantage point db files loads and returns time series curves
@@ -92,23 +139,33 @@ def load_vp_lcs():
     #print("Loaded %d vp files" % len(vps_dict))
     return vp_dict
 
-def find_closest_vp(vps_dict, ts):
+def cached_dist(s_ts, ts_id, s_candidate, candidate_id, cache=None):
+    """Kernel distance between two standardized time series, looked up in the DistanceCache first when given"""
+    if cache is None:
+        return kernel_dist(s_candidate, s_ts)
+    return cache.kernel_dist(candidate_id, s_candidate, ts_id, s_ts)
+
+def find_closest_vp(vps_dict, ts, cache=None, ts_id='query'):
     """
     Calculates distances from ts to all vantage points.
     Returns tuple with filename of closest vantage point and distance to that vantage point.
     """
     s_ts = standardize(ts)
-    vp_distances = sorted([(kernel_dist(s_ts, standardize(vps_dict[vp])),vp) for vp in vps_dict])
+    vp_distances = sorted([(cached_dist(s_ts, ts_id, standardize(vps_dict[vp]), vp, cache),vp) for vp in vps_dict])
     dist_to_vp, vp_fn = vp_distances[0]
     return (vp_fn,dist_to_vp)
 
-def search_vpdb(vp_t,ts):
+def search_vpdb(vp_t,ts,catalog=None,cache=None,ts_id='query'):
     """
     Searches for most similar light curve based on pre-computed distances in vpdb
 
     Args:
         vp_t: tuple containing vantage point filename and distance of time series to vantage point
         ts: time series to search on.
+        catalog: optional Catalog. When given, candidates are visited in order of their sketch
+            lower bound and the search stops as soon as no remaining candidate can beat the best match.
+        cache: optional DistanceCache checked before computing each candidate distance
+        ts_id: name of ts in the cache keys (e.g. its file path)
     Returns:
         Tuple: Distance to closest light curve, filename of closest light curve, ats object for closest light curve
 
@@ -129,9 +186,14 @@ def search_vpdb(vp_t,ts):
     closest_ts_fn = vp_fn
     closest_ts = load_ts(vp_fn)
 
-    for d_to_vp,ts_fn in lc_candidates:
+    if catalog is not None:
+        lc_candidates = lower_bound_candidates([ts_fn for d_to_vp,ts_fn in lc_candidates], s_ts, catalog)
+
+    for d_lower,ts_fn in lc_candidates:
+        if catalog is not None and d_lower >= min_dist:
+            break
         candidate_ts = load_ts(ts_fn)
-        dist_to_ts = kernel_dist(standardize(candidate_ts),s_ts)
+        dist_to_ts = cached_dist(s_ts, ts_id, standardize(candidate_ts), ts_fn, cache)
         if (dist_to_ts < min_dist):
             min_dist = dist_to_ts
             closest_ts_fn = ts_fn
@@ -139,6 +201,107 @@ def search_vpdb(vp_t,ts):
 
     return(min_dist,closest_ts_fn,closest_ts)
 
+def lower_bound_candidates(ts_fns, s_ts, catalog, mult=1):
+    """
+    Computes sketch based lower bounds on the kernel distance from standardized s_ts to each candidate.
+
+    Returns:
+        List of (distance lower bound, filename) tuples sorted by lower bound.
+        Candidates missing from the catalog get a lower bound of 0, so they are always checked.
+    """
+    rows = catalog.rows(ts_fns)
+    known = [i for i, row in enumerate(rows) if row is not None]
+    known_rows = [rows[i] for i in known]
+
+    q_sketch = sketch_values(s_ts.values_view(), catalog.sketches.shape[1] - 2)[0]
+    q_kernel = self_kernels(spectra_matrix(s_ts.values_view()), mult, len(s_ts))[0]
+    lower_bounds = np.zeros(len(ts_fns))
+    lower_bounds[known] = kernel_dist_lower_bound(q_sketch, q_kernel, catalog.sketches[known_rows],
+                                                  catalog.kernels(mult)[known_rows], len(s_ts), mult)
+    return sorted(zip(lower_bounds, ts_fns))
+
+def estimate_candidates(vp_t):
+    """
+    Estimates how many light curves search_vpdb will have to load and check for vantage point tuple vp_t.
+    Uses the sorted distances saved next to the vp db; falls back on chopping the db itself.
+    """
+    vp_fn, dist_to_vp = vp_t
+    dists_path = vp_dists_path(vp_fn)
+    if os.path.isfile(dists_path):
+        return int(np.searchsorted(np.load(dists_path), 2 * dist_to_vp, side='right'))
+
+    db = unbalancedDB.connect(DB_DIR + vp_fn[:-4] + ".dbdb")
+    n_candidates = len(db.chop(2 * dist_to_vp))
+    db.close()
+    return n_candidates
+
+def index_covers(catalog):
+    """
+    Whether the vantage point dbs index every light curve of the catalog. Ingested light curves (see
+    ingest.py) are only in the catalog, so search_vpdb could never return them.
+    """
+    indexed = load_indexed_ids()
+    return indexed is not None and indexed.issuperset(catalog.ids)
+
+def plan_search(n_candidates, n_catalog):
+    """
+    Cost-based choice between the two search paths:
+        'index': load and check each vantage point candidate (search_vpdb)
+        'scan':  vectorized brute-force scan over the catalog spectra (brute_force_search)
+    Every decision is logged so the PLANNER_* cost constants in settings can be tuned.
+    """
+    index_cost = PLANNER_INDEX_COST * n_candidates
+    scan_cost = PLANNER_SCAN_OVERHEAD + PLANNER_SCAN_COST * n_catalog
+    path = 'scan' if scan_cost < index_cost else 'index'
+    logger.info("plan candidates=%d catalog=%d index_cost=%.2f scan_cost=%.2f path=%s",
+                n_candidates, n_catalog, index_cost, scan_cost, path)
+    return path
+
+def brute_force_search(ts, catalog, mult=1, block_size=SCAN_BLOCK_SIZE):
+    """
+    Exact search for the most similar light curve by scanning the whole catalog in blocks
+
+    Args:
+        ts: time series to search on (same time grid as the catalog).
+        catalog: Catalog of standardized light curves and their spectra
+        mult: multiplier factor of the kernel distance. Defaults to 1.
+        block_size: number of light curves compared per vectorized block
+    Returns:
+        Tuple: Distance to closest light curve, filename of closest light curve, ats object for closest light curve
+    """
+    q_spectrum = spectra_matrix(standardize(ts).values_view().astype(catalog.values.dtype))
+    q_kernel = self_kernels(q_spectrum, mult, len(ts))[0]
+
+    min_dist = np.inf
+    closest_idx = None
+    for start, spectra, kernels in catalog.blocks(block_size, mult):
+        dists = kernel_dist_block(q_spectrum[0], q_kernel, spectra, kernels, mult, len(ts))
+        i = np.argmin(dists)
+        if dists[i] < min_dist:
+            min_dist = dists[i]
+            closest_idx = start + i
+
+    closest_ts_fn = catalog.ids[closest_idx]
+    return(min_dist,closest_ts_fn,catalog_ts(catalog, closest_ts_fn))
+
+def multires_search(ts, catalog, shortlist=SHORTLIST_SIZE, mult=1):
+    """
+    Coarse-to-fine search for the most similar light curve: low resolution passes over the catalog's
+    downsampled levels pick a shortlist of candidates, which are then ranked at full resolution.
+
+    Args:
+        ts: time series to search on (same time grid as the catalog).
+        catalog: Catalog with downsampled levels (see catalog.build_catalog)
+        shortlist: number of candidates ranked at full resolution
+        mult: multiplier factor of the kernel distance. Defaults to 1.
+    Returns:
+        Tuple: Distance to closest light curve, filename of closest light curve, ats object for closest light curve
+    """
+    rows, dists = catalog.shortlist_distances(standardize(ts).values_view(), shortlist, mult)
+    i = np.argmin(dists)
+    closest_ts_fn = catalog.ids[rows[i]]
+    return(dists[i],closest_ts_fn,catalog_ts(catalog, closest_ts_fn))
+
 def need_to_rebuild(LIGHT_CURVES_DIR,DB_DIR):
     """Helper to determine whether required lc files and database files already exist or need to be generated"""
 
@@ -182,34 +345,130 @@ def plot_two_ts(ts1,ts1_name,ts2,ts2_name,stand=True):
 def rebuild_lcs_dbs(LIGHT_CURVES_DIR):
     """Calls functions to regenerate light curves and rebuild vp indexes"""
     print("\nRebuilding simulated light curves and vantage point index files....\n(This may take up to 30 seconds)")
+    # build_catalog keeps the ingested light curves; the vp dbs cover only the simulated ones
     make_lc_files(1000, LIGHT_CURVES_DIR)
     create_vpdbs(20, LIGHT_CURVES_DIR)
+    build_ivf(build_catalog(LIGHT_CURVES_DIR))
     print("Indexes rebuilt.\n")
 
-def run_demo(plot=False):
+def run_demo(plot=False,approx=False,probe=1,shortlist=SHORTLIST_SIZE,recall=False):
     """Loads a random time series from sample data folder and runs similarity search"""
     demo_ts_fn = random.choice(os.listdir(SAMPLE_DIR))
-    sim_search(SAMPLE_DIR + demo_ts_fn,plot)
+    sim_search(SAMPLE_DIR + demo_ts_fn,plot,approx,probe,shortlist,recall)
+
+def approx_search(ts, catalog, probe=1, k=RECALL_K, recall=False):
+    """
+    Approximate search over the IVF index (built on first use, and rebuilt when the catalog changed).
+    With recall, the exact search runs too and recall@k against it is printed (see approxindex.py for
+    a recall report over many queries).
+
+    Returns:
+        Tuple: Distance to closest light curve, filename of closest light curve, ats object for closest light curve
+    """
+    ivf = load_ivf(catalog=catalog)
+    if ivf is None:
+        ivf = build_ivf(catalog)
+    s_values = standardize(ts).values_view()
+
+    start = time.time()
+    approx = ivf.search(s_values, catalog, k, probe)
+    approx_time = time.time() - start
+    if recall:
+        start = time.time()
+        exact = exact_search(s_values, catalog, k)
+        exact_time = time.time() - start
+        recall = recall_at_k(approx, exact)
+        logger.info("approx probe=%d recall@%d=%.3f elapsed=%.5fs exact_elapsed=%.5fs",
+                    probe, k, recall, approx_time, exact_time)
+        print("Approximate search (probe %d of %d lists): recall@%d %.2f, %.2fms vs %.2fms exact" %
+              (probe, len(ivf), k, recall, 1000 * approx_time, 1000 * exact_time))
+    else:
+        logger.info("approx probe=%d elapsed=%.5fs", probe, approx_time)
+        print("Approximate search (probe %d of %d lists): %.2fms" % (probe, len(ivf), 1000 * approx_time))
 
-def sim_search(input_fpath,plot=False):
+    min_dist, closest_ts_fn = approx[0]
+    return(min_dist,closest_ts_fn,catalog_ts(catalog, closest_ts_fn))
+
+def subseq_search(input_fpath, k=SUBSEQ_K):
+    """
+    Executes subsequence search: slides the submitted (short) curve over every catalog light curve
+    and prints the k best matches with the phase at which each starts.
+    """
+    if not catalog_exists():
+        build_catalog(LIGHT_CURVES_DIR)
+    catalog = load_catalog()
+
+    print("Loading %s..." % input_fpath,end="")
+    query = load_subsequence(input_fpath, catalog.times[1] - catalog.times[0])
+    print("Done. (%d points)" % len(query))
+
+    start = time.time()
+    matches = subsequence_search(query.values_view(), catalog, k)
+    logger.info("subsequence search points=%d elapsed=%.5fs", len(query), time.time() - start)
+
+    print("\n============================ Results ============================")
+    for ts_fn, offset, dist in matches:
+        print("%s at phase %.3f: distance %.5f" % (ts_fn, catalog.times[offset], dist))
+    return matches
+
+def sim_search(input_fpath,plot=False,approx=False,probe=1,shortlist=SHORTLIST_SIZE,recall=False):
     """Executes similarity search on submitted time series files"""
+    if not catalog_exists():
+        build_catalog(LIGHT_CURVES_DIR)
+    catalog = load_catalog()
+
     print("Loading %s..." % input_fpath,end="")
-    input_ts = load_external_ts(input_fpath)
+    input_ts = load_external_ts(input_fpath, len(catalog.times))
     print("Done.")
-    closest_vp = find_closest_vp(load_vp_lcs(), input_ts)
 
-    min_dist,closest_ts_fn,closest_ts = search_vpdb(closest_vp,input_ts)
+    if approx:
+        path = 'ivf'
+        min_dist,closest_ts_fn,closest_ts = approx_search(input_ts, catalog, probe, recall=recall)
+    else:
+        cache = DistanceCache()
+        if index_covers(catalog):
+            closest_vp = find_closest_vp(load_vp_lcs(), input_ts, cache, input_fpath)
+            path = plan_search(estimate_candidates(closest_vp), len(catalog))
+        else:
+            logger.info("plan catalog=%d has light curves the vp dbs do not index path=scan", len(catalog))
+            path = 'scan'
+
+        start = time.time()
+        if path == 'scan' and shortlist and catalog.levels:
+            path = 'multires'
+            min_dist,closest_ts_fn,closest_ts = multires_search(input_ts, catalog, shortlist)
+        elif path == 'scan':
+            min_dist,closest_ts_fn,closest_ts = brute_force_search(input_ts, catalog)
+        else:
+            min_dist,closest_ts_fn,closest_ts = search_vpdb(closest_vp,input_ts,catalog,cache,input_fpath)
+        logger.info("search path=%s elapsed=%.5fs", path, time.time() - start)
+        logger.info("distance cache %s", cache.stats())
+        cache.close()
     print("\n============================ Results ============================")
+    if path == 'multires':
+        print("(approximate: coarse-to-fine scan with a shortlist of %d; pass --shortlist 0 for an exact scan)" % shortlist)
     print("%s is the closest light curve to %s" % (closest_ts_fn, input_fpath))
     print("Distance from %s to %s: %.5f" % (input_fpath, closest_ts_fn, min_dist))
     if plot:
         plot_two_ts(input_ts,input_fpath,closest_ts,closest_ts_fn)
 
+def parse_count(flag, value, minimum=0):
+    """Helper to read the number given after a command line flag; prints an error and returns None if it isn't one"""
+    try:
+        count = int(value)
+    except ValueError:
+        count = None
+    if count is None or count < minimum:
+        print("Error: %s needs a whole number of at least %d, not %r" % (flag, minimum, value))
+        return None
+    return count
+
 if __name__ == "__main__":
     """
     Main program loop. Determines which flags were submitted, confirms that lc files and db files
     exist (Recreates them if they don't) before kicking off similarity search.
     """
+    logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
 
     # Default conditions
     rebuild = need_to_rebuild(LIGHT_CURVES_DIR,DB_DIR)
@@ -217,6 +476,12 @@ if __name__ == "__main__":
     input_fpath = False
     plot = False
     demo = False
+    approx = False
+    recall = False
+    probe = 1
+    shortlist = SHORTLIST_SIZE
+    subseq = False
+    k = SUBSEQ_K
 
     while(True):
         if len(sys.argv) <= 1:
@@ -225,7 +490,7 @@ if __name__ == "__main__":
             break
 
         # First, identify which flags were included
-        for arg in sys.argv[1:]:
+        for i, arg in enumerate(sys.argv[1:]):
             if arg.lower() in ['-h','--help', 'help']: need_help = True
 
             elif '.txt' in arg.lower() or '.dat_folded' in arg.lower():
@@ -234,20 +499,35 @@ if __name__ == "__main__":
             elif arg.lower() in ['-r','--rebuild']: rebuild = True
             elif arg.lower() in ['-d','--demo']: demo = True
             elif arg.lower() in ['-p','--plot']: plot = True
+            elif arg.lower() in ['-a','--approx']: approx = True
+            elif arg.lower() == '--recall': recall = True
+            elif arg.lower() == '--probe' and i + 2 < len(sys.argv):
+                probe = parse_count(arg, sys.argv[i + 2], 1)
+            elif arg.lower() == '--shortlist' and i + 2 < len(sys.argv):
+                shortlist = parse_count(arg, sys.argv[i + 2])
+            elif arg.lower() in ['-s','--subseq']: subseq = True
+            elif arg.lower() == '-k' and i + 2 < len(sys.argv):
+                k = parse_count(arg, sys.argv[i + 2], 1)
 
         # Execute selected options
-        if need_help:
+        if None in (probe, shortlist, k):
+            print(USAGE)
+            break
+        elif need_help:
             print (HELP_MESSAGE)
             break
         elif rebuild:
             rebuild_lcs_dbs(LIGHT_CURVES_DIR)
 
         if demo:
-            run_demo(plot)
+            run_demo(plot,approx,probe,shortlist,recall)
             break
 
+        elif(input_fpath is not False and subseq):
+            subseq_search(input_fpath,k)
+            break
         elif(input_fpath is not False):
-            sim_search(input_fpath,plot)
+            sim_search(input_fpath,plot,approx,probe,shortlist,recall)
             break
         else:
             print("Error: no compatible time series or light curve file provided")
@@ -0,0 +1,95 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import numpy as np
+
+import crosscorr # sets up the FFT backend
+import fftbackend
+from settings import SCAN_BLOCK_SIZE, SUBSEQ_K
+
+def sliding_dot_products(query, series):
+    """
+    Dot product of the query with every length-m window of each row of series, computed with one
+    FFT convolution per row (O(n log n)) instead of one dot product per offset (O(n*m)).
+
+    Args:
+        query: 1-d np.array of m values
+        series: 2-d np.array with one series of n >= m values per row
+    Returns:
+        (N, n-m+1) np.array; entry [r, i] is sum_j query[j] * series[r, i+j]
+    """
+    fft = fftbackend.get_backend()
+    m, n = len(query), series.shape[-1]
+    # Zero padding to at least n+m-1 points turns the circular convolution into a linear one;
+    # any fast length beyond that is fine
+    size = fft.next_fast_len(n + m - 1)
+    convolution = fft.irfft(fft.rfft(query[::-1], size) * fft.rfft(series, size, axis=-1), size, axis=-1)
+    return convolution[:, m-1:n]
+
+def moving_mean_std(series, m):
+    """Mean and (population) standard deviation of every length-m window of each row of series, from running sums"""
+    padded = np.zeros((series.shape[0], series.shape[1] + 1))
+    padded[:, 1:] = np.cumsum(series, axis=-1)
+    squares = np.zeros_like(padded)
+    squares[:, 1:] = np.cumsum(series**2, axis=-1)
+    means = (padded[:, m:] - padded[:, :-m]) / m
+    variances = (squares[:, m:] - squares[:, :-m]) / m - means**2
+    return means, np.sqrt(np.maximum(variances, 0))
+
+def distance_profiles(query, series, wrap=True):
+    """
+    MASS distance profiles: z-normalized euclidean distance between the query and every window of each series.
+
+    Args:
+        query: 1-d np.array of m values (must not be constant)
+        series: 1-d or 2-d np.array with one series of n >= m values per row
+        wrap: treat each series as periodic (phase folded light curves), so windows may run past
+            the end and continue at the start. Gives n offsets per series instead of n-m+1.
+    Returns:
+        2-d np.array with one distance per (series, offset). Constant windows get a distance of inf.
+    Raises:
+        ValueError: if the query is longer than the series or constant
+    """
+    query = np.asarray(query, dtype=float)
+    series = np.atleast_2d(np.asarray(series, dtype=float))
+    m, n = len(query), series.shape[-1]
+    if m > n:
+        raise ValueError("query (%d points) must not be longer than the series searched (%d points)" % (m, n))
+    if query.std() == 0:
+        raise ValueError("query must not be constant")
+    if wrap:
+        series = np.hstack([series, series[:, :m-1]])
+
+    dots = sliding_dot_products(query, series)
+    means, stds = moving_mean_std(series, m)
+    corr = (dots - m * query.mean() * means) / (m * query.std() * np.where(stds > 0, stds, 1))
+    dists = np.sqrt(np.maximum(2 * m * (1 - corr), 0))
+    return np.where(stds > 0, dists, np.inf)
+
+def subsequence_search(query, catalog, k=SUBSEQ_K, wrap=True, block_size=SCAN_BLOCK_SIZE):
+    """
+    Finds the k light curves of the catalog containing the best matches of a short query.
+
+    Args:
+        query: 1-d np.array of values, sampled on the catalog's time step
+        catalog: Catalog to search
+        k: number of results
+        wrap: let matches wrap around the end of the (phase folded) light curves
+        block_size: number of light curves searched per vectorized block
+    Returns:
+        List of up to k (light curve filename, offset, distance) tuples, closest first.
+        offset is the index of the first point of the best window of that light curve.
+    """
+    offsets = np.empty(len(catalog), dtype=int)
+    dists = np.empty(len(catalog))
+    for start in range(0, len(catalog), block_size):
+        profiles = distance_profiles(query, catalog.values[start:start + block_size], wrap)
+        best = np.argmin(profiles, axis=1)
+        offsets[start:start + block_size] = best
+        dists[start:start + block_size] = profiles[np.arange(len(profiles)), best]
+
+    top = np.argsort(dists, kind='mergesort')[:k]
+    return [(catalog.ids[i], int(offsets[i]), dists[i]) for i in top]
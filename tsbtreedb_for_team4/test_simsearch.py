@@ -8,6 +8,7 @@ import sys
 import os
 import numpy as np
 import random
+import pytest
 
 import crosscorr
 import makelcs
@@ -102,4 +103,390 @@ def test_ccorr():
     assert(kernel_corr(t1,t1) == 1)
     assert(kernel_dist(t1,t1) == 0)
 
+    # curves on different times are aligned first
+    from crosscorr import standardize_aligned
+    from arraytimeseries import ArrayTimeSeries
+    irregular = ArrayTimeSeries(times=np.sort(np.random.rand(80)), values=np.random.randn(80))
+    a, b = standardize_aligned(t1, irregular)
+    assert len(a) == len(b) == 180 and a.time_index is b.time_index
+    assert np.isfinite(kernel_dist(a, b))
+    with pytest.raises(ValueError):
+        standardize_aligned(t1, irregular, how='inner')
 
+
+def test_kernel_dist_block():
+    from makelcs import tsmaker
+    from crosscorr import kernel_dist, standardize, spectra_matrix, self_kernels, kernel_dist_block
+    query = standardize(tsmaker(0.5, 0.1, 0.5))
+    others = [standardize(tsmaker(0.5, 0.2, random.uniform(0,1))) for i in range(5)] + [query]
+    spectra = spectra_matrix(np.array([ts.values() for ts in others]))
+    q_spectrum = spectra_matrix(query.values())[0]
+    for mult in [1, 5]:
+        dists = kernel_dist_block(q_spectrum, self_kernels(spectra[-1:], mult)[0], spectra, self_kernels(spectra, mult), mult)
+        expected = [kernel_dist(ts, query, mult) for ts in others]
+        assert np.allclose(dists, expected)
+        assert dists[-1] == 0
+
+def test_plan_search():
+    assert simsearch.plan_search(3, 1000) == 'index'
+    assert simsearch.plan_search(900, 1000) == 'scan'
+
+def test_parse_count():
+    assert simsearch.parse_count('--shortlist', '0') == 0
+    assert simsearch.parse_count('--probe', '3', 1) == 3
+    assert simsearch.parse_count('--probe', 'abc', 1) is None
+    assert simsearch.parse_count('-k', '0', 1) is None
+
+def test_brute_force_search(monkeypatch):
+    from catalog import build_catalog, load_catalog
+    lc_dir = TEMP_DIR + LIGHT_CURVES_DIR
+    catalog_dir = TEMP_DIR + "catalog/"
+    makelcs.make_lc_files(20,lc_dir)
+    build_catalog(lc_dir, catalog_dir)
+    catalog = load_catalog(catalog_dir)
+    assert len(catalog) == 20
+
+    # the fingerprint is saved with the catalog, not recomputed from the values on load
+    from catalog import Catalog
+    assert catalog._fingerprint is not None
+    assert catalog.fingerprint() == Catalog(catalog.ids, catalog.times, np.array(catalog.values)).fingerprint()
+    # and is hashed block by block, which does not change it
+    import catalog as catalog_module
+    monkeypatch.setattr(catalog_module, "SCAN_BLOCK_SIZE", 7)
+    assert catalog.fingerprint() == Catalog(catalog.ids, catalog.times, np.array(catalog.values)).fingerprint()
+
+    monkeypatch.setattr(simsearch, "LIGHT_CURVES_DIR", lc_dir)
+    ts = simsearch.load_ts("ts-7.txt")
+    min_dist, closest_ts_fn, closest_ts = simsearch.brute_force_search(ts, catalog, block_size=6)
+    assert closest_ts_fn == "ts-7.txt"
+    assert min_dist == 0
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_kernel_dist_lower_bound():
+    from makelcs import tsmaker, random_ts
+    from crosscorr import standardize_values, spectra_matrix, self_kernels, kernel_dist_block
+    from crosscorr import sketch_values, kernel_dist_lower_bound
+    curves = [tsmaker(0.5, random.uniform(0.05,0.5), random.uniform(0,1)) for i in range(10)]
+    curves += [random_ts(random.uniform(0,10)) for i in range(10)]
+    values = standardize_values(np.array([ts.values() for ts in curves]))
+    spectra = spectra_matrix(values)
+    for n_coeffs in [4, 16, 64]:
+        sketches = sketch_values(values, n_coeffs)
+        for mult in [1, 5]:
+            kernels = self_kernels(spectra, mult)
+            dists = kernel_dist_block(spectra[0], kernels[0], spectra, kernels, mult)
+            bounds = kernel_dist_lower_bound(sketches[0], kernels[0], sketches, kernels, values.shape[1], mult)
+            assert np.all(bounds <= dists + 1e-9)
+
+def test_approx_search():
+    from catalog import Catalog
+    from crosscorr import standardize_values
+    from makelcs import make_n_ts
+    from approxindex import IVFIndex, kmeans, ivf_features, exact_search, recall_at_k
+    curves = make_n_ts(60)
+    values = standardize_values(np.array([ts.values() for ts in curves]))
+    catalog = Catalog(["ts-%d.txt" % i for i in range(60)], curves[0].times(), values)
+    ivf = IVFIndex(*kmeans(ivf_features(values), 6))
+    assert sum(len(l) for l in ivf.lists) == 60
+
+    query = values[5]
+    exact = exact_search(query, catalog, k=5)
+    assert exact[0] == (0, "ts-5.txt")
+    assert recall_at_k(ivf.search(query, catalog, k=5, probe=6), exact) == 1
+    approx = ivf.search(query, catalog, k=5, probe=1)
+    assert approx[0] == (0, "ts-5.txt")
+    assert 0 < recall_at_k(approx, exact) <= 1
+
+    # a saved index only loads for the catalog it was built for
+    from approxindex import build_ivf, load_ivf
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    build_ivf(catalog, 6, TEMP_DIR)
+    assert load_ivf(TEMP_DIR, catalog) is not None
+    rebuilt = Catalog(catalog.ids, catalog.times, values[::-1])
+    assert load_ivf(TEMP_DIR, rebuilt) is None
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_distance_cache():
+    from makelcs import tsmaker
+    from crosscorr import kernel_dist, standardize
+    from distcache import DistanceCache
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    t1 = standardize(tsmaker(0.5, 0.1, 0.5))
+    t2 = standardize(tsmaker(0.5, 0.2, 0.5))
+    t3 = standardize(tsmaker(0.5, 0.3, 0.5))
+
+    cache = DistanceCache(TEMP_DIR + "dist_cache", capacity=1)
+    assert cache.kernel_dist("a", t1, "b", t2) == kernel_dist(t1, t2)
+    assert cache.kernel_dist("b", t2, "a", t1) == kernel_dist(t1, t2) # symmetric key
+    assert cache.kernel_dist("a", t1, "b", t3) == kernel_dist(t1, t3) # same ids, new content
+    assert (cache.hits, cache.disk_hits, cache.misses) == (1, 0, 2)
+    cache.kernel_dist("a", t1, "b", t2) # evicted from the LRU, still on disk
+    assert cache.disk_hits == 1
+    cache.close()
+
+    cache = DistanceCache(TEMP_DIR + "dist_cache")
+    assert cache.kernel_dist("a", t1, "b", t3) == kernel_dist(t1, t3)
+    assert cache.hit_rate() == 1
+    cache.close()
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_distance_matrix():
+    from catalog import build_catalog
+    from distmatrix import build_distance_matrix, progress_path
+    lc_dir = TEMP_DIR + LIGHT_CURVES_DIR
+    catalog_dir = TEMP_DIR + "catalog/"
+    makelcs.make_lc_files(20,lc_dir)
+    catalog = build_catalog(lc_dir, catalog_dir)
+    matrix = np.array(build_distance_matrix(catalog_dir, tile=7, workers=2))
+    assert matrix.shape == (20, 20)
+    assert np.allclose(matrix, matrix.T) and np.all(np.diag(matrix) == 0)
+    expected = catalog.distances(catalog.values[4])
+    assert np.allclose(matrix[4], expected, atol=1e-6)
+
+    # Forget the last finished tile and wipe it; a rerun only recomputes that tile
+    matrix_path = catalog_dir + "distances.npy"
+    with open(progress_path(matrix_path)) as f:
+        lines = f.readlines()
+    i, j = [int(x) for x in lines[-1].split()]
+    with open(progress_path(matrix_path), 'w') as f:
+        f.writelines(lines[:-1])
+    stored = np.load(matrix_path, mmap_mode='r+')
+    stored[i:i+7, j:j+7] = -1
+    stored.flush()
+    del stored
+    resumed = np.array(build_distance_matrix(catalog_dir, tile=7, workers=1))
+    assert np.array_equal(resumed, matrix)
+
+    # Another tile size, multiplier or catalog starts over instead of reusing finished tiles
+    stored = np.load(matrix_path, mmap_mode='r+')
+    stored[7:, 7:] = -1
+    stored.flush()
+    del stored
+    assert np.array_equal(np.array(build_distance_matrix(catalog_dir, tile=14, workers=1)), matrix)
+    doubled = np.array(build_distance_matrix(catalog_dir, tile=14, workers=1, mult=2))
+    assert np.allclose(doubled[4], catalog.distances(catalog.values[4], mult=2), atol=1e-6)
+    assert not np.allclose(doubled, matrix)
+    makelcs.make_lc_files(20,lc_dir)
+    catalog = build_catalog(lc_dir, catalog_dir)
+    rebuilt = np.array(build_distance_matrix(catalog_dir, tile=14, workers=1, mult=2))
+    assert np.allclose(rebuilt[4], catalog.distances(catalog.values[4], mult=2), atol=1e-6)
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_vantage_point_selection():
+    from scipy.stats import norm
+    from vpselect import select_vantage_points, compare_strategies, pruning_ratio, VP_STRATEGIES
+    # Three well separated groups of light curves with little noise (the distance is shift invariant,
+    # so the groups differ in peak width)
+    rng = np.random.RandomState(0)
+    times = np.arange(0.0, 1.0, 0.01)
+    values = np.array([norm.pdf(times, 0.5, [0.02, 0.06, 0.2][i % 3]) + 0.2 * rng.randn(100) for i in range(90)])
+    ids = ["ts-%d.txt" % i for i in range(90)]
+
+    for strategy in VP_STRATEGIES:
+        vps, ratio = select_vantage_points(ids, values, 3, strategy, sample_size=60)
+        assert len(set(vps)) == 3 and set(vps) <= set(ids)
+        assert (vps, ratio) == select_vantage_points(ids, values, 3, strategy, sample_size=60)
+        assert 0 <= ratio <= 1
+
+    # One vantage point per group
+    vps, ratio = select_vantage_points(ids, values, 3, 'kmedoids', sample_size=60)
+    assert sorted(int(vp[3:-4]) % 3 for vp in vps) == [0, 1, 2]
+    ratios = compare_strategies(ids, values, 3, sample_size=60)
+    assert ratios['kmedoids'] == ratio and ratios['kmedoids'] >= ratios['random']
+
+    # The index picks its vantage points at full resolution by default
+    timeseries_dict = {k: genvpdbs.ats.ArrayTimeSeries(times, v) for k, v in zip(ids, values)}
+    assert genvpdbs.pick_vantage_points(timeseries_dict, 3) == select_vantage_points(sorted(ids), values[np.argsort(ids)], 3)
+
+    # Queries 1 and 2 are 1 away from their closest vantage point, so they check the 3 curves within 2 of it
+    dists = np.array([[0, 1, 3, 2], [1, 0, 2, 3], [3, 2, 0, 1], [2, 3, 1, 0]])
+    assert pruning_ratio(dists[[0, 3]], [0, 3]) == 0.25
+
+def test_multires_search(monkeypatch):
+    from catalog import build_catalog, load_catalog
+    lc_dir = TEMP_DIR + LIGHT_CURVES_DIR
+    catalog_dir = TEMP_DIR + "catalog/"
+    makelcs.make_lc_files(40,lc_dir)
+    build_catalog(lc_dir, catalog_dir, coarse_lengths=[10, 25, 200])
+    catalog = load_catalog(catalog_dir)
+    assert sorted(catalog.levels) == [10, 25]
+    assert catalog.levels[25].values.shape == (40, 25)
+    assert np.allclose(catalog.levels[25].values.std(axis=1, ddof=1), 1)
+
+    # Shortlists of the whole catalog rank everything at full resolution
+    query = catalog.values[3] + 0.1 * np.random.randn(100)
+    rows, dists = catalog.shortlist_distances(query, shortlist=40)
+    assert np.allclose(dists, catalog.distances(query)[rows])
+    rows, dists = catalog.shortlist_distances(query, shortlist=4)
+    assert len(rows) == 4
+
+    monkeypatch.setattr(simsearch, "LIGHT_CURVES_DIR", lc_dir)
+    ts = simsearch.load_ts("ts-7.txt")
+    min_dist, closest_ts_fn, closest_ts = simsearch.multires_search(ts, catalog, shortlist=5)
+    assert closest_ts_fn == "ts-7.txt"
+    assert min_dist == 0
+
+    ts = simsearch.load_external_ts("sample_data/sample_ts1.txt", length=1000)
+    assert len(ts) == 1000
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_subsequence_search():
+    from catalog import Catalog
+    from subseq import distance_profiles, subsequence_search
+    rng = np.random.RandomState(0)
+    series = rng.randn(3, 50)
+    query = rng.randn(7)
+    znorm = lambda x: (x - x.mean()) / x.std()
+    wrapped = np.hstack([series, series[:, :6]])
+    naive = np.array([[np.linalg.norm(znorm(query) - znorm(wrapped[r, i:i+7])) for i in range(50)] for r in range(3)])
+    assert np.allclose(distance_profiles(query, series), naive)
+    assert np.allclose(distance_profiles(query, series, wrap=False), naive[:, :44])
+
+    # A scaled and shifted stretch of row 4 that wraps around the end of the curve
+    values = crosscorr.standardize_values(rng.randn(20, 100))
+    catalog = Catalog(["ts-%d.txt" % i for i in range(20)], np.arange(0.0, 1.0, 0.01), values)
+    query = 3 * np.concatenate([values[4, 90:], values[4, :10]]) + 1
+    matches = subsequence_search(query, catalog, k=3, block_size=6)
+    assert len(matches) == 3
+    assert matches[0][:2] == ("ts-4.txt", 90) and np.isclose(matches[0][2], 0, atol=1e-6)
+    assert matches[1][2] <= matches[2][2]
+    with pytest.raises(ValueError):
+        distance_profiles(np.arange(101.), values)
+
+def test_phase_align():
+    from catalog import Catalog
+    query = crosscorr.standardize_values(np.random.randn(100))[0]
+    lags = np.array([0, 3, 50, 99])
+    values = np.array([np.roll(query, -lag) for lag in lags])
+    catalog = Catalog(["ts-%d.txt" % i for i in range(4)], np.arange(0.0, 1.0, 0.01), values)
+    found, peaks = catalog.phase_align(query, block_size=3)
+    assert np.array_equal(found, lags)
+    assert np.allclose(peaks, np.sum(query**2) / 100)
+    assert np.allclose(crosscorr.roll_rows(values, found), query)
+
+    ts1 = crosscorr.standardize(makelcs.tsmaker(0.3, 0.1, 0.1))
+    ts2 = crosscorr.standardize(makelcs.tsmaker(0.6, 0.1, 0.1))
+    lag, peak = crosscorr.max_corr_at_phase_block(crosscorr.spectra_matrix(ts1.values())[0],
+                                                  crosscorr.spectra_matrix(ts2.values()))
+    assert (lag[0], peak[0]) == crosscorr.max_corr_at_phase(ts1, ts2)
+
+def test_kernel_dist_multi():
+    from catalog import Catalog
+    ts1 = crosscorr.standardize(makelcs.tsmaker(0.3, 0.1, 0.1))
+    ts2 = crosscorr.standardize(makelcs.tsmaker(0.5, 0.2, 0.1))
+    mults = [0, 0.5, 1, 5, 20]
+    assert np.allclose(crosscorr.kernel_dist_multi(ts1, ts2, mults),
+                       [crosscorr.kernel_dist(ts1, ts2, mult) for mult in mults])
+    # np.exp(1000) overflows; the log-sum-exp form stays finite
+    assert np.all(np.isfinite(crosscorr.kernel_dist_multi(ts1, ts2, [1000, 5000])))
+
+    values = crosscorr.standardize_values(np.random.randn(10, 100))
+    catalog = Catalog(["ts-%d.txt" % i for i in range(10)], np.arange(0.0, 1.0, 0.01), values)
+    dists = catalog.distances_multi(values[0], [1, 3], block_size=4)
+    assert dists.shape == (2, 10)
+    assert np.allclose(dists[0], catalog.distances(values[0]))
+    assert np.allclose(dists[1], catalog.distances(values[0], mult=3))
+
+def test_fft_backends():
+    import fftbackend
+    from catalog import Catalog
+    ts1 = crosscorr.standardize(crosscorr.ats.ArrayTimeSeries(times=np.arange(25), values=np.random.randn(25)))
+    ts2 = crosscorr.standardize(crosscorr.ats.ArrayTimeSeries(times=np.arange(25), values=np.random.randn(25)))
+    full = np.fft.ifft(np.fft.fft(ts1.values()) * np.conjugate(np.fft.fft(ts2.values()))).real / 25
+    previous = fftbackend._backend, fftbackend._config
+    try:
+        for name in fftbackend.available_backends():
+            fftbackend.set_backend(name)
+            assert np.allclose(crosscorr.ccor(ts1, ts2), full)
+            # Odd length: the one-sided spectra need the explicit length
+            spectra = crosscorr.spectra_matrix(np.array([ts1.values(), ts2.values()]))
+            kernels = crosscorr.self_kernels(spectra, length=25)
+            dist = crosscorr.kernel_dist_block(spectra[0], kernels[0], spectra[1:], kernels[1:], length=25)
+            assert np.isclose(dist[0], crosscorr.kernel_dist(ts1, ts2))
+    finally:
+        fftbackend._backend, fftbackend._config = previous
+
+    # Catalogs saved with the full two-sided spectra still load
+    values = crosscorr.standardize_values(np.random.randn(5, 100))
+    catalog = Catalog(["ts-%d.txt" % i for i in range(5)], np.arange(0.0, 1.0, 0.01), values,
+                      spectra=np.fft.fft(values, axis=-1))
+    assert catalog.spectra.shape == (5, 51)
+    assert np.allclose(catalog.distances(values[0]), Catalog(catalog.ids, catalog.times, values).distances(values[0]),
+                       atol=1e-6)
+
+def test_float32_precision():
+    from catalog import build_catalog, load_catalog
+    lc_dir = TEMP_DIR + LIGHT_CURVES_DIR
+    makelcs.make_lc_files(50,lc_dir)
+    build_catalog(lc_dir, TEMP_DIR + "catalog64/")
+    build_catalog(lc_dir, TEMP_DIR + "catalog32/", precision='float32')
+    catalog64, catalog32 = load_catalog(TEMP_DIR + "catalog64/"), load_catalog(TEMP_DIR + "catalog32/")
+    assert catalog32.values.dtype == np.float32 and catalog32.spectra.dtype == np.complex64
+    assert catalog32.levels[25].spectra.dtype == np.complex64
+    assert catalog32.sketches.dtype == np.float64
+
+    # Nearest neighbour rankings of the sample data do not change, distances agree to well within the bound
+    for fn in sorted(os.listdir("sample_data")):
+        query = crosscorr.standardize(simsearch.load_external_ts("sample_data/" + fn)).values()
+        dists64, dists32 = catalog64.distances(query), catalog32.distances(query)
+        assert np.array_equal(np.argsort(dists64, kind='mergesort')[:10], np.argsort(dists32, kind='mergesort')[:10])
+        assert np.max(np.abs(dists64 - dists32)) < 1e-4
+
+    with pytest.raises(ValueError):
+        crosscorr.precision_dtype('float16')
+    clear_dir(TEMP_DIR,recreate=False)
+
+def test_ingest_dir(monkeypatch):
+    import shutil
+    from catalog import build_catalog, load_catalog, Catalog
+    from ingest import ingest_dir, find_files
+    lc_dir = TEMP_DIR + LIGHT_CURVES_DIR
+    catalog_dir = TEMP_DIR + "catalog/"
+    in_dir = TEMP_DIR + "incoming/"
+    makelcs.make_lc_files(20,lc_dir)
+    build_catalog(lc_dir, catalog_dir)
+    os.makedirs(in_dir + "night2/")
+    shutil.copy("sample_data/169975.dat_folded", in_dir)
+    shutil.copy("sample_data/51886.dat_folded", in_dir + "night2/")
+    with open(in_dir + "broken.dat_folded", "w") as f:
+        f.write("0.1\t15.0\n0.2\tnan?\n")
+    assert len(find_files(in_dir)) == 3
+
+    catalog, throughput, errors = ingest_dir(in_dir, catalog_dir, workers=2)
+    assert throughput > 0
+    assert [os.path.basename(path) for path, error in errors] == ["broken.dat_folded"]
+    catalog = load_catalog(catalog_dir)
+    assert len(catalog) == 22 and catalog.ids[-2:] == ["169975.dat_folded", "night2/51886.dat_folded"]
+    assert catalog.stats.shape == (22, 2) and catalog.levels[25].values.shape == (22, 25)
+
+    # Precomputed in the workers, same as computing them in the catalog
+    ts = simsearch.load_external_ts("sample_data/169975.dat_folded")
+    fresh = Catalog(["q"], catalog.times, crosscorr.standardize(ts).values())
+    assert np.allclose(catalog.values[20], fresh.values[0])
+    assert np.allclose(catalog.spectra[20], fresh.spectra[0]) and np.allclose(catalog.kernels()[20], fresh.kernels()[0])
+    assert np.allclose(catalog.stats[20], [ts.mean(), ts.std()])
+    min_dist, closest_ts_fn, closest_ts = simsearch.brute_force_search(ts, catalog)
+    assert closest_ts_fn == "169975.dat_folded" and min_dist < 1e-6
+    assert np.allclose(closest_ts.values(), fresh.values[0])
+
+    # Ingesting the same files again replaces them; ids are kept whole, spaces included
+    os.makedirs(in_dir + "night 3/")
+    shutil.copy("sample_data/169975.dat_folded", in_dir + "night 3/copy 1.dat_folded")
+    ingest_dir(in_dir, catalog_dir, workers=2)
+    catalog = load_catalog(catalog_dir)
+    assert len(catalog) == 23 and "night 3/copy 1.dat_folded" in catalog.ids[20:]
+
+    # The vantage point dbs do not index the ingested curves, so searches scan the catalog
+    import genvpdbs
+    monkeypatch.setattr(genvpdbs, "DB_DIR", TEMP_DIR)
+    with open(TEMP_DIR + genvpdbs.INDEXED_FILE, "w") as f:
+        f.writelines(fn + "\n" for fn in catalog.ids[:20])
+    assert not simsearch.index_covers(catalog)
+    assert simsearch.index_covers(catalog.take(range(20)))
+
+    # Rebuilding the catalog from the simulated curves keeps the ingested ones
+    makelcs.make_lc_files(20,lc_dir)
+    rebuilt = build_catalog(lc_dir, catalog_dir)
+    assert rebuilt.ids[20:] == catalog.ids[20:] and np.array_equal(rebuilt.values[20:], catalog.values[20:])
+    assert load_catalog(catalog_dir).ids == rebuilt.ids and rebuilt.levels[25].values.shape == (23, 25)
+    clear_dir(TEMP_DIR,recreate=False)
@@ -0,0 +1,193 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+#
+# CS207 Group Project Part 7
+# Created by Team 2 (Jonne Seleva, Nathaniel Burbank, Nicholas Ruta, Rohan Thavarajah) for Team 4
+
+import sys
+import numpy as np
+
+from crosscorr import standardize_values, spectra_matrix, self_kernels, kernel_dist_block, downsample_values
+from settings import LIGHT_CURVES_DIR, VP_STRATEGY, VP_SAMPLE_SIZE, VP_SEED
+
+# Global variables
+
+HELP_MESSAGE = \
+"""
+Vantage Point Selection
+
+A python command line utility to compare vantage point selection strategies by the expected
+pruning ratio of the vantage point index they produce.
+
+Usage: ./vpselect [optional flags]
+
+Optional flags:
+  -h, --help    Show this help message and exit.
+  -n N          Number of vantage points (Defaults to 20)
+"""
+
+def sample_distances(values, rows=None):
+    """
+    Kernel distances from the given rows (all by default) of a (S, L) matrix of light curve values
+    to every row, computed one vectorized row at a time.
+    """
+    length = values.shape[-1]
+    spectra = spectra_matrix(standardize_values(values))
+    kernels = self_kernels(spectra, length=length)
+    rows = range(len(spectra)) if rows is None else rows
+    dists = np.array([kernel_dist_block(spectra[i], kernels[i], spectra, kernels, length=length) for i in rows])
+    dists[np.arange(len(dists)), list(rows)] = 0
+    return dists
+
+def sample_rows(n_rows, n, sample_size=VP_SAMPLE_SIZE, seed=VP_SEED):
+    """Sorted random (but seeded, so reproducible) sample of at least n of n_rows row indexes"""
+    rng = np.random.RandomState(seed)
+    return np.sort(rng.choice(n_rows, min(max(sample_size, n), n_rows), replace=False))
+
+def random_vps(dists, n, rng):
+    """n distinct rows at random (the original selection)"""
+    return [int(row) for row in rng.choice(len(dists), n, replace=False)]
+
+def farthest_first_vps(dists, n, rng=None):
+    """
+    Farthest-first traversal: start from the row farthest from the sample's medoid, then
+    repeatedly add the row farthest from all vantage points chosen so far.
+    Spreads vantage points over the whole sample and never picks near-duplicates.
+    """
+    medoid = np.argmin(dists.sum(axis=1))
+    vps = [int(np.argmax(dists[medoid]))]
+    nearest_vp = dists[vps[0]].copy()
+    while len(vps) < n:
+        vp = int(np.argmax(nearest_vp))
+        vps.append(vp)
+        nearest_vp = np.minimum(nearest_vp, dists[vp])
+    return vps
+
+def max_variance_vps(dists, n, rng=None):
+    """
+    Rows whose distances to the rest of the sample have the largest variance. A vantage point with
+    widely spread distances splits its db into more selective distance ranges. Rows closer to an
+    already chosen vantage point than the sample's 10th percentile distance are skipped.
+    """
+    min_gap = np.percentile(dists[np.triu_indices(len(dists), 1)], 10)
+    vps = []
+    for row in np.argsort(-dists.var(axis=1), kind='mergesort'):
+        if all(dists[row, vp] > min_gap for vp in vps):
+            vps.append(int(row))
+        if len(vps) == n:
+            return vps
+    # Sample too tight for the gap; fill up with the next best rows
+    rest = [int(row) for row in np.argsort(-dists.var(axis=1), kind='mergesort') if row not in vps]
+    return vps + rest[:n - len(vps)]
+
+def k_medoids_vps(dists, n, rng=None, n_iter=20):
+    """
+    Medoids of n clusters of the sample (alternating k-medoids, seeded by farthest-first traversal).
+    Every light curve then has a vantage point close to it, which keeps the 2x search radius small.
+    """
+    medoids = np.array(farthest_first_vps(dists, n))
+    for i in range(n_iter):
+        assignments = np.argmin(dists[:, medoids], axis=1)
+        new_medoids = medoids.copy()
+        for j in range(n):
+            members = np.flatnonzero(assignments == j)
+            if len(members):
+                new_medoids[j] = members[np.argmin(dists[np.ix_(members, members)].sum(axis=1))]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+    return [int(m) for m in medoids]
+
+VP_STRATEGIES = {
+    'random': random_vps,
+    'farthest': farthest_first_vps,
+    'variance': max_variance_vps,
+    'kmedoids': k_medoids_vps,
+}
+
+def pruning_ratio(vp_dists, vps):
+    """
+    Expected fraction of light curves a vantage point search never has to look at.
+
+    Args:
+        vp_dists: (n, S) np.array of distances from each vantage point to every row of the sample
+        vps: sample rows of the n vantage points
+
+    Every non vantage point row of the sample acts as a query. A query at distance r from its
+    closest vantage point has to check the light curves within 2r of that vantage point; the rest are pruned.
+    """
+    vp_dists = np.asarray(vp_dists)
+    queries = np.setdiff1d(np.arange(vp_dists.shape[1]), vps)
+    if len(queries) == 0:
+        return 0.
+    to_vps = vp_dists[:, queries].T
+    closest = np.argmin(to_vps, axis=1)
+    radius = 2 * to_vps[np.arange(len(queries)), closest]
+    candidates = np.sum(vp_dists[closest] <= radius[:, np.newaxis], axis=1)
+    return 1 - np.mean(candidates) / vp_dists.shape[1]
+
+def select_vantage_points(ids, values, n=20, strategy=VP_STRATEGY, sample_size=VP_SAMPLE_SIZE, seed=VP_SEED,
+                          length=None):
+    """
+    Picks n vantage points among a random (but seeded, so reproducible) sample of the light curves.
+
+    Args:
+        ids: list of light curve filenames, one per row of values
+        values: (N, L) np.array of light curve values
+        n: number of vantage points
+        strategy: one of VP_STRATEGIES
+        sample_size: number of light curves the pairwise distances are computed for
+        seed: seed of the sample (and of the random strategy)
+        length: when given, the pairwise distances are computed on the sample downsampled to length points
+            (see crosscorr.downsample_values). Only the n vantage point rows are computed at full resolution.
+    Returns:
+        Tuple: list of n vantage point filenames, expected pruning ratio of the selection on the sample
+    Raises:
+        ValueError: for an unknown strategy or fewer than n light curves
+    """
+    if strategy not in VP_STRATEGIES:
+        raise ValueError("Unknown vantage point strategy %r (choose from %s)" % (strategy, ", ".join(sorted(VP_STRATEGIES))))
+    if len(ids) < n:
+        raise ValueError("Need at least %d light curves to pick %d vantage points" % (n, n))
+    sample = sample_rows(len(ids), n, sample_size, seed)
+    sample_values = np.asarray(values)[sample]
+    if length is None or length >= sample_values.shape[1]:
+        dists = sample_distances(sample_values)
+        vps = VP_STRATEGIES[strategy](dists, n, np.random.RandomState(seed))
+        vp_dists = dists[vps]
+    else:
+        dists = sample_distances(downsample_values(sample_values, length))
+        vps = VP_STRATEGIES[strategy](dists, n, np.random.RandomState(seed))
+        vp_dists = sample_distances(sample_values, vps)
+    return [ids[sample[vp]] for vp in vps], pruning_ratio(vp_dists, vps)
+
+def compare_strategies(ids, values, n=20, sample_size=VP_SAMPLE_SIZE, seed=VP_SEED):
+    """Expected pruning ratio of every strategy on the same sample, as a {strategy: ratio} dict"""
+    sample = sample_rows(len(ids), n, sample_size, seed)
+    dists = sample_distances(np.asarray(values)[sample])
+    ratios = {}
+    for name, pick in VP_STRATEGIES.items():
+        vps = pick(dists, n, np.random.RandomState(seed))
+        ratios[name] = pruning_ratio(dists[vps], vps)
+    return ratios
+
+if __name__ == "__main__":
+    """Enables this file to be run independently of simsearch as it's own CLU."""
+    from genvpdbs import load_ts
+    need_help = False
+    n = 20
+
+    for i, arg in enumerate(sys.argv[1:]):
+        if arg.lower() in ['-h','--help', 'help']: need_help = True
+        elif arg == '-n' and i + 2 < len(sys.argv):
+            n = int(sys.argv[i + 2])
+
+    if need_help:
+        print (HELP_MESSAGE)
+    else:
+        timeseries_dict = load_ts(LIGHT_CURVES_DIR)
+        ids = sorted(timeseries_dict)
+        values = np.array([timeseries_dict[k].values() for k in ids])
+        print("strategy  expected pruning ratio")
+        for name, ratio in sorted(compare_strategies(ids, values, n).items(), key=lambda x: -x[1]):
+            print("%-8s  %22.3f" % (name, ratio))